@@ -0,0 +1,296 @@
+#!/usr/bin/env python3
+# Server and client configuration generation for psp, Shinjuku and Shenango.
+#
+# The format_*.py scripts are thin wrappers around the functions below. run.py
+# imports this module to generate the configs of a whole sweep at once
+# (write_batch_configs), and its CLI writes both the server and the client
+# configs of a single run. Parsed schedules are cached, so each schedule file
+# is only read once per process.
+import yaml
+import functools
+import copy
+from argparse import ArgumentParser
+from collections import OrderedDict
+
+@functools.lru_cache(maxsize=None)
+def _load_schedule(path):
+    with open(path, 'r') as f:
+        return yaml.load(f, Loader=yaml.FullLoader)
+
+def load_schedule(path):
+    # Callers get their own copy of the cached schedule
+    return copy.deepcopy(_load_schedule(path))
+
+def eal_init(cpus, dpdk_prefix, dpdk_dev_num):
+    return [
+        '-n', '2',
+        '-l', ', '.join(['0'] + list(cpus)),
+        '--file-prefix', dpdk_prefix,
+        "-w", "{}".format(dpdk_dev_num),
+        #"-w", "{},mprq_en=0,rx_vec_en=0".format(dpdk_dev_num),
+    ]
+
+def server_config(server_ip, server_mac, cpus=['1'], port=6789, dev_id=0, log_dir=None,
+                  dpdk_dev_num="18:00.0", dpdk_prefix='dpdk', dp_pol='DFCFS', app_type='MB',
+                  req_types=None, n_resas=-1, schedule=None):
+    config = {
+        'network': {
+            'device_id': dev_id,
+            'mac': server_mac,
+            'eal_init': eal_init(cpus, dpdk_prefix, dpdk_dev_num), #1 master EAL + net worker + app workers
+        },
+        'net_workers': [{
+            'ip': server_ip,
+            'port': port,
+            'dp': dp_pol,
+            'is_echo': 0
+        }],
+        'cpus': [int(cpu) for cpu in cpus],
+        'workers': {
+            'number': len(cpus) - 1, #Assuming split_dpt = 0
+            'type': app_type,
+        }
+    }
+    if n_resas > -1:
+        config['n_resas'] = n_resas
+
+    if schedule:
+        types = []
+        for workload in load_schedule(schedule):
+            types.extend(workload['rtype'])
+        unique_types = list(OrderedDict.fromkeys(types))
+        config['requests'] = [{'type': r} for r in unique_types]
+    elif req_types is not None:
+        config['requests'] = [{
+            'type': rtype[0],
+            'mean_ns': float(rtype[1]),
+            'ratio': float(rtype[2]),
+            'deadline': float(rtype[3])
+        } for rtype in req_types]
+
+    if log_dir:
+        config['log_dir'] = log_dir
+    return config
+
+def client_schedules(schedule, n_clients, server_workers, load, verbose=True):
+    schedules = []
+    for workload in load_schedule(schedule):
+        assert(len(workload['mean_ns']) == len(workload['ratios']))
+        mean_ns = sum([u * r for u, r in zip(workload['mean_ns'], workload['ratios'])])
+        rate = int(((1e9 / (mean_ns / server_workers)) / n_clients) * load)
+        if verbose:
+            print(f"rate per client: {rate}")
+        schedules.append({
+            'rate': rate,
+            'cmd_mean_ns': workload['mean_ns'],
+            'cmd_ratios': workload['ratios'],
+            'uniform': workload['uniform'],
+            'duration': workload['duration'],
+            'ptype': workload['ptype'],
+        })
+    return schedules
+
+def client_configs(client_ips, client_macs, clt_threads, server_mac, server_workers=None,
+                   port=6789, dev_id=0, log_dir=None, dpdk_dev_num="18:00.0", dpdk_prefix='dpdk',
+                   cpus=['1'], schedule=None, load=None, verbose=True):
+    # One config per client
+    schedules = None
+    if schedule:
+        schedules = client_schedules(schedule, len(client_ips), server_workers, load, verbose)
+    configs = []
+    for ip, mac in zip(client_ips, client_macs):
+        config = {
+            'network': {
+                'mac': mac,
+                'remote_mac': server_mac,
+                'device_id': dev_id,
+                'eal_init': eal_init(cpus, dpdk_prefix, dpdk_dev_num),
+            },
+            'cpus': [int(cpu) for cpu in cpus],
+        }
+        if log_dir:
+            config['log_dir'] = log_dir
+        config['net_workers'] = [{
+            'ip': ip,
+            'port': port,
+        }] * clt_threads
+        if schedules is not None:
+            config['schedules'] = schedules
+        configs.append(config)
+    return configs
+
+def shenango_runtime_config(server_ip, server_mac, client_ips, client_macs, runtime_kthreads=8,
+                            runtime_guaranteed_kthreads=8, runtime_spinning_kthreads=8, policy='CFCFS'):
+    #FIXME host_ info should be dynamic
+    config = f"host_addr {server_ip}\n"
+    config += f"host_netmask 255.255.255.0\n"
+    config += f"host_gateway 192.168.10.1\n"
+    config += f"runtime_kthreads {runtime_kthreads}\n"
+    config += f"runtime_guaranteed_kthreads {runtime_guaranteed_kthreads}\n"
+    config += f"runtime_spinning_kthreads {runtime_spinning_kthreads}\n"
+    config += f"disable_watchdog true\n"
+    config += f"runtime_priority lc\n"
+    #config += f"enable_directpath {directpath}\n"
+    config += f"host_mac {server_mac}\n"
+    if policy == 'DFCFS':
+        config += f"disable_stealing 1\n"
+    for ip, mac in zip(client_ips, client_macs):
+        config += f"static_arp {ip} {mac}\n"
+    return config
+
+def shinjuku_config(template, client_ips, client_macs, port=['6789'], slo=['1000'],
+                    dpdk_dev_num="18:00.0", cpus=['1'], headenq=False, preemption_tick=5000,
+                    schedule=None):
+    with open(template, 'r') as cfg_tpl:
+        cfg = cfg_tpl.read()
+
+    # We just need to extract deadlines for each request type. Assume only 1 schedule for now
+    deadlines = None
+    if schedule:
+        deadlines = str([d * 10 for d in load_schedule(schedule)[0]['mean_ns']])
+
+    cfg += 'cpu=[' + ','.join([cpu for cpu in cpus]) + ']'
+    cfg += '\ndevices=\"' + dpdk_dev_num + '\"'
+    cfg += '\npreemption_delay=' + str(preemption_tick)
+    if len(port) == 1:
+        cfg += '\nport=' + port[0]
+    else:
+        cfg += '\nport=[' + ','.join(port) + ']'
+    if deadlines:
+        cfg += '\nslo=' + str(deadlines)
+    elif len(slo) == 1:
+        cfg += '\nslo=' + slo[0]
+    else:
+        cfg += '\nslo=[' + ','.join(slo) + ']'
+    if headenq:
+        cfg += '\nqueue_setting=[true]'
+    else:
+        cfg += '\nqueue_setting=[false]'
+    # Fill ARP entries for clients
+    cfg += '\narp=('
+    for i, (ip, mac) in enumerate(zip(client_ips, client_macs)):
+        if i > 0:
+            cfg += ','
+        cfg += '\n{\n'
+        cfg += 'ip : \"' + ip + '\"\n'
+        cfg += 'mac : \"' + mac + '\"'
+        cfg += '\n}'
+    cfg += '\n)'
+    return cfg
+
+def write_yaml(config, output):
+    with open(output, 'w') as f:
+        yaml.dump(config, f)
+
+def write_text(config, output):
+    with open(output, 'w') as f:
+        f.write(config)
+
+def write_client_configs(configs, output):
+    # Client i's config goes to <output>.i
+    for i, config in enumerate(configs):
+        write_yaml(config, output + '.' + str(i))
+
+def write_run_configs(system, server_output, clients_output, server_args, client_args):
+    # Server and client configs of a single run
+    if system == 'psp':
+        write_yaml(server_config(**server_args), server_output)
+    elif system == 'shenango':
+        write_text(shenango_runtime_config(**server_args), server_output)
+    elif system == 'shinjuku':
+        write_text(shinjuku_config(**server_args), server_output)
+    else:
+        raise ValueError(f'Unknown system {system}')
+    write_client_configs(client_configs(**client_args), clients_output)
+
+def write_batch_configs(runs):
+    # runs: list of write_run_configs keyword arguments, e.g. one per
+    # experiment of a sweep
+    for run in runs:
+        write_run_configs(**run)
+
+def client_args_parser(parser):
+    parser.add_argument('--client-ips', nargs='+')
+    parser.add_argument('--client-macs', nargs='+')
+    parser.add_argument('--clt-threads', type=int)
+    parser.add_argument('--server-ip', type=str)
+    parser.add_argument('--server-mac', type=str)
+    parser.add_argument('--server-workers', type=int)
+    parser.add_argument('--port', type=int, default=6789)
+    parser.add_argument('--dev-id', type=int, default=0)
+    parser.add_argument('--log-dir', type=str, default=None)
+    parser.add_argument('--dpdk-dev-num', type=str, default="18:00.0")
+    parser.add_argument('--dpdk-prefix', type=str, default='dpdk')
+    parser.add_argument('--schedule', type=str)
+    parser.add_argument('--load', type=float)
+    return parser
+
+def client_kwargs(args, cpus):
+    return {
+        'client_ips': args.client_ips, 'client_macs': args.client_macs,
+        'clt_threads': args.clt_threads, 'server_mac': args.server_mac,
+        'server_workers': args.server_workers, 'port': args.port, 'dev_id': args.dev_id,
+        'log_dir': args.log_dir, 'dpdk_dev_num': args.dpdk_dev_num,
+        'dpdk_prefix': args.dpdk_prefix, 'cpus': cpus,
+        'schedule': args.schedule, 'load': args.load,
+    }
+
+if __name__ == '__main__':
+    parser = ArgumentParser(description='Generate the server and client configs of runs')
+    subparsers = parser.add_subparsers(dest='system')
+
+    for system in ['psp', 'shenango', 'shinjuku']:
+        sub = client_args_parser(subparsers.add_parser(system))
+        sub.add_argument('--server-output', type=str, required=True)
+        sub.add_argument('--clients-output', type=str, required=True)
+        sub.add_argument('--clt-cpus', type=str, nargs='+', default=['1'])
+        sub.add_argument('--srv-cpus', type=str, nargs='+', default=['1'])
+        if system == 'psp':
+            sub.add_argument('--dp-pol', type=str, default='DFCFS')
+            sub.add_argument('--app-type', type=str, default='MB')
+            sub.add_argument('--n-resas', type=int, default=-1)
+        elif system == 'shenango':
+            sub.add_argument('--runtime-kthreads', type=int, default=8)
+            sub.add_argument('--runtime-guaranteed-kthreads', type=int, default=8)
+            sub.add_argument('--runtime-spinning-kthreads', type=int, default=8)
+            sub.add_argument('--policy', type=str, default='CFCFS')
+        else:
+            sub.add_argument('--template', type=str, required=True)
+            sub.add_argument('--srv-dpdk-dev-num', type=str, default="18:00.0")
+            sub.add_argument('--srv-ports', type=str, nargs='+', default=['6789'])
+            sub.add_argument('--preemption-tick', type=int, default=5000)
+
+    args = parser.parse_args()
+
+    if args.system == 'psp':
+        server_args = {
+            'server_ip': args.server_ip, 'server_mac': args.server_mac, 'cpus': args.srv_cpus,
+            'port': args.port, 'dev_id': args.dev_id, 'log_dir': args.log_dir,
+            'dpdk_dev_num': args.dpdk_dev_num, 'dpdk_prefix': args.dpdk_prefix,
+            'dp_pol': args.dp_pol, 'app_type': args.app_type, 'n_resas': args.n_resas,
+            'schedule': args.schedule,
+        }
+        write_run_configs('psp', args.server_output, args.clients_output,
+                          server_args, client_kwargs(args, args.clt_cpus))
+    elif args.system == 'shenango':
+        server_args = {
+            'server_ip': args.server_ip, 'server_mac': args.server_mac,
+            'client_ips': args.client_ips, 'client_macs': args.client_macs,
+            'runtime_kthreads': args.runtime_kthreads,
+            'runtime_guaranteed_kthreads': args.runtime_guaranteed_kthreads,
+            'runtime_spinning_kthreads': args.runtime_spinning_kthreads,
+            'policy': args.policy,
+        }
+        write_run_configs('shenango', args.server_output, args.clients_output,
+                          server_args, client_kwargs(args, args.clt_cpus))
+    elif args.system == 'shinjuku':
+        server_args = {
+            'template': args.template, 'client_ips': args.client_ips,
+            'client_macs': args.client_macs, 'port': args.srv_ports,
+            'dpdk_dev_num': args.srv_dpdk_dev_num, 'cpus': args.srv_cpus,
+            'preemption_tick': args.preemption_tick, 'schedule': args.schedule,
+        }
+        write_run_configs('shinjuku', args.server_output, args.clients_output,
+                          server_args, client_kwargs(args, args.clt_cpus))
+    else:
+        parser.print_help()
@@ -32,6 +32,11 @@ import yaml
 import subprocess
 import numpy as np
 import argparse
+import asyncio
+import json
+import functools
+import time
+import sys
 import os
 parser = argparse.ArgumentParser()
 parser.add_argument('run_number')
@@ -47,12 +52,30 @@ parser.add_argument('-d', '--downsample', type=int, default=-1)
 parser.add_argument('-b', '--base-output', type=str, default='/psp/experiments')
 parser.add_argument('-m', '--darc-manual', type=int, default=-1)
 parser.add_argument('-L', '--load-range', nargs=2, type=float, default=[.05, 1.06])
+parser.add_argument('-S', '--search', action='store_true', help='search the knee of each policy instead of sweeping the load range')
+parser.add_argument('--search-step', type=float, default=.2, help='load step of the coarse search pass')
+parser.add_argument('--search-resolution', type=float, default=.05, help='stop refining the knee below this load gap')
+parser.add_argument('--max-runs', type=int, default=8, help='run budget per policy in search mode')
+parser.add_argument('--max-slowdown', type=float, default=50, help='p99.9 slowdown above which a run is saturated')
+parser.add_argument('--min-achieved', type=float, default=.95, help='achieved/offered rate below which a run is saturated')
+parser.add_argument('-f', '--force', action='store_true', help='rerun experiments that already have complete results')
+parser.add_argument('--plan', action='store_true', help='list the sweep and the status of each experiment, then exit')
+parser.add_argument('-I', '--ingest', action='store_true', help='precompute summaries of each complete run in the background')
+parser.add_argument('-t', '--testbeds', type=str, help='YAML file of testbeds to run the sweep on concurrently (see config/testbeds.yml). '
+                    'Sweeps only: a load search (-S) probes one load at a time, on the default testbed')
+parser.add_argument('-r', '--retries', type=int, default=1, help='number of times a failed run is retried, on another testbed if possible')
 # env
 args = parser.parse_args()
 DIR = os.path.dirname(os.path.abspath(__file__))
 SCHEDULES = os.path.join(DIR, "schedules", "")
 SHREMOTE = os.path.join(DIR, "../../../", "submodules", "Shremote/shremote.py")
+INGEST = os.path.join(DIR, "..", "ingest.py")
 BASE_OUTPUT = args.base_output
+# Server and client configs of each run, generated before Shremote starts.
+# Shremote recreates the run's output folder (--delete), so they live aside.
+CONFIGS = os.path.join(BASE_OUTPUT, 'configs')
+sys.path.insert(0, os.path.join(DIR, 'format_scripts'))
+import psp_configs
 SRV_CPUS = "2 4 6 8 10 12 14 16 18 20 22 24 26 28 30"
 CLT_CPUS = "2"
 if isinstance(args.policies, str):
@@ -64,71 +87,550 @@ elif args.system == 'shenango':
     CFG = os.path.join(DIR, "shenango.yml")
 else:
     CFG = os.path.join(DIR, "psp.yml")
-output_paths = []
-for LOAD in np.arange(args.load_range[0], args.load_range[1], .05):
-    for DP in args.policies:
-        TITLE = f'{DP}_{(LOAD):.2f}_{args.schedule}_{args.n_workers}'
-        if args.system == 'shenango':
-            TITLE = f'shen-{DP}_{(LOAD):.2f}_{args.schedule}_{args.n_workers}'
-        if args.darc_manual > -1:
-            TITLE += f'_{args.darc_manual}'
-        TITLE += f'.{args.run_number}'
-        shremote_args = [
-            'python3', '-u',
-            SHREMOTE, CFG, TITLE, '--out', BASE_OUTPUT, '--delete', '--',
-            '--downsample', str(args.downsample),
-            '--n-clients', args.n_clients,
-            '--clt-cpus', CLT_CPUS,
-            '--max-clt-cc', '-1',
-            '--clt-threads', args.n_clt_threads,
-            '--n-workers', args.n_workers,
-            '--srv-cpus', SRV_CPUS,
-            '--app', args.app_type,
-            '--srv-dp', DP,
-            '--schedule', f'{SCHEDULES}{args.schedule}.yml',
-            '--load', str(LOAD)
-        ]
-        if args.schedule == 'TPCC' or args.schedule == 'TPCC_IX':
-            shremote_args.extend(['--req-offset', '5'])
-        elif args.schedule == 'ROCKSDB' or args.schedule == 'ROCKSDB_IX':
-            shremote_args.extend(['--req-offset', '10'])
-        elif args.schedule == 'MB':
-            shremote_args.extend(['--req-offset', '1'])
-        if args.system == 'shinjuku':
-            shinjuku_args = []
-            shinjuku_args.extend(['--policy', DP])
-            if args.schedule == 'TPCC_IX' and DP == 'cPREMQ':
-                shinjuku_args.extend(
-                    ['--n-ports', '5', '--preemption-tick', '10000']
-                )
-            elif DP == 'cPREMQ':
-                shinjuku_args.extend(
-                    ['--n-ports', '2']
-                )
-            elif DP == 'cPRESQ':
-                shinjuku_args.extend(
-                    ['--n-ports', '1']
-                )
-            if args.schedule == 'DISP2_IX' or args.schedule == 'SBIM2_IX':
-                shinjuku_args.extend(['--premption-tick', '5000'])
-            elif args.schedule == 'ROCKSDB_IX':
-                shinjuku_args.extend(['--premption-tick', '15000'])
-            shremote_args.extend(shinjuku_args)
-        elif args.system == 'shenango':
-            shremote_args.extend(['--policy', DP])
-        if args.parse_test:
-            shremote_args.append('--parse-test')
-        if args.darc_manual > -1:
-            shremote_args.extend(['--n-resas', str(args.darc_manual)])
-        log_info(shremote_args)
-        p = subprocess.Popen(shremote_args, stdout=subprocess.PIPE, stderr=subprocess.STDOUT)
-        while(1):
-            line = p.stdout.readline()
-            print(line.decode('ascii'))
+# Completed runs, one JSON object per line
+MANIFEST = os.path.join(BASE_OUTPUT, 'manifest.jsonl')
+# Files each client must have written for a run to be complete
+CLIENT_RESULTS = ['traces', 'traces_hist', 'traces_rates', 'traces_throughput']
+
+def exp_title(DP, LOAD):
+    TITLE = f'{DP}_{(LOAD):.2f}_{args.schedule}_{args.n_workers}'
+    if args.system == 'shenango':
+        TITLE = f'shen-{DP}_{(LOAD):.2f}_{args.schedule}_{args.n_workers}'
+    if args.darc_manual > -1:
+        TITLE += f'_{args.darc_manual}'
+    TITLE += f'.{args.run_number}'
+    return TITLE
+
+def run_complete(output_path):
+    for clt in range(int(args.n_clients)):
+        for f in CLIENT_RESULTS:
+            path = os.path.join(output_path, f'client{clt}', f)
+            if not os.path.isfile(path) or os.path.getsize(path) == 0:
+                return False
+    return True
+
+def read_manifest():
+    completed = {}
+    if not os.path.exists(MANIFEST):
+        return completed
+    with open(MANIFEST, 'r') as f:
+        for line in f:
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                # Partially written line from an interrupted sweep
+                continue
+            completed[entry['title']] = entry
+    return completed
+
+def record_run(TITLE, DP, LOAD):
+    entry = {
+        'title': TITLE, 'system': args.system, 'policy': DP, 'load': round(float(LOAD), 2),
+        'schedule': args.schedule, 'n_workers': args.n_workers, 'n_clients': args.n_clients,
+        'darc_manual': args.darc_manual, 'run_number': args.run_number,
+        'completed': time.strftime('%Y-%m-%d %H:%M:%S'),
+    }
+    os.makedirs(BASE_OUTPUT, exist_ok=True)
+    with open(MANIFEST, 'a+') as f:
+        # Start a new line after a partially written one
+        f.seek(0, os.SEEK_END)
+        if f.tell() > 0:
+            f.seek(f.tell() - 1)
+            if f.read(1) != '\n':
+                f.write('\n')
+        f.write(json.dumps(entry) + '\n')
+    return entry
+
+# Background ingestion processes: (output path, process, log file)
+ingest_procs = []
+
+def reap_ingest(block=False):
+    # Collect finished ingestion processes, or wait for all of them if block
+    for entry in list(ingest_procs):
+        output_path, p, log_file = entry
+        if not block and p.poll() is None:
+            continue
+        p.wait()
+        log_file.close()
+        ingest_procs.remove(entry)
+        if p.returncode != 0:
+            log_error(f'Ingestion of {output_path} failed, see {log_file.name}')
+        else:
+            log_info(f'Ingested {output_path}')
+
+async def start_ingest(output_path):
+    # Parse the run's outputs while the next experiment runs. Waiting for a
+    # free core yields to the other testbeds' runs.
+    reap_ingest()
+    while len(ingest_procs) >= os.cpu_count():
+        await asyncio.sleep(1)
+        reap_ingest()
+    log_file = open(os.path.join(output_path, 'ingest.log'), 'w')
+    p = subprocess.Popen(['python3', INGEST, output_path], stdout=log_file, stderr=subprocess.STDOUT)
+    ingest_procs.append((output_path, p, log_file))
+
+def needs_run(DP, LOAD):
+    return args.force or args.parse_test or not run_complete(f'{BASE_OUTPUT}/{exp_title(DP, LOAD)}')
+
+async def skip_complete(DP, LOAD):
+    TITLE = exp_title(DP, LOAD)
+    output_path = f'{BASE_OUTPUT}/{TITLE}'
+    if needs_run(DP, LOAD):
+        return False
+    log_info(f'{TITLE} already has complete results, skipping')
+    if TITLE not in manifest:
+        manifest[TITLE] = record_run(TITLE, DP, LOAD)
+    if args.ingest and not os.path.exists(os.path.join(output_path, 'summary.json')):
+        await start_ingest(output_path)
+    return True
+
+async def finish_run(DP, LOAD):
+    # Record (and ingest) a run once Shremote returned
+    TITLE = exp_title(DP, LOAD)
+    output_path = f'{BASE_OUTPUT}/{TITLE}'
+    if args.parse_test:
+        return True
+    if not run_complete(output_path):
+        log_error(f'{TITLE} did not produce complete results')
+        return False
+    manifest[TITLE] = record_run(TITLE, DP, LOAD)
+    if args.ingest:
+        await start_ingest(output_path)
+    return True
+
+def configs_dir(DP, LOAD, testbed='default'):
+    return os.path.join(CONFIGS, testbed, exp_title(DP, LOAD))
+
+def shremote_cmd(DP, LOAD, cfg=CFG, testbed='default'):
+    TITLE = exp_title(DP, LOAD)
+    shremote_args = [
+        'python3', '-u',
+        SHREMOTE, cfg, TITLE, '--out', BASE_OUTPUT, '--delete', '--',
+        '--downsample', str(args.downsample),
+        '--n-clients', args.n_clients,
+        '--clt-cpus', CLT_CPUS,
+        '--max-clt-cc', '-1',
+        '--clt-threads', args.n_clt_threads,
+        '--n-workers', args.n_workers,
+        '--srv-cpus', SRV_CPUS,
+        '--app', args.app_type,
+        '--srv-dp', DP,
+        '--schedule', f'{SCHEDULES}{args.schedule}.yml',
+        '--load', str(LOAD),
+        '--configs-dir', configs_dir(DP, LOAD, testbed),
+    ]
+    if args.schedule == 'TPCC' or args.schedule == 'TPCC_IX':
+        shremote_args.extend(['--req-offset', '5'])
+    elif args.schedule == 'ROCKSDB' or args.schedule == 'ROCKSDB_IX':
+        shremote_args.extend(['--req-offset', '10'])
+    elif args.schedule == 'MB':
+        shremote_args.extend(['--req-offset', '1'])
+    if args.system == 'shinjuku':
+        shinjuku_args = []
+        shinjuku_args.extend(['--policy', DP])
+        if args.schedule == 'TPCC_IX' and DP == 'cPREMQ':
+            shinjuku_args.extend(
+                ['--n-ports', '5', '--preemption-tick', '10000']
+            )
+        elif DP == 'cPREMQ':
+            shinjuku_args.extend(
+                ['--n-ports', '2']
+            )
+        elif DP == 'cPRESQ':
+            shinjuku_args.extend(
+                ['--n-ports', '1']
+            )
+        if args.schedule == 'DISP2_IX' or args.schedule == 'SBIM2_IX':
+            shinjuku_args.extend(['--premption-tick', '5000'])
+        elif args.schedule == 'ROCKSDB_IX':
+            shinjuku_args.extend(['--premption-tick', '15000'])
+        shremote_args.extend(shinjuku_args)
+    elif args.system == 'shenango':
+        shremote_args.extend(['--policy', DP])
+    if args.parse_test:
+        shremote_args.append('--parse-test')
+    if args.darc_manual > -1:
+        shremote_args.extend(['--n-resas', str(args.darc_manual)])
+    return shremote_args
+
+async def run_shremote(shremote_args, log_file=None):
+    # Run Shremote and return its exit code. Its output goes to log_file, or
+    # is echoed as it comes (undecodable bytes replaced) without one.
+    if log_file is not None:
+        p = await asyncio.create_subprocess_exec(*shremote_args, stdout=log_file, stderr=subprocess.STDOUT)
+    else:
+        p = await asyncio.create_subprocess_exec(
+            *shremote_args, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, limit=1 << 20
+        )
+        while True:
+            line = await p.stdout.readline()
             if not line:
                 break
-        p.wait()
-        output_paths.append(f'{BASE_OUTPUT}/{TITLE}')
+            print(line.decode('utf-8', errors='replace'), end='', flush=True)
+    return await p.wait()
+
+async def run_exp_default(DP, LOAD):
+    # On the default testbed, echoing Shremote's output
+    output_path = f'{BASE_OUTPUT}/{exp_title(DP, LOAD)}'
+    if await skip_complete(DP, LOAD):
+        return output_path
+    shremote_args = shremote_cmd(DP, LOAD)
+    log_info(shremote_args)
+    returncode = await run_shremote(shremote_args)
+    if returncode != 0:
+        log_error(f'{exp_title(DP, LOAD)}: Shremote exited with code {returncode}')
+    await finish_run(DP, LOAD)
+    return output_path
+
+def run_exp(DP, LOAD):
+    return asyncio.run(run_exp_default(DP, LOAD))
+
+##############################################
+##############CONFIG GENERATION###############
+# The server and client configs of every run are written here, in one
+# process, before Shremote is launched: the Shremote configs' init_cmds only
+# copy them into the run's output folder. They are derived from the Shremote
+# config (network, hosts, dirs) and from the arguments Shremote is given, with
+# the same defaults as its getarg() calls.
+
+class IncludeLoader(yaml.FullLoader):
+    pass
+
+def include_constructor(loader, node):
+    # Shremote's !include, relative to the Shremote configs folder
+    with open(os.path.join(DIR, loader.construct_scalar(node)), 'r') as f:
+        return yaml.load(f, Loader=IncludeLoader)
+
+IncludeLoader.add_constructor('!include', include_constructor)
+
+@functools.lru_cache(maxsize=None)
+def load_shremote_cfg(cfg):
+    with open(cfg, 'r') as f:
+        return yaml.load(f, Loader=IncludeLoader)
+
+def shremote_params(shremote_args):
+    # The '--name value' arguments after '--', as Shremote's getarg sees them
+    params = {}
+    rest = shremote_args[shremote_args.index('--') + 1:]
+    for i, arg in enumerate(rest):
+        if not arg.startswith('--'):
+            continue
+        if i + 1 < len(rest) and not rest[i + 1].startswith('--'):
+            params[arg[2:]] = rest[i + 1]
+        else:
+            params[arg[2:]] = True
+    return params
+
+def run_configs(DP, LOAD, cfg=CFG, testbed='default'):
+    # psp_configs.write_run_configs arguments of a run
+    shremote_cfg = load_shremote_cfg(cfg)
+    params = shremote_params(shremote_cmd(DP, LOAD, cfg, testbed))
+    output_dir = configs_dir(DP, LOAD, testbed)
+    server_net, client_net = shremote_cfg['server_net'], shremote_cfg['client_net']
+    srv_cpus = params['srv-cpus'].split()
+    client_args = {
+        'client_ips': client_net['ips'].split(), 'client_macs': client_net['macs'].split(),
+        'clt_threads': int(params['clt-threads']), 'server_mac': server_net['mac'],
+        'server_workers': len(srv_cpus) - (2 if args.system == 'shinjuku' else 1),
+        'log_dir': os.path.expanduser(shremote_cfg['dirs']['log_dir']),
+        'dpdk_dev_num': shremote_cfg['hosts']['client0']['dev_num'],
+        'dpdk_prefix': shremote_cfg['ssh']['user'], 'cpus': params['clt-cpus'].split(),
+        'schedule': params['schedule'], 'load': float(params['load']), 'verbose': False,
+    }
+    if args.system == 'shinjuku':
+        n_ports = int(params.get('n-ports', 2))
+        server_args = {
+            'template': shremote_cfg['files']['server_cfg']['template'].replace('{0.dirs.shremote_cfgs}', DIR),
+            'client_ips': client_args['client_ips'], 'client_macs': client_args['client_macs'],
+            'port': [str(port) for port in server_net['ports'][:n_ports]],
+            'dpdk_dev_num': shremote_cfg['hosts']['server']['dev_num'], 'cpus': srv_cpus,
+            'preemption_tick': int(params.get('preemption-tick', 5000)), 'schedule': params['schedule'],
+        }
+    elif args.system == 'shenango':
+        server_args = {
+            'server_ip': server_net['ip'], 'server_mac': server_net['mac'],
+            'client_ips': client_args['client_ips'], 'client_macs': client_args['client_macs'],
+            'runtime_kthreads': 14, 'runtime_guaranteed_kthreads': 14, 'runtime_spinning_kthreads': 14,
+            'policy': params.get('policy', 'CFCFS'),
+        }
+    else:
+        server_args = {
+            'server_ip': server_net['ip'], 'server_mac': server_net['mac'], 'cpus': srv_cpus,
+            'log_dir': client_args['log_dir'], 'dpdk_dev_num': client_args['dpdk_dev_num'],
+            'dpdk_prefix': client_args['dpdk_prefix'], 'dp_pol': params['srv-dp'],
+            'app_type': params['app'], 'n_resas': int(params.get('n-resas', -1)),
+            'schedule': params['schedule'],
+        }
+    server_file = os.path.basename(shremote_cfg['files']['server_cfg']['src'])
+    clients_file = os.path.basename(shremote_cfg['meta_files']['client_cfg']['src'])
+    return {
+        'system': args.system,
+        'server_output': os.path.join(output_dir, server_file),
+        'clients_output': os.path.join(output_dir, clients_file),
+        'server_args': server_args, 'client_args': client_args,
+    }
+
+def write_configs(jobs, cfgs={'default': CFG}):
+    # Configs of each (DP, LOAD) job, for every testbed it may run on
+    runs = []
+    for DP, LOAD in jobs:
+        for testbed, cfg in cfgs.items():
+            os.makedirs(configs_dir(DP, LOAD, testbed), exist_ok=True)
+            runs.append(run_configs(DP, LOAD, cfg, testbed))
+    psp_configs.write_batch_configs(runs)
+    if runs:
+        log_info(f'Generated the configs of {len(runs)} runs under {CONFIGS}')
+
+##############################################
+###############TESTBED RUNNER#################
+# Run the sweep on several independent testbeds (server and client host
+# groups) at once. A testbed is a set of include overrides for the Shremote
+# config, e.g. {hosts: config/2hosts.yml}. Each testbed runs one experiment at
+# a time, taking the next one that is pending as soon as it is free, and a
+# failed run goes back to the pending list for a testbed that has not tried
+# it yet. Shremote's output goes to one log file per run under
+# <base-output>/logs.
+
+def testbed_cfgs(testbeds_file):
+    with open(testbeds_file, 'r') as f:
+        testbeds = yaml.load(f, Loader=yaml.FullLoader)
+    with open(CFG, 'r') as f:
+        cfg_lines = f.readlines()
+    cfgs = {}
+    for name, includes in testbeds.items():
+        lines = []
+        for line in cfg_lines:
+            key = line.split(':')[0]
+            if key in includes and '!include' in line:
+                line = f'{key}: !include "{includes[key]}"\n'
+            lines.append(line)
+        # Next to CFG, so that its relative includes still resolve
+        cfg = os.path.join(DIR, f'.{name}.{os.path.basename(CFG)}')
+        with open(cfg, 'w') as f:
+            f.writelines(lines)
+        cfgs[name] = cfg
+    return cfgs
+
+async def run_exp_async(DP, LOAD, testbed, cfg):
+    TITLE = exp_title(DP, LOAD)
+    log_dir = os.path.join(BASE_OUTPUT, 'logs')
+    os.makedirs(log_dir, exist_ok=True)
+    log_path = os.path.join(log_dir, f'{TITLE}.{testbed}.log')
+    log_info(f'[{testbed}] running {TITLE} (log: {log_path})')
+    with open(log_path, 'w') as log_file:
+        returncode = await run_shremote(shremote_cmd(DP, LOAD, cfg, testbed), log_file)
+    if returncode != 0:
+        log_error(f'[{testbed}] {TITLE} failed with exit code {returncode}')
+        return False
+    return await finish_run(DP, LOAD)
+
+def run_on_testbeds(plan, cfgs):
+    pending = []
+    tried = {}
+    running = []
+
+    def next_job(testbed):
+        for job in pending:
+            # Prefer testbeds that did not fail this run already
+            if testbed not in tried[job] or len(tried[job]) >= len(cfgs):
+                pending.remove(job)
+                return job
+        return None
+
+    async def testbed_worker(testbed, cfg):
+        while pending or running:
+            job = next_job(testbed)
+            if job is None:
+                await asyncio.sleep(1)
+                continue
+            running.append(job)
+            tried[job].append(testbed)
+            success = await run_exp_async(*job, testbed, cfg)
+            if not success:
+                if len(tried[job]) <= args.retries:
+                    pending.append(job)
+                else:
+                    log_error(f'Giving up on {exp_title(*job)} after {len(tried[job])} attempts')
+            running.remove(job)
+
+    async def run_all():
+        for DP, LOAD, _ in plan:
+            if not await skip_complete(DP, LOAD):
+                pending.append((DP, LOAD))
+                tried[(DP, LOAD)] = []
+        write_configs(pending, cfgs)
+        log_info(f'Running {len(pending)} experiments on {len(cfgs)} testbeds')
+        await asyncio.gather(*[testbed_worker(testbed, cfg) for testbed, cfg in cfgs.items()])
+
+    asyncio.run(run_all())
+    return [f'{BASE_OUTPUT}/{TITLE}' for _, _, TITLE in plan]
+
+##############################################
+#################LOAD SEARCH##################
+# Instead of the full grid, look for the knee of each policy's curve: probe
+# the load range with coarse steps until a run saturates, then bisect between
+# the last healthy and the first saturated load down to --search-resolution.
+# A run is saturated when clients achieve less than --min-achieved of the
+# offered rate, or when a request type's p99.9 slowdown exceeds --max-slowdown.
+
+def type_service_times(schedule_file):
+    # Mean service time of each request type, weighted by phase duration
+    with open(schedule_file, 'r') as f:
+        schedule = yaml.load(f, Loader=yaml.FullLoader)
+    totals = {}
+    durations = {}
+    for phase in schedule:
+        for rtype, mean_ns in zip(phase['rtype'], phase['mean_ns']):
+            totals[rtype] = totals.get(rtype, 0) + mean_ns * phase['duration']
+            durations[rtype] = durations.get(rtype, 0) + phase['duration']
+    return {rtype: totals[rtype] / durations[rtype] for rtype in totals}
+
+def read_hist_counts(filename, counts):
+    # Add each type's bucket counts (keyed by bucket lower bound, in ns)
+    with open(filename, 'r') as f:
+        lines = f.readlines()
+    for (header, values) in zip(lines[::2], lines[1::2]):
+        values = values.split()
+        type_counts = counts.setdefault(values[0], {})
+        for bucket, count in zip(header.split()[5:], values[5:]):
+            type_counts[int(bucket)] = type_counts.get(int(bucket), 0) + int(count)
+
+def hist_quantile(type_counts, q, bucket_size=1000):
+    buckets = np.array(sorted(type_counts))
+    cum = np.cumsum([type_counts[b] for b in buckets])
+    i = min(np.searchsorted(cum, cum[-1] * q, side='left'), len(buckets) - 1)
+    return buckets[i] + bucket_size / 2
+
+def run_metrics(output_path, service_times):
+    # Achieved/offered ratio and worst p99.9 slowdown across request types, or
+    # None if the run did not produce results
+    offered = achieved = 0
+    counts = {}
+    for clt in range(int(args.n_clients)):
+        clt_dir = os.path.join(output_path, f'client{clt}')
+        rates_file = os.path.join(clt_dir, 'traces_rates')
+        hist_file = os.path.join(clt_dir, 'traces_hist')
+        if not os.path.exists(rates_file) or not os.path.exists(hist_file):
+            log_warn(f'No results in {clt_dir}')
+            return None
+        with open(rates_file, 'r') as f:
+            rates = f.readlines()[1].split()
+        offered += float(rates[0])
+        achieved += float(rates[1])
+        read_hist_counts(hist_file, counts)
+    slowdowns = [
+        hist_quantile(type_counts, .999) / service_times[rtype]
+        for rtype, type_counts in counts.items()
+        if rtype in service_times and sum(type_counts.values()) > 0
+    ]
+    if offered == 0 or not slowdowns:
+        return None
+    return achieved / offered, max(slowdowns)
+
+def saturated(metrics):
+    ratio, slowdown = metrics
+    return ratio < args.min_achieved or slowdown > args.max_slowdown
+
+def search_loads(DP, service_times):
+    runs = {}
+    def probe(LOAD):
+        if needs_run(DP, LOAD):
+            write_configs([(DP, LOAD)])
+        output_path = run_exp(DP, LOAD)
+        runs[LOAD] = output_path
+        metrics = run_metrics(output_path, service_times)
+        if metrics is None:
+            log_error(f'[{DP}] could not read results at load {LOAD:.2f}, stopping search')
+        else:
+            log_info(f'[{DP}] load {LOAD:.2f}: achieved/offered {metrics[0]:.3f}, '
+                     f'max p99.9 slowdown {metrics[1]:.1f}')
+        return metrics
+
+    # Coarse pass, up to the first saturated load
+    good, bad = None, None
+    for LOAD in np.arange(args.load_range[0], args.load_range[1], args.search_step):
+        LOAD = round(LOAD, 2)
+        if len(runs) >= args.max_runs:
+            break
+        metrics = probe(LOAD)
+        if metrics is None:
+            return [runs[l] for l in sorted(runs)]
+        if saturated(metrics):
+            bad = LOAD
+            break
+        good = LOAD
+    if bad is None:
+        if good is not None:
+            log_info(f'[{DP}] no saturation found up to load {good:.2f}')
+        return [runs[l] for l in sorted(runs)]
+    if good is None:
+        log_info(f'[{DP}] saturated at the lowest load {bad:.2f}')
+        return [runs[l] for l in sorted(runs)]
+
+    # Refinement pass: bisect the knee on a grid of search_resolution
+    res = args.search_resolution
+    while bad - good > res + 1e-9 and len(runs) < args.max_runs:
+        LOAD = round(round((good + bad) / 2 / res) * res, 2)
+        if LOAD <= good or LOAD >= bad:
+            break
+        metrics = probe(LOAD)
+        if metrics is None:
+            break
+        if saturated(metrics):
+            bad = LOAD
+        else:
+            good = LOAD
+    log_info(f'[{DP}] knee between loads {good:.2f} and {bad:.2f} ({len(runs)} runs)')
+    return [runs[l] for l in sorted(runs)]
+
+def plan_sweep():
+    # The full experiment matrix, in run order and without duplicates
+    plan = []
+    titles = set()
+    for LOAD in np.arange(args.load_range[0], args.load_range[1], .05):
+        for DP in args.policies:
+            TITLE = exp_title(DP, LOAD)
+            if TITLE in titles:
+                continue
+            titles.add(TITLE)
+            plan.append((DP, LOAD, TITLE))
+    return plan
+
+manifest = read_manifest()
+output_paths = []
+if args.plan:
+    plan = plan_sweep()
+    n_done = 0
+    for DP, LOAD, TITLE in plan:
+        output_path = f'{BASE_OUTPUT}/{TITLE}'
+        if run_complete(output_path):
+            status = 'complete'
+            n_done += 1
+        elif os.path.exists(output_path):
+            status = 'incomplete'
+        else:
+            status = 'missing'
+        print(f'{TITLE}\t{status}')
+    log_info(f'{n_done}/{len(plan)} experiments complete')
+elif args.search:
+    if args.testbeds:
+        log_warn('--testbeds only applies to sweeps, searching on the default testbed')
+    service_times = type_service_times(f'{SCHEDULES}{args.schedule}.yml')
+    for DP in args.policies:
+        output_paths.extend(search_loads(DP, service_times))
+else:
+    plan = plan_sweep()
+    if not args.force and not args.parse_test:
+        n_done = sum(run_complete(f'{BASE_OUTPUT}/{TITLE}') for _, _, TITLE in plan)
+        log_info(f'{n_done}/{len(plan)} experiments already complete, running {len(plan) - n_done}')
+    if args.testbeds:
+        output_paths.extend(run_on_testbeds(plan, testbed_cfgs(args.testbeds)))
+    else:
+        write_configs([(DP, LOAD) for DP, LOAD, _ in plan if needs_run(DP, LOAD)])
+        for DP, LOAD, TITLE in plan:
+            output_paths.append(run_exp(DP, LOAD))
+
+reap_ingest(block=True)
 
 for p in output_paths:
     print(p)
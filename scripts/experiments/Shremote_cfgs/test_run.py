@@ -0,0 +1,155 @@
+# run.py is a script: run it on a scratch output folder. Shremote is not
+# launched for complete experiments, and fails to start for the others.
+import filecmp
+import json
+import os
+import subprocess
+import sys
+import yaml
+
+DIR = os.path.dirname(os.path.abspath(__file__))
+RUN = os.path.join(DIR, 'run.py')
+PSP_CONFIGS = os.path.join(DIR, 'format_scripts', 'psp_configs.py')
+CLIENT_RESULTS = ['traces', 'traces_hist', 'traces_rates', 'traces_throughput']
+
+def run(base_output, *args):
+    return subprocess.run(
+        [sys.executable, RUN, '0', 'psp', 'SBIM2', '-b', str(base_output), '-L', '.5', '.56', *args],
+        stdout=subprocess.PIPE, stderr=subprocess.STDOUT, universal_newlines=True, timeout=60
+    )
+
+def write_outputs(base_output, title, files=CLIENT_RESULTS, n_clients=1):
+    for clt in range(n_clients):
+        folder = base_output / title / f'client{clt}'
+        folder.mkdir(parents=True, exist_ok=True)
+        for f in files:
+            (folder / f).write_text('x\n')
+
+def manifest_titles(base_output):
+    titles = []
+    with open(base_output / 'manifest.jsonl', 'r') as f:
+        for line in f:
+            try:
+                titles.append(json.loads(line)['title'])
+            except ValueError:
+                continue
+    return titles
+
+def test_plan_status(tmp_path):
+    write_outputs(tmp_path, 'DARC_0.50_SBIM2_14.0')
+    write_outputs(tmp_path, 'DARC_0.55_SBIM2_14.0', files=['traces', 'traces_hist'])
+    # An empty file does not count
+    write_outputs(tmp_path, 'CFCFS_0.50_SBIM2_14.0')
+    (tmp_path / 'CFCFS_0.50_SBIM2_14.0' / 'client0' / 'traces_rates').write_text('')
+    out = run(tmp_path, '--plan', '-p', 'DARC', 'CFCFS').stdout
+    assert 'DARC_0.50_SBIM2_14.0\tcomplete' in out
+    assert 'DARC_0.55_SBIM2_14.0\tincomplete' in out
+    assert 'CFCFS_0.50_SBIM2_14.0\tincomplete' in out
+    assert 'CFCFS_0.55_SBIM2_14.0\tmissing' in out
+    assert '1/4 experiments complete' in out
+
+def test_plan_counts_every_client(tmp_path):
+    write_outputs(tmp_path, 'DARC_0.50_SBIM2_14.0')
+    out = run(tmp_path, '--plan', '-c', '2').stdout
+    assert 'DARC_0.50_SBIM2_14.0\tincomplete' in out
+
+def test_sweep_resumes(tmp_path):
+    for title in ['DARC_0.50_SBIM2_14.0', 'DARC_0.55_SBIM2_14.0']:
+        write_outputs(tmp_path, title)
+    out = run(tmp_path).stdout
+    assert '2/2 experiments already complete, running 0' in out
+    assert 'Shremote exited' not in out
+    assert manifest_titles(tmp_path) == ['DARC_0.50_SBIM2_14.0', 'DARC_0.55_SBIM2_14.0']
+
+    # Recorded runs are not recorded again, and new ones are not lost after
+    # a partially written line (interrupted sweep)
+    with open(tmp_path / 'manifest.jsonl', 'a') as f:
+        f.write('{"title": "DARC_0.6')
+    write_outputs(tmp_path, 'CFCFS_0.50_SBIM2_14.0')
+    write_outputs(tmp_path, 'CFCFS_0.55_SBIM2_14.0')
+    run(tmp_path, '-p', 'DARC', 'CFCFS')
+    assert manifest_titles(tmp_path) == [
+        'DARC_0.50_SBIM2_14.0', 'DARC_0.55_SBIM2_14.0', 'CFCFS_0.50_SBIM2_14.0', 'CFCFS_0.55_SBIM2_14.0'
+    ]
+
+def test_sweep_runs_incomplete(tmp_path):
+    write_outputs(tmp_path, 'DARC_0.50_SBIM2_14.0')
+    write_outputs(tmp_path, 'DARC_0.55_SBIM2_14.0', files=['traces'])
+    out = run(tmp_path).stdout
+    assert '1/2 experiments already complete, running 1' in out
+    assert 'DARC_0.55_SBIM2_14.0 did not produce complete results' in out
+    assert manifest_titles(tmp_path) == ['DARC_0.50_SBIM2_14.0']
+
+    # --force reruns complete experiments too
+    out = run(tmp_path, '-f').stdout
+    assert 'already has complete results' not in out
+
+def test_testbeds_retry(tmp_path):
+    # A failed run is retried on the other testbed, then given up
+    write_outputs(tmp_path, 'DARC_0.50_SBIM2_14.0')
+    try:
+        out = run(tmp_path, '-t', os.path.join(DIR, 'config', 'testbeds.yml'), '-r', '1').stdout
+    finally:
+        for name in ['main', 'second']:
+            cfg = os.path.join(DIR, f'.{name}.psp.yml')
+            if os.path.exists(cfg):
+                os.remove(cfg)
+    assert 'Running 1 experiments on 2 testbeds' in out
+    assert 'Giving up on DARC_0.55_SBIM2_14.0 after 2 attempts' in out
+    assert sorted(os.listdir(tmp_path / 'logs')) == [
+        'DARC_0.55_SBIM2_14.0.main.log', 'DARC_0.55_SBIM2_14.0.second.log'
+    ]
+    assert manifest_titles(tmp_path) == ['DARC_0.50_SBIM2_14.0']
+
+def test_ingest_in_sweep(tmp_path):
+    # Complete runs are ingested in the background (the fake outputs fail to
+    # parse, which is reported once the sweep ends)
+    write_outputs(tmp_path, 'DARC_0.50_SBIM2_14.0')
+    write_outputs(tmp_path, 'DARC_0.55_SBIM2_14.0')
+    out = run(tmp_path, '-I').stdout
+    assert 'Ingestion of {} failed'.format(tmp_path / 'DARC_0.50_SBIM2_14.0') in out
+    assert (tmp_path / 'DARC_0.55_SBIM2_14.0' / 'ingest.log').exists()
+
+def read_config(name):
+    with open(os.path.join(DIR, 'config', name), 'r') as f:
+        return yaml.load(f, Loader=yaml.FullLoader)
+
+def test_sweep_configs(tmp_path):
+    # The configs of the runs to do are written before Shremote starts, as the
+    # psp_configs.py command of psp.yml's init_cmds used to write them
+    write_outputs(tmp_path, 'DARC_0.50_SBIM2_14.0')
+    run(tmp_path)
+    configs = tmp_path / 'configs' / 'default'
+    assert os.listdir(configs) == ['DARC_0.55_SBIM2_14.0']
+
+    server_net, client_net = read_config('server_net.yml'), read_config('client_net.yml')
+    expected = tmp_path / 'expected'
+    expected.mkdir()
+    subprocess.run([
+        sys.executable, PSP_CONFIGS, 'psp',
+        '--server-output', str(expected / 'server_cfg.yml'), '--clients-output', str(expected / 'client_cfg.yml'),
+        '--server-ip', server_net['ip'], '--server-mac', server_net['mac'],
+        '--client-ips', *client_net['ips'].split(), '--client-macs', *client_net['macs'].split(),
+        '--srv-cpus', *'2 4 6 8 10 12 14 16 18 20 22 24 26 28 30'.split(), '--clt-cpus', '2',
+        '--clt-threads', '1', '--server-workers', '14', '--log-dir', read_config('dirs.yml')['log_dir'],
+        '--dp-pol', 'DARC', '--app-type', 'MB',
+        '--dpdk-dev-num', read_config('hosts.yml')['client0']['dev_num'],
+        '--dpdk-prefix', read_config('ssh_config.yml')['user'],
+        '--schedule', os.path.join(DIR, 'schedules', 'SBIM2.yml'), '--load', '0.55', '--n-resas', '-1',
+    ], check=True, stdout=subprocess.DEVNULL)
+    generated = configs / 'DARC_0.55_SBIM2_14.0'
+    files = sorted(os.listdir(expected))
+    assert sorted(os.listdir(generated)) == files and len(files) == 7
+    assert filecmp.cmpfiles(expected, generated, files, shallow=False)[0] == files
+
+def test_testbeds_configs(tmp_path):
+    # One set of configs per testbed a run may go to
+    try:
+        run(tmp_path, '-t', os.path.join(DIR, 'config', 'testbeds.yml'), '-r', '0')
+    finally:
+        for name in ['main', 'second']:
+            cfg = os.path.join(DIR, f'.{name}.psp.yml')
+            if os.path.exists(cfg):
+                os.remove(cfg)
+    for testbed in ['main', 'second']:
+        assert sorted(os.listdir(tmp_path / 'configs' / testbed)) == ['DARC_0.50_SBIM2_14.0', 'DARC_0.55_SBIM2_14.0']
@@ -0,0 +1,185 @@
+#!/usr/bin/env python3
+# Benchmarks of the loader's stages on synthetic experiments.
+#
+# For each size, writes (once) a synthetic experiment with synth.py, then runs
+# each stage in a fresh process and records its wall time and peak memory
+# (resident set growth during the stage). Results are appended to a JSON lines
+# file, tagged with the git commit, so that runs across commits can be
+# compared with --compare. The result cache is disabled so that every stage
+# does the actual work.
+import exp_data
+import synth
+import trace_store
+from result_cache import ResultCache
+from collections import OrderedDict
+import multiprocessing
+import subprocess
+import argparse
+import platform
+import json
+import os
+import time
+import pandas as pd
+
+DIR = os.path.dirname(os.path.abspath(__file__))
+BENCH_SIZES = [1e5, 1e6, 1e7, 1e8]
+BENCH_DATA = '/tmp/psp-bench'
+
+def bench_read_profiling_node(exp, clients, rtypes):
+    return exp_data.read_profiling_node(exp, 'client0', verbose=False)
+
+def bench_parse_hist(exp, clients, rtypes):
+    return exp_data.parse_hist(rtypes, [exp], clients=clients)
+
+def bench_parse_rates(exp, clients, rtypes):
+    return exp_data.parse_rates([exp], clients=clients)
+
+def bench_prepare_traces(exp, clients, rtypes):
+    return exp_data.prepare_traces([exp], ['client-end-to-end'], clients=clients, reset_cache=True)
+
+def bench_prepare_pctl_data(exp, clients, rtypes):
+    return exp_data.prepare_pctl_data(rtypes, exps=[exp], clients=clients, reset_cache=True)
+
+def bench_agg_p99_over_time(exp, clients, rtypes, bin_width=1e8):
+    # The data preparation of plot_agg_p99_over_time, without plotting
+    setups = exp_data.prepare_traces(
+        [exp], ['client-end-to-end'], clients=clients, get_schedule_data=True,
+        bin_width=bin_width, reset_cache=True
+    )
+    return exp_data.time_binned_pctls(
+        setups[exp]['bins'], bin_width=bin_width, quantiles=[.999], include_all=False,
+        origin=setups[exp]['bin_origin']
+    )
+
+STAGES = OrderedDict([
+    ('read_profiling_node', bench_read_profiling_node),
+    ('parse_hist', bench_parse_hist),
+    ('parse_rates', bench_parse_rates),
+    ('prepare_traces', bench_prepare_traces),
+    ('prepare_pctl_data', bench_prepare_pctl_data),
+    ('agg_p99_over_time', bench_agg_p99_over_time),
+])
+
+def read_status_kb(field):
+    with open('/proc/self/status', 'r') as f:
+        for line in f:
+            if line.startswith(field + ':'):
+                return int(line.split()[1])
+    return 0
+
+def _run_stage(conn, stage, base_folder, exp, clients, rtypes):
+    exp_data.exp_base_folder = base_folder
+    exp_data.cache = ResultCache(max_bytes=0, use_disk=False)
+    # Reset the peak resident set size to the current one
+    with open('/proc/self/clear_refs', 'w') as f:
+        f.write('5')
+    rss0 = read_status_kb('VmRSS')
+    t0 = time.time()
+    STAGES[stage](exp, clients, rtypes)
+    seconds = time.time() - t0
+    conn.send({'seconds': seconds, 'peak_rss_mb': (read_status_kb('VmHWM') - rss0) / 1024})
+    conn.close()
+
+def run_stage(stage, base_folder, exp, clients, rtypes):
+    # In a child process, so that stages do not share memory or warm state
+    ctx = multiprocessing.get_context('fork')
+    parent_conn, child_conn = ctx.Pipe()
+    p = ctx.Process(target=_run_stage, args=(child_conn, stage, base_folder, exp, clients, rtypes))
+    p.start()
+    child_conn.close()
+    try:
+        result = parent_conn.recv()
+    except EOFError:
+        # The stage failed (or ran out of memory)
+        result = None
+    p.join()
+    return result
+
+def git_revision():
+    try:
+        commit = subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], cwd=DIR).decode().strip()
+        dirty = subprocess.check_output(['git', 'status', '--porcelain', '--untracked-files=no'], cwd=DIR)
+        return commit + ('-dirty' if dirty else '')
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+
+def bench_exp(workload, n_workers=14):
+    return f'DARC_0.80_{workload}_{n_workers}.0'
+
+def prepare_bench_data(n_rows, data_dir=BENCH_DATA, workload='SBIM2', n_clients=1, columnar=False):
+    # Synthetic experiment of n_rows, reused while its parameters are unchanged
+    base_folder = os.path.join(data_dir, f'{workload}_{n_rows}_{n_clients}', '')
+    exp = bench_exp(workload)
+    synth_file = os.path.join(base_folder, exp, synth.SYNTH_FILE)
+    params = None
+    if os.path.exists(synth_file):
+        with open(synth_file, 'r') as f:
+            params = json.load(f)
+    if params is None or params['n_rows'] != n_rows or params['n_clients'] != n_clients:
+        synth.write_synthetic_exp(exp, n_rows, base_folder=base_folder, n_clients=n_clients)
+    if columnar:
+        trace_store.convert_exp(exp, base_folder, verbose=False)
+    return base_folder, exp
+
+def run_benchmarks(sizes=BENCH_SIZES, stages=list(STAGES), data_dir=BENCH_DATA, workload='SBIM2',
+                   n_clients=1, columnar=False, repeat=1, results_file=None):
+    revision = git_revision()
+    rtypes = synth.workload_schedule(workload)[0]['rtype']
+    clients = list(range(n_clients))
+    results = []
+    for n_rows in sizes:
+        n_rows = int(n_rows)
+        base_folder, exp = prepare_bench_data(n_rows, data_dir, workload, n_clients, columnar)
+        for stage in stages:
+            runs = [run_stage(stage, base_folder, exp, clients, rtypes) for _ in range(repeat)]
+            runs = [r for r in runs if r is not None]
+            if not runs:
+                print(f'[{stage}] Failed on {n_rows} rows')
+                continue
+            best = min(runs, key=lambda r: r['seconds'])
+            result = {
+                'revision': revision, 'date': time.strftime('%Y-%m-%d %H:%M:%S'),
+                'host': platform.node(), 'stage': stage, 'n_rows': n_rows, 'n_clients': n_clients,
+                'workload': workload, 'format': 'parquet' if columnar else 'text',
+                'seconds': best['seconds'], 'peak_rss_mb': max(r['peak_rss_mb'] for r in runs),
+                'rows_per_second': n_rows / best['seconds'],
+            }
+            print(f"[{stage}] {n_rows} rows: {result['seconds']:.3f} seconds, {result['peak_rss_mb']:.1f} MB")
+            results.append(result)
+            if results_file is not None:
+                with open(results_file, 'a') as f:
+                    f.write(json.dumps(result) + '\n')
+    return results
+
+def compare_results(results_file, value='seconds'):
+    # One column per revision (its latest results), one row per stage and size
+    df = pd.read_json(results_file, lines=True)
+    df = df.sort_values('date').drop_duplicates(['revision', 'stage', 'n_rows', 'format'], keep='last')
+    revisions = list(OrderedDict.fromkeys(df.revision))
+    table = df.pivot_table(index=['format', 'stage', 'n_rows'], columns='revision', values=value)
+    return table[revisions]
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmark the loader on synthetic experiments')
+    parser.add_argument('-s', '--sizes', nargs='+', type=float, default=BENCH_SIZES, help='numbers of rows')
+    parser.add_argument('-S', '--stages', nargs='+', default=list(STAGES), choices=list(STAGES))
+    parser.add_argument('-d', '--data-dir', type=str, default=BENCH_DATA)
+    parser.add_argument('-W', '--workload', type=str, default='SBIM2')
+    parser.add_argument('-c', '--n-clients', type=int, default=1)
+    parser.add_argument('--columnar', action='store_true', help='benchmark on the parquet copies of the traces')
+    parser.add_argument('-r', '--repeat', type=int, default=1, help='runs per stage (best time is kept)')
+    parser.add_argument('-o', '--results', type=str, default=None, help='JSON lines file to append results to (default: <data-dir>/results.jsonl)')
+    parser.add_argument('--compare', action='store_true', help='print the saved results of each revision, then exit')
+    parser.add_argument('--value', type=str, default='seconds', choices=['seconds', 'peak_rss_mb', 'rows_per_second'])
+    args = parser.parse_args()
+
+    results_file = args.results or os.path.join(args.data_dir, 'results.jsonl')
+    if args.compare:
+        with pd.option_context('display.max_rows', None, 'display.width', 200):
+            print(compare_results(results_file, args.value))
+    else:
+        os.makedirs(args.data_dir, exist_ok=True)
+        run_benchmarks(
+            sizes=args.sizes, stages=args.stages, data_dir=args.data_dir, workload=args.workload,
+            n_clients=args.n_clients, columnar=args.columnar, repeat=args.repeat, results_file=results_file
+        )
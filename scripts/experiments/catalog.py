@@ -0,0 +1,209 @@
+#!/usr/bin/env python3
+# Catalog of the experiments under a base folder.
+#
+# A scan parses each experiment folder's name once (policy, load, workload,
+# workers, reservations, run number), reads its schedule and records its
+# clients and which outputs they have (histograms, full traces, columnar
+# copies, server windows, summary), with their sizes. Entries are kept in a
+# sqlite database in the base folder, together with a signature of each
+# folder's files, so that a re-scan only re-reads new or changed experiments
+# and drops deleted ones.
+#
+# Queries are dicts of field: condition, where a condition is a value, a list
+# of values, or a (low, high) tuple of inclusive bounds, e.g. all DARC runs of
+# SBIM2 between 0.8 and 1.0 load:
+#   {'policy': 'DARC', 'workload': 'SBIM2', 'load': (.8, 1.)}
+from result_cache import files_signature
+from pathlib import Path
+import argparse
+import hashlib
+import sqlite3
+import json
+import yaml
+import os
+import time
+
+CATALOG_FILE = 'catalog.db'
+# Catalogs of another version are re-scanned from scratch
+CATALOG_VERSION = 1
+# Field name and sqlite type of the catalog entries
+FIELDS = [
+    ('name', 'TEXT PRIMARY KEY'),
+    ('system', 'TEXT'),
+    ('policy', 'TEXT'),
+    ('load', 'REAL'),
+    ('workload', 'TEXT'),
+    ('n_workers', 'INTEGER'),
+    ('n_resas', 'INTEGER'),
+    ('run_number', 'INTEGER'),
+    ('n_clients', 'INTEGER'),
+    ('n_phases', 'INTEGER'),
+    ('schedule', 'TEXT'),
+    ('has_hist', 'INTEGER'),
+    ('has_traces', 'INTEGER'),
+    ('has_columnar', 'INTEGER'),
+    ('has_windows', 'INTEGER'),
+    ('has_summary', 'INTEGER'),
+    ('traces_bytes', 'INTEGER'),
+    ('total_bytes', 'INTEGER'),
+    ('signature', 'TEXT'),
+    ('scanned', 'TEXT'),
+]
+FIELD_NAMES = [f for f, _ in FIELDS]
+
+def parse_exp_name(exp):
+    # Fields of a run title (see exp_title in run.py), e.g. DARC_0.80_SBIM2_14.0
+    # or, with manual DARC reservations, DARC_0.80_SBIM2_14_2.0. n_resas is -1
+    # without manual reservations, as run.py's --darc-manual.
+    fields = exp.split('_')
+    policy = fields[0]
+    return {
+        'name': exp,
+        'system': 'shenango' if policy.startswith('shen-') else 'psp',
+        'policy': policy,
+        'load': float(fields[1]),
+        'workload': fields[2].split('.')[0],
+        'n_workers': int(fields[3].split('.')[0]),
+        'n_resas': int(fields[4].split('.')[0]) if len(fields) > 4 else -1,
+        'run_number': int(exp.split('.')[2]),
+    }
+
+def client_folders(exp_folder):
+    return sorted(
+        (f for f in Path(exp_folder).glob('client*') if f.is_dir() and f.name[6:].isdigit()),
+        key=lambda f: int(f.name[6:])
+    )
+
+def has_all(folders, filename):
+    return int(bool(folders) and all((f / filename).is_file() for f in folders))
+
+def exp_entry(exp_folder):
+    # Catalog entry of an experiment folder, None if it is not one
+    exp_folder = Path(exp_folder)
+    try:
+        entry = parse_exp_name(exp_folder.name)
+    except (ValueError, IndexError):
+        return None
+    clients = client_folders(exp_folder)
+    if not clients:
+        return None
+
+    schedule = None
+    sched_file = exp_folder / (entry['workload'] + '.yml')
+    if sched_file.is_file():
+        with open(sched_file, 'r') as f:
+            schedule = yaml.load(f, Loader=yaml.FullLoader)
+    sig = files_signature([exp_folder], sources_only=False)
+    entry.update({
+        'n_clients': len(clients),
+        'n_phases': len(schedule) if schedule else None,
+        'schedule': json.dumps(schedule) if schedule else None,
+        'has_hist': has_all(clients, 'traces_hist'),
+        'has_traces': has_all(clients, 'traces'),
+        'has_columnar': has_all(clients, 'traces.parquet'),
+        'has_windows': int((exp_folder / 'server' / 'windows').is_file()),
+        'has_summary': int((exp_folder / 'summary.json').is_file()),
+        'traces_bytes': sum(size for path, size, _ in sig if Path(path).name == 'traces'),
+        'total_bytes': sum(size for _, size, _ in sig),
+        'signature': hashlib.sha1(repr(sig).encode()).hexdigest(),
+        'scanned': time.strftime('%Y-%m-%d %H:%M:%S'),
+    })
+    return entry
+
+def query_clause(query):
+    # SQL condition and parameters of a query dict
+    clauses = []
+    params = []
+    for field, cond in sorted(query.items()):
+        if field not in FIELD_NAMES:
+            raise ValueError(f'Unknown catalog field {field} (known: {FIELD_NAMES})')
+        if isinstance(cond, tuple):
+            clauses.append(f'{field} BETWEEN ? AND ?')
+            params.extend(cond)
+        elif isinstance(cond, list):
+            clauses.append(f'{field} IN ({", ".join("?" * len(cond))})')
+            params.extend(cond)
+        else:
+            clauses.append(f'{field} = ?')
+            params.append(cond)
+    return ' AND '.join(clauses) or '1', params
+
+class Catalog:
+    def __init__(self, base_folder, db_path=None):
+        self.base_folder = base_folder
+        self.db_path = db_path or os.path.join(base_folder, CATALOG_FILE)
+        self.db = sqlite3.connect(self.db_path)
+        self.db.row_factory = sqlite3.Row
+        if self.db.execute('PRAGMA user_version').fetchone()[0] != CATALOG_VERSION:
+            with self.db:
+                self.db.execute('DROP TABLE IF EXISTS exps')
+                self.db.execute(f'PRAGMA user_version = {CATALOG_VERSION}')
+        self.db.execute(f'CREATE TABLE IF NOT EXISTS exps ({", ".join(f"{f} {t}" for f, t in FIELDS)})')
+
+    def close(self):
+        self.db.close()
+
+    def scan(self, verbose=False):
+        # Index new and changed experiment folders, drop deleted ones
+        t0 = time.time()
+        known = {row['name']: row['signature'] for row in self.db.execute('SELECT name, signature FROM exps')}
+        folders = [f for f in Path(self.base_folder).iterdir() if f.is_dir()]
+        n_updated = 0
+        with self.db:
+            for folder in folders:
+                if folder.name in known:
+                    sig = files_signature([folder], sources_only=False)
+                    if hashlib.sha1(repr(sig).encode()).hexdigest() == known[folder.name]:
+                        continue
+                entry = exp_entry(folder)
+                if entry is None:
+                    continue
+                self.db.execute(
+                    f'INSERT OR REPLACE INTO exps ({", ".join(FIELD_NAMES)}) VALUES ({", ".join("?" * len(FIELDS))})',
+                    [entry[f] for f in FIELD_NAMES]
+                )
+                n_updated += 1
+            names = set(f.name for f in folders)
+            deleted = [name for name in known if name not in names]
+            self.db.executemany('DELETE FROM exps WHERE name = ?', [(name,) for name in deleted])
+        if verbose:
+            print(f'[{self.base_folder}] Indexed {n_updated} experiments, dropped {len(deleted)} in {time.time() - t0:.2f} seconds')
+        return n_updated, len(deleted)
+
+    def query(self, query={}):
+        # Matching entries, as dicts, ordered like the sweeps
+        where, params = query_clause(query)
+        rows = self.db.execute(
+            f'SELECT * FROM exps WHERE {where} ORDER BY workload, policy, load, n_resas, run_number', params
+        )
+        return [dict(row) for row in rows]
+
+    def exps(self, query={}):
+        return [entry['name'] for entry in self.query(query)]
+
+def parse_cli_query(conditions):
+    # field=value, field=low:high or field=a,b,c
+    query = {}
+    for cond in conditions:
+        field, value = cond.split('=', 1)
+        if ':' in value:
+            query[field] = tuple(float(v) for v in value.split(':'))
+        elif ',' in value:
+            query[field] = value.split(',')
+        else:
+            query[field] = value
+    return query
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Index and query the experiments of a base folder')
+    parser.add_argument('query', nargs='*', help='conditions, e.g. policy=DARC workload=SBIM2 load=0.8:1.0')
+    parser.add_argument('-b', '--base-folder', type=str, default='/psp/experiments-data/')
+    parser.add_argument('--no-scan', action='store_true', help='query the catalog as it is')
+    args = parser.parse_args()
+
+    catalog = Catalog(args.base_folder)
+    if not args.no_scan:
+        catalog.scan(verbose=True)
+    for entry in catalog.query(parse_cli_query(args.query)):
+        print('\t'.join(str(entry[f]) for f in ['name', 'n_clients', 'has_hist', 'has_traces', 'total_bytes']))
+    catalog.close()
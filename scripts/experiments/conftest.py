@@ -0,0 +1,25 @@
+# Shared fixtures of the loader's tests. Run them with
+#   python -m pytest -q scripts/experiments
+import exp_data
+import synth
+from result_cache import ResultCache
+import numpy as np
+import pytest
+
+@pytest.fixture
+def rng():
+    return np.random.default_rng(0)
+
+@pytest.fixture
+def base_folder(tmp_path, monkeypatch):
+    # An empty experiments folder, and a memory-only cache
+    monkeypatch.setattr(exp_data, 'exp_base_folder', str(tmp_path) + '/')
+    monkeypatch.setattr(exp_data, 'cache', ResultCache(use_disk=False))
+    return str(tmp_path)
+
+@pytest.fixture
+def synthetic_exp(base_folder):
+    # Two clients running a two-phase DARC schedule
+    exp = 'DARC_0.80_SBIM2_14.0'
+    synth.write_synthetic_exp(exp, 20000, base_folder=base_folder, n_clients=2, n_phases=2, verbose=False)
+    return exp
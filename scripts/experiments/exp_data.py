@@ -0,0 +1,1518 @@
+# Parsing and statistics of experiment outputs, without any plotting dependency.
+#
+# loader.py re-exports everything below for the notebook, and adds the plot_*
+# functions. Batch jobs (ingest.py, process pool workers) only need this
+# module, so set exp_base_folder and cache here rather than on loader.
+import pandas as pd
+from pandas.api.types import union_categoricals
+import numpy as np
+from pathlib import Path
+import os
+import sys
+import csv
+import time
+import yaml
+import functools
+import json
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+import trace_store
+import catalog
+import reservations
+from result_cache import ResultCache, files_signature
+from sketch import TraceSketches, QuantileSketch, LogLinearHistogram
+
+# Parsed results, kept in memory (LRU under cache.max_bytes) and on disk
+cache = ResultCache()
+
+exp_base_folder = '/psp/experiments-data/'
+
+distros = {
+    'Figure3': 'DISP2',
+    'Figure4_a': 'DISP2',
+    'Figure4_b': 'SBIM2',
+    'Figure5_a': 'DISP2',
+    'Figure5_b': 'SBIM2',
+    'Figure6': 'TPCC',
+    'Figure7': 'ROCKSDB'
+}
+
+workloads = {
+    'BIM1': {
+        'avg_s': 1,
+        'name': '90.0:0.5 -- 10.0:5.5',
+        'max_load': 14000000,
+        'distribution': 'bimodal-90.0:0.5-10.0:5.5',
+        'SHORT': { 'MEAN': .5, 'RATIO': .9, 'YLIM': 60 },
+        'LONG': { 'MEAN': 5.5, 'RATIO': .1, 'YLIM': 60 },
+        'UNKNOWN': { 'MEAN': 1, 'RATIO': 1, 'YLIM': 60 }
+    },
+    'BIM2': {
+        'avg_s': 1,
+        'max_load': 14000000,
+        'name': '99.9:0.5-0.1:500.5',
+        'distribution': 'bimodal-99.9:0.5-0.1:500.5',
+        'SHORT': { 'MEAN': .5, 'RATIO': .999, 'YLIM': 400 },
+        'LONG': { 'MEAN': 500.5, 'RATIO': .001, 'YLIM': 1500 },
+        'UNKNOWN': { 'MEAN': 1, 'RATIO': 1, 'YLIM': 1500 }
+    },
+    'SBIM2': {
+        'avg_s': 2.9975,
+        'max_load': 4670558,
+        'name': '99.5:0.5-0.05:500',
+        'distribution': 'bimodal-99.5:0.5-0.5:500.0',
+        'SHORT': { 'MEAN': .5, 'RATIO': .995, 'YLIM': 300 },
+        'LONG': { 'MEAN': 500, 'RATIO': .005, 'YLIM': 3600 },
+        'UNKNOWN': { 'MEAN': 2.9975, 'RATIO': 1, 'YLIM': 3600 }
+    },
+    'DISP1': {
+        'avg_s': 5.5,
+        'name': '50.0:1.0 -- 50.0:10.0',
+        'max_load': 2545454,
+        'distribution': 'bimodal-50.0:1.0-50.0:10.0',
+        'SHORT': { 'MEAN': 1, 'RATIO': .5, 'YLIM': 50 },
+        'LONG': { 'MEAN': 10, 'RATIO': .5, 'YLIM': 300 },
+        'UNKNOWN': { 'MEAN': 5.5, 'RATIO': 1, 'YLIM': 300
+        }
+    },
+    'DISP2': {
+        'avg_s': 50.5,
+        'name': '50.0:1.0 -- 50.0:100.0',
+        'max_load': 277227,
+        'distribution': 'bimodal-50.0:1.0-50.0:100.0',
+        'SHORT': { 'MEAN': 1.0, 'RATIO': .5, 'YLIM': 300 },
+        'LONG': { 'MEAN': 100.0, 'RATIO': .5, 'YLIM': 300 },
+        'UNKNOWN': { 'MEAN': 50.5, 'RATIO': 1, 'YLIM': 300 }
+    },
+    'DISP3': {
+        'avg_s': 50.950,
+        'name': '95.0.0:1.0 -- 0.5:100.0',
+        'max_load': 274779,
+        'distribution': 'bimodal-95.0:1.0-0.5:100.0',
+        'SHORT': { 'MEAN': 1.0, 'RATIO': .95, 'YLIM': 300 },
+        'LONG': { 'MEAN': 100.0, 'RATIO': .5, 'YLIM': 300 },
+        'UNKNOWN': { 'MEAN': 50.5, 'RATIO': 1, 'YLIM': 300 }
+    },
+    'ROCKSDB': {
+        'avg_s': 526,
+        'name': 'ROCKSDB',
+        'max_load': 45000,
+        'distribution': 'bimodal-50.0:0.0-50.0:0.0',
+        'GET': { 'MEAN': 2.0, 'RATIO': .5, 'YLIM': 300 },
+        'SCAN': { 'MEAN': 1050.0, 'RATIO': .5, 'YLIM': 1000 },
+        'UNKNOWN': { 'MEAN': 526, 'RATIO': 1, 'YLIM': 200 }
+    },
+    'TPCC': {
+        'avg_s': 19,
+        'name': 'TPC-C',
+        'max_load': 735000,
+        'distribution': 'tpcc',
+        'NewOrder': { 'MEAN': 20, 'RATIO': .44, 'YLIM': 250 },
+        'Payment': { 'MEAN': 5.7, 'RATIO': .44, 'YLIM': 250 },
+        'Delivery': { 'MEAN': 88, 'RATIO': .04, 'YLIM': 250 },
+        'OrderStatus': { 'MEAN': 6, 'RATIO': .04, 'YLIM': 250 },
+        'StockLevel': { 'MEAN': 100, 'RATIO': .04, 'YLIM': 250 },
+        'UNKNOWN': { 'MEAN': 19, 'RATIO': 1, 'YLIM': 50 }
+    }
+}
+
+apps = {
+    'TPCC': ['Payment', 'OrderStatus', 'NewOrder', 'Delivery', 'StockLevel'],
+    'MB': ['SHORT', 'LONG'],
+    'REST': ['PAGE', 'REGEX'],
+    'ROCKSDB': ['GET', 'SCAN'],
+}
+
+policies = {
+    'DFCFS': 'd-FCFS',
+    'CFCFS': 'c-FCFS',
+    'shen-DFCFS': 'shen-DFCFS',
+    'shen-CFCFS': 'shen-CFCFS',
+    'SJF': 'ARS-FP',
+    'EDF': 'EDF',
+#     'CSCQ-half': 'CSCQ-half',
+#     'CSCQ': 'ARS-CS',
+#     'EDFNP': 'ARS-EDF',
+     'cPRESQ': 'cPRESQ',
+    'cPREMQ': 'cPREMQ',
+    'DARC': 'DARC'
+}
+
+# For final print
+pol_names = {
+    'DARC': 'DARC',
+    'c-FCFS': 'c-FCFS',
+    'd-FCFS': 'd-FCFS',
+    'cPREMQ': 'c-PRE',
+    'cPRESQ': 'c-PRE',
+    'ARS-FP': 'FP',
+    'EDF': 'EDF',
+    'shen-DFCFS': 'd-FCFS',
+    'shen-CFCFS': 'c-FCFS'
+}
+
+system_pol = {
+    'DFCFS': 'Perséphone',
+    'CFCFS': 'Perséphone',
+    'shen-DFCFS': 'Shenango',
+    'shen-CFCFS': 'Shenango',
+    'SJF': 'Perséphone',
+    'CSCQ-half': 'Perséphone',
+    'CSCQ': 'Perséphone',
+    'EDF': 'Perséphone',
+    'cPRESQ': 'Shinjuku',
+    'cPREMQ': 'Shinjuku',
+    'DARC': 'Perséphone'
+}
+
+trace_label_to_dtype = {
+    'client-end-to-end' : ['SENDING', 'COMPLETED'],
+    'client-receive'    : ['READING', 'COMPLETED'],
+    'client-send'       : ['SENDING', 'READING'],
+}
+
+CLT_TRACE_ORDER = [
+    'SENDING',
+    'READING',
+    'COMPLETED'
+]
+
+def _run_exp_task(base_folder, fn, exp, **kwargs):
+    # Workers may not have inherited a base folder changed after import
+    global exp_base_folder
+    exp_base_folder = base_folder
+    return fn(exp, **kwargs)
+
+def map_exps(fn, exps, n_workers=1, **kwargs):
+    # Apply fn(exp, **kwargs) to each experiment, in a pool of n_workers
+    # processes if n_workers > 1 (-1 for one per core). Results are returned in
+    # the order of exps, whatever the order in which workers complete.
+    if n_workers == -1:
+        n_workers = os.cpu_count()
+    if n_workers is None or n_workers <= 1 or len(exps) <= 1:
+        return [fn(exp, **kwargs) for exp in exps]
+    task = functools.partial(_run_exp_task, exp_base_folder, fn, **kwargs)
+    with ProcessPoolExecutor(max_workers=min(n_workers, len(exps))) as executor:
+        return list(executor.map(task, exps))
+
+def read_profiling_node(exp, app, orders=CLT_TRACE_ORDER, verbose=True):
+    # First get traces
+    exp_folder = os.path.join(exp_base_folder, exp, app, '')
+    filename = os.path.join(exp_folder, 'traces')
+    # Prefer the columnar copy made by trace_store.py
+    if trace_store.has_columnar_copy(filename):
+        if verbose:
+            print(f"Reading {trace_store.columnar_path(filename)}")
+        cols = list(orders) + ['REQ_ID', 'REQ_TYPE', 'MEAN_NS', 'SCHED_ID']
+        app_trace_df = trace_store.read_traces(filename, columns=cols)
+        if verbose:
+            print(f'{app} traces shape: {app_trace_df.shape}')
+        return app_trace_df
+    if not Path(filename).is_file():
+        print('{} does not exist. Skipping {} {} traces.'.format(filename, exp, app))
+        return pd.DataFrame()
+    if verbose:
+        print(f"Parsing {filename}")
+
+    # With the dtypes of the columnar copy, whether the trace was converted or not
+    cols = list(orders) + ['REQ_ID', 'REQ_TYPE', 'MEAN_NS', 'SCHED_ID']
+    app_trace_df = trace_store.read_text_traces(filename, columns=cols)
+    if verbose:
+        print(f'{app} traces shape: {app_trace_df.shape}')
+    return app_trace_df
+
+def merge_sorted_frames(frames, key):
+    # Each frame is (nearly) sorted on key already. A stable argsort is a
+    # timsort, which detects those presorted runs and merges them, so this is a
+    # k-way merge in O(n log k) rather than a full sort.
+    frames = [f for f in frames if not f.empty]
+    if not frames:
+        return pd.DataFrame()
+    # Keep categorical columns categorical across frames with different categories
+    for col in frames[0].columns:
+        if isinstance(frames[0][col].dtype, pd.CategoricalDtype):
+            categories = union_categoricals([f[col] for f in frames]).categories
+            for f in frames:
+                f[col] = f[col].cat.set_categories(categories)
+    df = pd.concat(frames, ignore_index=True, copy=False)
+    order = np.argsort(df[key].values, kind='stable')
+    return df.take(order).reset_index(drop=True)
+
+def read_exp_time_range(exp, start, end, clients=None, req_types=None, sched_ids=None, verbose=True):
+    # Completed requests sent between start and end seconds after the
+    # experiment's first request, optionally of some REQ_TYPEs and SCHED_IDs.
+    # Only the blocks of the client traces that may hold them are read (see
+    # trace_store.read_time_range). TIME is counted from the first request, as
+    # in read_exp_traces.
+    t0 = time.time()
+    folders = ['client'] if clients is None else ['client'+str(clt) for clt in clients]
+    files = [os.path.join(exp_base_folder, exp, folder, 'traces') for folder in folders]
+    files = [f for f in files if Path(f).is_file() or trace_store.has_columnar_copy(f)]
+    firsts = [trace_store.first_sending(f) for f in files]
+    firsts = [t for t in firsts if t is not None]
+    if not firsts:
+        print(f'No traces for {exp}')
+        return pd.DataFrame()
+    origin = min(firsts)
+    cols = list(CLT_TRACE_ORDER) + ['REQ_ID', 'REQ_TYPE', 'MEAN_NS', 'SCHED_ID']
+    with ThreadPoolExecutor(max_workers=len(files)) as executor:
+        clt_dfs = list(executor.map(
+            lambda f: trace_store.read_time_range(
+                f, origin + int(start * 1e9), origin + int(end * 1e9), columns=cols,
+                req_types=req_types, sched_ids=sched_ids
+            ), files
+        ))
+    if clients is not None:
+        for clt, clt_df in zip(clients, clt_dfs):
+            clt_df['CLIENT'] = np.uint8(clt)
+    df = merge_sorted_frames(clt_dfs, 'SENDING')
+    if df.empty:
+        return df
+    df['TIME'] = df['SENDING'] - np.uint64(origin)
+    if verbose:
+        print(f'{exp}: read {df.shape[0]} rows sent between {start} and {end} seconds in {time.time() - t0:.3f} seconds')
+    return df
+
+def read_exp_traces(exp, verbose=True, clients=None, time_range=None):
+    if time_range is not None:
+        return read_exp_time_range(exp, *time_range, clients=clients, verbose=verbose)
+    if clients is None:
+        df = read_profiling_node(exp, 'client', verbose=verbose)
+        if not df.empty:
+            df['TIME'] = df['SENDING'] - df['SENDING'].min()
+        return df
+
+    # Fetch all client files concurrently (parquet and file IO release the GIL)
+    with ThreadPoolExecutor(max_workers=max(len(clients), 1)) as executor:
+        clt_dfs = list(executor.map(
+            lambda clt: read_profiling_node(exp, 'client'+str(clt), verbose=verbose), clients
+        ))
+    for clt, clt_df in zip(clients, clt_dfs):
+        if not clt_df.empty:
+            clt_df['CLIENT'] = np.uint8(clt)
+    # One time-ordered frame, with a single time origin shared by all clients
+    df = merge_sorted_frames(clt_dfs, 'SENDING')
+    if df.empty:
+        return df
+    df['TIME'] = df['SENDING'] - df['SENDING'].values[0]
+    if verbose:
+        print(f'{exp}: merged {len(clt_dfs)} clients into {df.shape[0]} rows')
+    return df
+
+def time_seconds(df):
+    # Prepared traces keep TIME in integer nanoseconds
+    return df.TIME / 1e9
+
+def setup_in_seconds(setup):
+    # A copy of a prepared setup whose trace frames have TIME in seconds, for
+    # callers of the former seconds=True (the cached setup keeps integer ns)
+    converted = {}
+    out = dict(setup)
+    for key in list(trace_label_to_dtype) + ['bins']:
+        df = setup.get(key)
+        if df is None:
+            continue
+        # 'bins' is the last data type's frame: convert it once
+        if id(df) not in converted:
+            converted[id(df)] = df.assign(TIME=time_seconds(df))
+        out[key] = converted[id(df)]
+    return out
+
+# Steady-state trimming. Runs ramp up as clients start and drain as they stop,
+# and each schedule phase starts with a transient. The steady window of each
+# phase is found on its completion rate (from traces_throughput) and, when the
+# traces are loaded, its mean latency, binned by TRIM_BIN_WIDTH ns. The rule is
+# MSER: drop the prefix (then, on the reversed series, the suffix) that
+# minimizes the standard error of the mean of what remains, up to
+# MAX_TRIM of the phase.
+TRIM_BIN_WIDTH = 1e7
+MAX_TRIM = .5
+
+def mser_start(x, max_trim=MAX_TRIM):
+    # var(x[d:]) / (n - d) for every truncation d at once, from reverse cumsums
+    x = np.asarray(x, dtype='float64')
+    n = x.shape[0]
+    if n < 4:
+        return 0
+    remaining = np.arange(n, 0, -1)
+    sums = np.cumsum(x[::-1])[::-1]
+    squares = np.cumsum((x * x)[::-1])[::-1]
+    scores = (squares / remaining - (sums / remaining) ** 2) / remaining
+    return int(np.argmin(scores[:max(1, int(n * max_trim))]))
+
+def steady_state(x, max_trim=MAX_TRIM):
+    # [start, end) indices of the steady part of series x
+    x = np.asarray(x, dtype='float64')
+    if np.isnan(x).any():
+        x = np.where(np.isnan(x), np.nanmean(x), x)
+    return mser_start(x, max_trim), x.shape[0] - mser_start(x[::-1], max_trim)
+
+def exp_completions(exp, clients, bin_width=TRIM_BIN_WIDTH):
+    # Completed requests per bin, counted from each client's first request
+    clients = [c for c in clients if Path(exp_base_folder, exp, f'client{c}', 'traces_throughput').exists()]
+    if not clients:
+        return np.zeros(0)
+    tp = read_client_tp(exp, clients)
+    return np.bincount((tp.TIME.values // bin_width).astype('int64'), weights=tp.N.values)
+
+def read_exp_schedule(exp):
+    # The schedule the clients ran (list of phases), copied in the output folder
+    sched_file = os.path.join(exp_base_folder, exp, exp.split('_')[2].split('.')[0] + '.yml')
+    with open(sched_file, 'r') as f:
+        return yaml.load(f, Loader=yaml.FullLoader)
+
+def phase_type_means(schedule):
+    # {(SCHED_ID, REQ_TYPE): mean service time in ns} of each phase
+    return {
+        (sid, t): mean_ns for sid, phase in enumerate(schedule) for t, mean_ns in zip(phase['rtype'], phase['mean_ns'])
+    }
+
+def schedule_phase_bounds(exp):
+    # Nominal [start, end) of each phase (in ns since the first request),
+    # from the durations of the schedule
+    schedule = read_exp_schedule(exp)
+    ends = np.cumsum([phase['duration'] for phase in schedule]) * 1e9
+    starts = np.insert(ends[:-1], 0, 0)
+    return {sid: (start, end) for sid, (start, end) in enumerate(zip(starts, ends))}
+
+def steady_windows(exp, clients, phase_bounds, latencies=None, bin_width=TRIM_BIN_WIDTH, max_trim=MAX_TRIM):
+    # {SCHED_ID: (start, end)} steady window (in ns since the first request)
+    # of each phase of phase_bounds. latencies: optional mean latency per bin.
+    completions = exp_completions(exp, clients, bin_width)
+    windows = {}
+    for sid, (start, end) in phase_bounds.items():
+        b0 = int(start // bin_width)
+        b1 = max(int(np.ceil(end / bin_width)), b0 + 1)
+        series = [np.pad(completions[b0:b1], (0, max(0, b1 - max(b0, completions.shape[0]))))]
+        if latencies is not None:
+            series.append(np.pad(latencies[b0:b1], (0, max(0, b1 - max(b0, latencies.shape[0]))), constant_values=np.nan))
+        s, e = 0, b1 - b0
+        for x in series:
+            xs, xe = steady_state(x, max_trim)
+            s, e = max(s, xs), min(e, xe)
+        if s >= e:
+            windows[sid] = (start, end)
+        else:
+            windows[sid] = (max(start, (b0 + s) * bin_width), min(end, (b0 + e) * bin_width))
+    return windows
+
+def steady_mask(times, sched_ids, windows):
+    # Rows sent in the steady window of their phase
+    n = max(int(sched_ids.max()) + 1 if sched_ids.shape[0] else 0, max(windows, default=-1) + 1)
+    starts = np.full(n, np.inf)
+    ends = np.full(n, -np.inf)
+    for sid, (start, end) in windows.items():
+        starts[sid], ends[sid] = start, end
+    sched_ids = sched_ids.astype('int64')
+    return (times >= starts[sched_ids]) & (times < ends[sched_ids])
+
+def prepare_traces(exps, data_types=list(trace_label_to_dtype), reset_time=True,
+                   reset_cache=False, pctl=1, req_type=None,
+                   verbose=False, get_schedule_data=False, bin_width=1e8, n_workers=1, seconds=False, **kwargs):
+    # seconds: return TIME in seconds (as floats) rather than integer ns
+    if not isinstance(data_types, list):
+        data_types = [data_types]
+
+    cache_args = {
+        'data_types': data_types, 'reset_time': reset_time, 'pctl': pctl,
+        'req_type': req_type, 'get_schedule_data': get_schedule_data, 'bin_width': bin_width, **kwargs
+    }
+    setups = {}
+    sigs = {}
+    missing = []
+    for exp in exps:
+        sigs[exp] = files_signature([os.path.join(exp_base_folder, exp)])
+        if not reset_cache:
+            cached = cache.get('prepare_traces', exp, cache_args, sigs[exp])
+            if cached is not None:
+                setups[exp] = cached
+                continue
+        missing.append(exp)
+
+    results = map_exps(
+        prepare_exp_traces, missing, n_workers=n_workers, data_types=data_types,
+        reset_time=reset_time, pctl=pctl, req_type=req_type,
+        verbose=verbose, get_schedule_data=get_schedule_data, bin_width=bin_width, **kwargs
+    )
+    for exp, setup in zip(missing, results):
+        if setup is None:
+            continue
+        setups[exp] = setup
+        # Empty setups (e.g. no request of req_type) are not cached
+        if setup:
+            cache.put('prepare_traces', exp, cache_args, sigs[exp], setup)
+
+    if seconds:
+        return {exp: setup_in_seconds(setups[exp]) for exp in exps if exp in setups}
+    return {exp: setups[exp] for exp in exps if exp in setups}
+
+def prepare_exp_traces(exp, data_types=list(trace_label_to_dtype), reset_time=True,
+                       pctl=1, req_type=None, verbose=False,
+                       get_schedule_data=False, bin_width=1e8, time_range=None, trim=False, seconds=False, **kwargs):
+    # time_range: (start, end) in seconds since the first request, to only
+    # read the requests sent then. TIME then keeps that origin.
+    # seconds: return TIME in seconds rather than integer ns
+    # trim: only keep the requests sent in the steady window of their phase
+    # First gather the traces
+    workload = exp.split('_')[2].split('.')[0]
+    if verbose:
+        print(f'================= PREPARING DATA FOR EXP {exp} =================')
+    main_df = read_exp_traces(exp, verbose=verbose, time_range=time_range, **kwargs)
+    if main_df.empty:
+        print('No data for {}'.format(exp))
+        return None
+    # Columns shared by all data types are converted once, to compact dtypes:
+    # integer ns TIME, uint8 SCHED_ID and categorical REQ_TYPE
+    times = main_df.TIME.values.astype('uint64', copy=False)
+    if reset_time and time_range is None:
+        # Before filtering types, so that all of them share the same origin
+        times = times - times.min()
+    sched_ids = main_df.SCHED_ID.values.astype('uint8', copy=False)
+    req_types = main_df.REQ_TYPE.astype('category').values
+    mean_ns = main_df.MEAN_NS.values
+    mask = None
+    if trim:
+        # On the end-to-end latency, with exact phase bounds from the traces
+        latencies = main_df.COMPLETED.values - main_df.SENDING.values
+        phase_bounds = {
+            sid: (times[sched_ids == sid].min(), times[sched_ids == sid].max() + 1) for sid in np.unique(sched_ids)
+        }
+        bins = (times // np.uint64(TRIM_BIN_WIDTH)).astype('int64')
+        counts = np.bincount(bins)
+        mean_latencies = np.bincount(bins, weights=latencies) / np.where(counts > 0, counts, np.nan)
+        clients = kwargs.get('clients') or exp_clients(exp)
+        windows = steady_windows(exp, clients, phase_bounds, mean_latencies)
+        mask = steady_mask(times, sched_ids, windows)
+        if verbose:
+            print(f'[{exp}] Trimmed to steady windows {windows}: kept {mask.sum()}/{mask.shape[0]} requests')
+    if req_type is not None:
+        type_mask = (main_df.REQ_TYPE == req_type).values
+        if not type_mask.any():
+            print('No {} in {} traces'.format(req_type, exp))
+            return {}
+        mask = type_mask if mask is None else mask & type_mask
+        if verbose:
+            print('Filtering {} requests ({} found)'.format(req_type, mask.sum()))
+    if mask is not None:
+        times, sched_ids, req_types, mean_ns = times[mask], sched_ids[mask], req_types[mask], mean_ns[mask]
+    setup = {}
+    for data_type in data_types:
+        if verbose:
+            print(f'PARSING {data_type}')
+        c0 = trace_label_to_dtype[data_type][0]
+        c1 = trace_label_to_dtype[data_type][1]
+        if c0 not in main_df.columns or c1 not in main_df.columns:
+            print('{} not present in traces'.format(c0))
+            continue
+        values = main_df[c1].values - main_df[c0].values
+        if mask is not None:
+            values = values[mask]
+        values = values.astype('uint64', copy=False)
+        setup[data_type] = pd.DataFrame({
+            'TIME': times,
+            'VALUE': values,
+            'SLOWDOWN': (values / mean_ns).astype('float32'),
+            'SCHED_ID': sched_ids,
+            'REQ_TYPE': req_types,
+        }, copy=False)
+
+        duration = (times.max() - times.min()) / 1e9
+        if verbose:
+            print(f"Experiment spanned {duration} seconds")
+        if verbose:
+            print(setup[data_type].VALUE.describe([.5, .75, .9, .99, .9999, .99999, .999999]))
+        if pctl != 1:
+            setup[data_type] = setup[data_type][setup[data_type].VALUE >= setup[data_type].VALUE.quantile(pctl)]
+
+    # Then if needed retrieve other experiment data
+    if get_schedule_data:
+        df = setup[data_type]
+        # bin_width is in nanoseconds (default: 100ms bins)
+        t0 = time.time()
+        # Bins of a time range are aligned with those of the whole experiment
+        t_origin = df.TIME.values.min() if time_range is None else np.uint64(0)
+        df['time_bin'] = ((df.TIME.values - t_origin) // np.uint64(bin_width)).astype('uint32')
+        if verbose:
+            print(f'Sliced {(max(df.TIME) - min(df.TIME)) / 1e9} seconds of data in {df.time_bin.max() + 1} bins in {time.time() - t0}')
+        # Get schedule information
+        sched_name = exp.split('_')[2] + '.yml'
+        sched_file = os.path.join(exp_base_folder, exp, sched_name)
+        with open(sched_file, 'r') as f:
+            schedule = yaml.load(f, Loader=yaml.FullLoader)
+        timeline = exp_reservations(exp)
+        alloc = pd.DataFrame()
+        if not timeline.empty:
+            # Prolongate each group's line until the last request
+            start = None if time_range is None else time_range[0]
+            alloc = timeline.frame(start=start, end=max(df.TIME) / 1e9)
+        # Get throughput
+        throughput_df = read_client_tp(exp)
+    #     throughput_df.N /= 1000
+        throughput_df.TIME -= min(throughput_df.TIME)
+        setup['bins'] = df
+        setup['bin_origin'] = t_origin
+        setup['tp'] = throughput_df
+        setup['schedule'] = schedule
+        setup['alloc'] = alloc
+        setup['reservations'] = timeline
+
+    if seconds:
+        return setup_in_seconds(setup)
+    return setup
+
+def client_sketches(filename, workload, dt='client-end-to-end', relative_accuracy=.01,
+                    chunksize=trace_store.ROW_GROUP_SIZE, save=True, verbose=False, windows=None, origin=0):
+    # Stream a client trace in bounded chunks into TraceSketches. The sketches
+    # are saved next to the trace, and reused while they are fresher than it.
+    # windows: {SCHED_ID: (start, end)} in ns since origin, to only sketch the
+    # requests sent then (such sketches are not saved).
+    sketch_file = f'{filename}.{dt}.sketch.json'
+    if windows is not None:
+        save = False
+    sources = [Path(filename), Path(trace_store.columnar_path(filename))]
+    sources = [p for p in sources if p.is_file()]
+    if not sources:
+        print('{} does not exist. Skipping.'.format(filename))
+        return None
+    if save and Path(sketch_file).is_file() and \
+            all(Path(sketch_file).stat().st_mtime >= p.stat().st_mtime for p in sources):
+        sketches = TraceSketches.load(sketch_file)
+        if sketches.relative_accuracy == relative_accuracy:
+            return sketches
+
+    c0, c1 = trace_label_to_dtype[dt]
+    means = {t: v['MEAN'] for t, v in workloads.get(workload, {}).items() if isinstance(v, dict)}
+    sketches = TraceSketches(relative_accuracy)
+    t0 = time.time()
+    n_rows = 0
+    skipped = set()
+    for chunk in trace_store.iter_traces(filename, [c0, c1, 'SENDING', 'REQ_TYPE', 'SCHED_ID'], chunksize):
+        chunk = chunk[chunk.COMPLETED > 0]
+        if windows is not None:
+            chunk = chunk[steady_mask(chunk.SENDING.values - float(origin), chunk.SCHED_ID.values, windows)]
+        req_types = chunk.REQ_TYPE.astype(str).values
+        type_means = pd.Series(means, dtype='float64').reindex(np.unique(req_types))
+        # Without a mean, slowdowns would be NaN and land in the zero bucket
+        unknown = type_means.index[type_means.isna()]
+        if len(unknown):
+            for t in sorted(set(unknown) - skipped):
+                print(f'{filename}: no mean service time for {t} in {workload}, skipping its requests')
+            skipped |= set(unknown)
+            chunk = chunk[~np.isin(req_types, unknown)]
+            req_types = chunk.REQ_TYPE.astype(str).values
+        values = chunk[c1].values - chunk[c0].values
+        slowdowns = (values / 1000) / type_means.reindex(req_types).values
+        sketches.add(values, slowdowns, req_types, chunk.SCHED_ID.values)
+        n_rows += chunk.shape[0]
+    if verbose:
+        print(f'Sketched {n_rows} rows of {filename} in {time.time() - t0:.2f} seconds')
+    if save:
+        sketches.save(sketch_file)
+    return sketches
+
+def exp_sketches(exp, dt='client-end-to-end', clients=[0], relative_accuracy=.01,
+                 chunksize=trace_store.ROW_GROUP_SIZE, save=True, verbose=False, trim=False):
+    workload = exp.split('_')[2].split('.')[0]
+    sketches = TraceSketches(relative_accuracy)
+    files = [os.path.join(exp_base_folder, exp, 'client'+str(clt), 'traces') for clt in clients]
+    windows = None
+    origin = 0
+    if trim:
+        # Without the traces loaded: nominal phase bounds and throughput only
+        windows = steady_windows(exp, clients, schedule_phase_bounds(exp))
+        firsts = [trace_store.first_sending(f) for f in files if Path(f).is_file() or trace_store.has_columnar_copy(f)]
+        origin = min([t for t in firsts if t is not None], default=0)
+        if verbose:
+            print(f'[{exp}] Trimming to steady windows {windows}')
+    for filename in files:
+        clt_sketches = client_sketches(filename, workload, dt, relative_accuracy, chunksize, save, verbose, windows, origin)
+        if clt_sketches is not None:
+            sketches.merge(clt_sketches)
+    if not sketches.sketches:
+        return None
+    return sketches
+
+def prepare_sketches(exps, dt='client-end-to-end', clients=[0], relative_accuracy=.01,
+                     chunksize=trace_store.ROW_GROUP_SIZE, save=True, reset_cache=False,
+                     n_workers=1, verbose=False, trim=False):
+    # Streaming counterpart of prepare_traces: memory is bounded by chunksize
+    # whatever the trace size, and returns mergeable sketches rather than samples
+    cache_args = {'dt': dt, 'clients': clients, 'relative_accuracy': relative_accuracy}
+    if trim:
+        cache_args['trim'] = True
+    sketches = {}
+    sigs = {}
+    missing = []
+    for exp in exps:
+        sigs[exp] = files_signature([os.path.join(exp_base_folder, exp)])
+        if not reset_cache:
+            cached = cache.get('prepare_sketches', exp, cache_args, sigs[exp])
+            if cached is not None:
+                sketches[exp] = cached
+                continue
+        missing.append(exp)
+
+    results = map_exps(
+        exp_sketches, missing, n_workers=n_workers, dt=dt, clients=clients,
+        relative_accuracy=relative_accuracy, chunksize=chunksize, save=save, verbose=verbose, trim=trim
+    )
+    for exp, exp_sketch in zip(missing, results):
+        if exp_sketch is None:
+            continue
+        sketches[exp] = exp_sketch
+        # Sketch files may just have been written: sign the folder afterwards
+        cache.put('prepare_sketches', exp, cache_args,
+                  files_signature([os.path.join(exp_base_folder, exp)]), exp_sketch)
+
+    return {exp: sketches[exp] for exp in exps if exp in sketches}
+
+def read_client_tp(exp, clients=[0]):
+    clt_dfs = []
+    for client in clients:
+        filename = os.path.join(exp_base_folder, exp, 'client'+str(client), 'traces_throughput')
+        clt_dfs.append(pd.read_csv(filename, delimiter="\t"))
+    return pd.concat(clt_dfs)
+
+def exp_reservations(exp):
+    # DARC reservations of exp, as a step function per GID (empty if the
+    # server recorded no windows)
+    return reservations.ReservationTimeline.read(
+        reservations.windows_path(os.path.join(exp_base_folder, exp))
+    )
+
+def read_exp_names_from_file(filename, basedir=None):
+    filepath = Path(basedir or exp_base_folder, filename)
+    if not filepath.is_file():
+        print('{} does not exist'.format(filepath))
+    exps = []
+    with open(filepath, 'r') as f:
+        lines = f.readlines()
+        for line in lines:
+            exps.append(os.path.basename(line.rstrip()))
+    return exps
+
+# Histograms are kept sparse: the scalar fields below plus BUCKETS (sorted
+# bucket lower bounds, in ns) and COUNTS (their uint64 counts).
+HIST_FIELDS = ['MIN', 'MAX', 'COUNT', 'TOTAL']
+
+def read_hist_file(filename):
+    # Each histogram is a header line (TYPE MIN MAX COUNT TOTAL <buckets>)
+    # followed by a value line with the same layout
+    hists = {}
+    with open(filename, 'r') as f:
+        lines = f.readlines()
+    for (header, values) in zip(lines[::2], lines[1::2]):
+        values = values.split()
+        fields = np.array(values[1:5], dtype='int64')
+        hists[values[0]] = {
+            'MIN': fields[0], 'MAX': fields[1], 'COUNT': fields[2], 'TOTAL': fields[3],
+            'BUCKETS': np.array(header.split()[5:], dtype='int64'),
+            'COUNTS': np.array(values[5:], dtype='uint64'),
+        }
+    return hists
+
+def merge_hists(hists):
+    # Scatter-add all buckets into their union
+    hists = list(hists)
+    buckets, inverse = np.unique(
+        np.concatenate([h['BUCKETS'] for h in hists]), return_inverse=True
+    )
+    counts = np.bincount(
+        inverse, weights=np.concatenate([h['COUNTS'] for h in hists]), minlength=buckets.shape[0]
+    ).astype('uint64')
+    return {
+        'MIN': min(h['MIN'] for h in hists),
+        'MAX': max(h['MAX'] for h in hists),
+        'COUNT': sum(h['COUNT'] for h in hists),
+        'TOTAL': sum(h['TOTAL'] for h in hists),
+        'BUCKETS': buckets,
+        'COUNTS': counts,
+    }
+
+def hists_from_frame(df):
+    # Wide DataFrame (one string column per bucket) to sparse histograms
+    bucket_cols = df.columns.drop(HIST_FIELDS)
+    buckets = np.array(list(map(int, bucket_cols)))
+    order = np.argsort(buckets)
+    counts = df[bucket_cols].values[:, order].astype('uint64')
+    hists = []
+    for i in range(df.shape[0]):
+        nz = counts[i] > 0
+        hist = {f: df[f].values[i] for f in HIST_FIELDS}
+        hist['BUCKETS'] = buckets[order][nz]
+        hist['COUNTS'] = counts[i][nz]
+        hists.append(hist)
+    return hists
+
+def hists_matrix(hists):
+    # Align sparse histograms on the union of their buckets
+    buckets = np.unique(np.concatenate([h['BUCKETS'] for h in hists]))
+    counts = np.zeros((len(hists), buckets.shape[0]), dtype='uint64')
+    for i, h in enumerate(hists):
+        counts[i, np.searchsorted(buckets, h['BUCKETS'])] = h['COUNTS']
+    return buckets, counts
+
+# Percentiles reported by compute_pctls by default
+DEFAULT_QUANTILES = [.25, .5, .75, .99, .999, .9999]
+
+def pctl_label(q):
+    if q == .5:
+        return 'MEDIAN'
+    return f'p{q * 100:g}'
+
+def bucket_quantiles(buckets, counts, quantiles, bucket_size=1000, interpolate=False):
+    # buckets: sorted lower bounds (in ns) shared by all histograms
+    # counts: (n_buckets,) or (n_hists, n_buckets) matrix of bucket counts
+    # Returns a (n_hists, n_quantiles) matrix of values in ns: bucket midpoints,
+    # or linearly interpolated inside the bucket holding the quantile.
+    buckets = np.asarray(buckets, dtype='float64')
+    counts = np.atleast_2d(np.asarray(counts, dtype='float64'))
+    quantiles = np.asarray(quantiles, dtype='float64')
+    n_hists, n_buckets = counts.shape
+    cum = np.cumsum(counts, axis=1)
+    totals = cum[:, -1]
+    targets = totals[:, None] * quantiles[None, :]
+    # Search all rows at once: offset each row so the flattened cumsum stays sorted.
+    # Counts are integers: searching for at least half a request skips the
+    # empty leading buckets for q=0.
+    offsets = np.arange(n_hists)[:, None] * (totals.max() + 1)
+    search = np.maximum(targets, .5) + offsets
+    idx = np.searchsorted((cum + offsets).ravel(), search.ravel(), side='left')
+    idx = idx.reshape(n_hists, -1) - np.arange(n_hists)[:, None] * n_buckets
+    idx = np.clip(idx, 0, n_buckets - 1)
+    lower = buckets[idx]
+    if not interpolate:
+        values = lower + bucket_size / 2
+    else:
+        rows = np.arange(n_hists)[:, None]
+        b_count = counts[rows, idx]
+        before = cum[rows, idx] - b_count
+        frac = np.divide(targets - before, b_count, out=np.zeros_like(targets), where=b_count > 0)
+        values = lower + frac * bucket_size
+    values[totals == 0] = np.nan
+    return values
+
+def compute_pctls(hists, quantiles=DEFAULT_QUANTILES, bucket_size=1000, interpolate=False):
+    # hists is a sparse histogram, a list of them, or a wide DataFrame with one
+    # row per histogram. Returns one row of values (in us) per histogram.
+    if isinstance(hists, pd.DataFrame):
+        hists = hists_from_frame(hists)
+    elif isinstance(hists, dict):
+        hists = [hists]
+    pctls = {}
+    pctls['MIN'] = np.array([h['MIN'] for h in hists]) / 1000
+    pctls['MAX'] = np.array([h['MAX'] for h in hists]) / 1000
+    pctls['MEAN'] = np.array([int(h['TOTAL']) / int(h['COUNT']) for h in hists]) / 1000
+    buckets, counts = hists_matrix(hists)
+    values = bucket_quantiles(buckets, counts, quantiles, bucket_size, interpolate)
+    for i, q in enumerate(quantiles):
+        pctls[pctl_label(q)] = values[:, i] / 1000
+    return pd.DataFrame(pctls)
+
+def slowdown_hist(typed_hists, means, bucket_size=1000):
+    # Slowdowns (value / type mean service time, in us) of the requests of
+    # typed client histograms, as a log-linear histogram in the finest of the
+    # types' scaled units. Its accuracy keeps every client bucket of every type
+    # in a bucket of its own over the whole range, so that no two are merged.
+    scales = {t: mean * 1000 for t, mean in means.items()}
+    units = {t: bucket_size / scale for t, scale in scales.items()}
+    finest = min(units.values())
+    max_steps = max([
+        int(np.ceil((int(typed_hists[t]['BUCKETS'].max()) // bucket_size + 1) * units[t] / finest))
+        for t in means if typed_hists[t]['BUCKETS'].shape[0]
+    ] + [0])
+    accuracy = LogLinearHistogram.exact_accuracy(max_steps)
+    return LogLinearHistogram.merge_all(
+        LogLinearHistogram.from_traces_hist(typed_hists[t], accuracy, bucket_size).scale(scales[t]) for t in means
+    )
+
+def parse_hist(rtypes, exps, clients=[], dt='client-end-to-end'):
+    if not clients:
+        print('No clients given')
+        return {}
+
+    # Types without histograms (and experiments without any) stay empty
+    hists = {t: {exp: {dt: pd.DataFrame()} for exp in exps} for t in list(rtypes) + ['all']}
+    for exp in exps:
+        wl = exp.split('_')[2].split('.')[0]
+        clt_hists = {t: [] for t in rtypes}
+        n_files = 0
+        for clt in clients:
+            exp_folder = os.path.join(exp_base_folder, exp, 'client'+str(clt), '')
+            filename = os.path.join(exp_folder, 'traces_hist')
+            if not Path(filename).exists():
+                print(f'{filename} does not exist')
+                continue
+            n_files += 1
+            for t, hist in read_hist_file(filename).items():
+                if t in clt_hists:
+                    clt_hists[t].append(hist)
+
+        if len(clients) > n_files:
+            print(f'[{exp}] Missing {len(clients) - n_files} client histogram(s)')
+        # Compute percentiles for all request types at once
+        typed_hists = {t: merge_hists(clt_hists[t]) for t in rtypes if clt_hists[t]}
+        if not typed_hists:
+            print(f'[{exp}] No histogram found')
+            continue
+        typed_pctls = compute_pctls(list(typed_hists.values()))
+        # Types missing from the workload have no slowdown
+        means = {t: v['MEAN'] for t, v in workloads.get(wl, {}).items() if isinstance(v, dict) and t in typed_hists}
+        for i, t in enumerate(typed_hists):
+            hists[t][exp][dt] = typed_pctls.iloc[[i]].reset_index(drop=True)
+            hists[t][exp][dt]['p99_slowdown'] = hists[t][exp][dt]['p99'] / means.get(t, np.nan)
+            hists[t][exp][dt]['p99.9_slowdown'] = hists[t][exp][dt]['p99.9'] / means.get(t, np.nan)
+
+        # Merge them into an overall histogram
+        hists['all'][exp][dt] = compute_pctls(merge_hists(typed_hists.values()))
+
+        p99_slowdown, p999_slowdown = np.nan, np.nan
+        if means:
+            p99_slowdown, p999_slowdown = slowdown_hist(typed_hists, means).quantiles([.99, .999])
+        hists['all'][exp][dt]['p99_slowdown'] = p99_slowdown
+        hists['all'][exp][dt]['p99.9_slowdown'] = p999_slowdown
+
+    return hists
+
+def parse_rates(exps, clients=[]):
+    if not clients:
+        print('No clients given')
+        return {}
+
+    rates = {}
+    for exp in exps:
+        dfs = []
+        for clt in clients:
+            exp_folder = os.path.join(exp_base_folder, exp, 'client'+str(clt), '')
+            filename = os.path.join(exp_folder, 'traces_rates')
+            if not Path(filename).exists():
+                print(f'{filename} does not exist')
+                continue
+            clt_df = pd.read_csv(filename, delimiter='\t', engine='c')
+            dfs.append(clt_df)
+
+        df = pd.concat(dfs)
+        #rates[exp] = pd.DataFrame({'OFFERED': [df.OFFERED.values[0] * len(clients)], 'ACHIEVED': [df.ACHIEVED.sum()]})
+        rates[exp] = pd.DataFrame({'OFFERED': [df.OFFERED.sum()], 'ACHIEVED': [df.ACHIEVED.sum()]})
+
+    return rates
+
+def select_quantiles(values, quantiles):
+    # Same as pandas' default (linear) quantile, but only selects the ranks
+    # around each quantile with np.partition instead of sorting everything
+    n = values.shape[0]
+    if n == 0:
+        return np.full(len(quantiles), np.nan)
+    pos = np.asarray(quantiles, dtype='float64') * (n - 1)
+    lo = np.floor(pos).astype('int64')
+    hi = np.minimum(lo + 1, n - 1)
+    part = np.partition(values, np.unique(np.concatenate([lo, hi])))
+    return part[lo] + (part[hi] - part[lo]) * (pos - lo)
+
+def typed_trace_stats(values, req_types, type_means, quantiles=DEFAULT_QUANTILES):
+    # Count, mean and quantiles of values, and of their slowdown against each
+    # type's mean, for every request type and for all types together ('all').
+    # Types are grouped in one pass with a stable (radix) sort of their codes.
+    codes, types = pd.factorize(req_types, sort=True)
+    codes = codes.astype('int16')
+    values = np.asarray(values, dtype='float64')
+    means = np.array([type_means[t] for t in types], dtype='float64')
+    slowdowns = values / means[codes]
+    order = np.argsort(codes, kind='stable')
+    bounds = np.searchsorted(codes[order], np.arange(len(types) + 1))
+    sorted_values = values[order]
+    sorted_slowdowns = slowdowns[order]
+    labels = [pctl_label(q) for q in quantiles]
+
+    def summarize(v, sd):
+        stats = {'COUNT': v.shape[0], 'MEAN': v.mean() if v.shape[0] else np.nan}
+        stats.update(zip(labels, select_quantiles(v, quantiles)))
+        stats.update(zip([l + '_slowdown' for l in labels], select_quantiles(sd, quantiles)))
+        return stats
+
+    stats = {}
+    for i, t in enumerate(types):
+        start, end = bounds[i], bounds[i+1]
+        stats[t] = summarize(sorted_values[start:end], sorted_slowdowns[start:end])
+    stats['all'] = summarize(values, slowdowns)
+    return pd.DataFrame.from_dict(stats, orient='index')
+
+def grouped_quantiles(keys, values, quantiles):
+    # Linear-interpolated quantiles of values for every distinct integer key,
+    # from a single (key, value) sort. Returns the sorted distinct keys, their
+    # counts and a (n_keys, n_quantiles) matrix.
+    keys = np.asarray(keys, dtype='int64')
+    values = np.asarray(values)
+    if keys.size == 0:
+        return keys, np.empty(0, dtype='int64'), np.empty((0, len(quantiles)))
+    value_bits = 64 - max(int(keys.max()).bit_length(), 1)
+    if values.dtype.kind in 'ui' and values.min() >= 0 and int(values.max()) < (1 << value_bits):
+        # Integer values (e.g. ns latencies): pack (key, value) into a single
+        # uint64 so that one plain sort replaces the much slower lexsort
+        packed = np.sort((keys.astype('uint64') << np.uint64(value_bits)) | values.astype('uint64'))
+        keys = (packed >> np.uint64(value_bits)).astype('int64')
+        values = (packed & np.uint64((1 << value_bits) - 1)).astype('float64')
+    else:
+        order = np.lexsort((values, keys))
+        keys = keys[order]
+        values = values.astype('float64')[order]
+    starts = np.concatenate([[0], np.flatnonzero(np.diff(keys)) + 1])
+    counts = np.diff(np.append(starts, keys.shape[0]))
+    pos = starts[:, None] + np.asarray(quantiles)[None, :] * (counts[:, None] - 1)
+    lo = np.floor(pos).astype('int64')
+    hi = np.minimum(lo + 1, (starts + counts - 1)[:, None])
+    pctls = values[lo] + (values[hi] - values[lo]) * (pos - lo)
+    return keys[starts], counts, pctls
+
+def time_binned_pctls(df, bin_width=1e8, quantiles=[.999], include_all=True, origin=None):
+    # Percentiles of VALUE per time bin of bin_width (in TIME units) and per
+    # REQ_TYPE (plus all types together), with integer bin indices instead of
+    # pd.cut. Each row also gets the SCHED_ID most requests of its bin belong to.
+    # origin: TIME of the start of bin 0 (default: the first TIME). The
+    # time_bin column of prepare_traces setups is used when present, with
+    # their 'bin_origin', so that the bins of a time range stay aligned with
+    # those of the whole run.
+    t0 = df.TIME.values.min() if origin is None else origin
+    if 'time_bin' in df.columns:
+        bins = df.time_bin.values.astype('int64')
+    else:
+        bins = ((df.TIME.values - t0) // bin_width).astype('int64')
+    n_bins = bins.max() + 1
+    codes, types = pd.factorize(df.REQ_TYPE, sort=True)
+    sched_codes, sched_ids = pd.factorize(df.SCHED_ID, sort=True)
+    dominant = np.bincount(
+        bins * len(sched_ids) + sched_codes, minlength=n_bins * len(sched_ids)
+    ).reshape(n_bins, len(sched_ids)).argmax(axis=1)
+    labels = [pctl_label(q) for q in quantiles]
+
+    groupings = [(bins * len(types) + codes, len(types), np.asarray(types))]
+    if include_all:
+        groupings.append((bins, 1, np.array(['all'])))
+    frames = []
+    for keys, n_groups, names in groupings:
+        uniq, counts, pctls = grouped_quantiles(keys, df.VALUE.values, quantiles)
+        b = uniq // n_groups
+        frame = pd.DataFrame({
+            'time_bin': b,
+            'TIME': t0 + b * bin_width,
+            'REQ_TYPE': names[uniq % n_groups],
+            'COUNT': counts,
+            'SCHED_ID': np.asarray(sched_ids)[dominant[b]],
+        })
+        for i, l in enumerate(labels):
+            frame[l] = pctls[:, i]
+        frames.append(frame)
+    return pd.concat(frames, ignore_index=True).sort_values(['time_bin', 'REQ_TYPE']).reset_index(drop=True)
+
+def reservation_pctls(exps, bin_width=1e8, quantiles=[.999], dt='client-end-to-end', clients=[0],
+                      include_all=True, **kwargs):
+    # Latency percentiles per time bin and REQ_TYPE (see time_binned_pctls) of
+    # each experiment, annotated with the reservations in force at the start
+    # of the bin (RES_<GID>, STEAL_<GID> and QLEN_<GID>)
+    setups = prepare_traces(
+        exps, [dt], clients=clients, get_schedule_data=True, bin_width=bin_width, **kwargs
+    )
+    frames = []
+    for exp in exps:
+        if exp not in setups or 'bins' not in setups[exp]:
+            continue
+        pctls = time_binned_pctls(
+            setups[exp]['bins'], bin_width=bin_width, quantiles=quantiles, include_all=include_all,
+            origin=setups[exp].get('bin_origin')
+        )
+        pctls = setups[exp]['reservations'].annotate(pctls)
+        pctls.insert(0, 'exp', exp)
+        frames.append(pctls)
+    if not frames:
+        return pd.DataFrame()
+    return pd.concat(frames, ignore_index=True)
+
+# Per schedule phase statistics. Slowdowns are against each phase's own
+# mean_ns in the schedule, as a type's service time may change across phases.
+def phase_rows(sched_ids, req_types, counts, durations, mean_ns, means, value_pctls, slowdown_pctls, quantiles):
+    labels = [pctl_label(q) for q in quantiles]
+    df = pd.DataFrame({
+        'SCHED_ID': sched_ids, 'REQ_TYPE': req_types, 'COUNT': counts,
+        'THROUGHPUT': counts / durations, 'MEAN_NS': mean_ns, 'MEAN': means / 1000,
+    })
+    for i, l in enumerate(labels):
+        df[l] = value_pctls[:, i] / 1000
+    for i, l in enumerate(labels):
+        df[l + '_slowdown'] = slowdown_pctls[:, i]
+    return df
+
+def trace_phase_stats(df, type_means, quantiles=DEFAULT_QUANTILES):
+    # One row per (SCHED_ID, REQ_TYPE) of a prepared trace (VALUE in ns), plus
+    # one per SCHED_ID for all its types ('all'), each from a single grouped
+    # pass. Throughput is over the phase's span of sending times.
+    if df.shape[0] == 0:
+        empty = np.empty(0)
+        return phase_rows(
+            empty.astype('int64'), empty.astype(object), empty.astype('int64'), empty, empty, empty,
+            np.empty((0, len(quantiles))), np.empty((0, len(quantiles))), quantiles
+        )
+    codes, types = pd.factorize(df.REQ_TYPE, sort=True)
+    types = [str(t) for t in types] + ['all']
+    n_types = len(types)
+    sids = df.SCHED_ID.values.astype('int64')
+    values = df.VALUE.values
+    times = df.TIME.values.astype('float64')
+    n_sids = int(sids.max()) + 1
+    mean_ns = np.array([type_means.get((sid, t), np.nan) for sid in range(n_sids) for t in types])
+    spans = np.zeros(n_sids)
+    firsts = np.full(n_sids, np.inf)
+    np.minimum.at(firsts, sids, times)
+    np.maximum.at(spans, sids, times)
+    spans = np.maximum(spans - firsts, 1) / 1e9
+
+    keys = sids * n_types + codes
+    uniq, counts, pctls = grouped_quantiles(keys, values, quantiles)
+    means = np.bincount(keys, weights=values)[uniq] / counts
+    # Within a phase and type, slowdown is the latency scaled by a constant
+    typed = phase_rows(
+        uniq // n_types, np.array(types)[uniq % n_types], counts, spans[uniq // n_types], mean_ns[uniq],
+        means, pctls, pctls / mean_ns[uniq][:, None], quantiles
+    )
+
+    slowdowns = values / mean_ns[keys]
+    uniq, counts, pctls = grouped_quantiles(sids, values, quantiles)
+    means = np.bincount(sids, weights=values)[uniq] / counts
+    # Only over the types of the phase that have a scheduled mean
+    known = np.isfinite(slowdowns)
+    slowdown_pctls = np.full(pctls.shape, np.nan)
+    if known.any():
+        sd_uniq, _, sd_pctls = grouped_quantiles(sids[known], slowdowns[known], quantiles)
+        slowdown_pctls[np.searchsorted(uniq, sd_uniq)] = sd_pctls
+    overall = phase_rows(uniq, 'all', counts, spans[uniq], np.nan, means, pctls, slowdown_pctls, quantiles)
+    return pd.concat([typed, overall], ignore_index=True).sort_values(['SCHED_ID', 'REQ_TYPE']).reset_index(drop=True)
+
+def sketch_phase_stats(sketches, type_means, durations, quantiles=DEFAULT_QUANTILES):
+    # Same table as trace_phase_stats, from TraceSketches. durations: seconds
+    # of each phase. The slowdown of all types of a phase comes from their
+    # sketches scaled by their means, within about twice the sketches' accuracy.
+    frames = []
+    for sid in sketches.keys('SCHED_ID'):
+        typed = [(t, sketches.get('VALUE', 'SCHED_TYPE', (s, t))) for s, t in sketches.keys('SCHED_TYPE') if s == sid]
+        mean_ns = np.array([type_means.get((sid, t), np.nan) for t, _ in typed])
+        pctls = np.array([s.quantiles(quantiles) for _, s in typed]).reshape(-1, len(quantiles))
+        counts = np.array([s.count for _, s in typed])
+        frames.append(phase_rows(
+            sid, [t for t, _ in typed], counts, durations.get(sid, np.nan), mean_ns,
+            np.array([s.mean() for _, s in typed]), pctls, pctls / mean_ns[:, None], quantiles
+        ))
+
+        slowdown_sketch = QuantileSketch(sketches.relative_accuracy)
+        for (_, s), m in zip(typed, mean_ns):
+            if np.isfinite(m):
+                slowdown_sketch.merge(s.scale(m))
+        s = sketches.get('VALUE', 'SCHED_ID', sid)
+        frames.append(phase_rows(
+            sid, ['all'], np.array([s.count]), durations.get(sid, np.nan), np.nan, np.array([s.mean()]),
+            s.quantiles(quantiles)[None, :], slowdown_sketch.quantiles(quantiles)[None, :], quantiles
+        ))
+    if not frames:
+        return pd.DataFrame()
+    return pd.concat(frames, ignore_index=True).sort_values(['SCHED_ID', 'REQ_TYPE']).reset_index(drop=True)
+
+def phase_stats(exps, quantiles=DEFAULT_QUANTILES, dt='client-end-to-end', clients=[0], streaming=False,
+                trim=False, relative_accuracy=.01, reset_cache=False, n_workers=1, verbose=False):
+    # Table of count, throughput (requests per second), scheduled mean service
+    # time (MEAN_NS), mean and quantiles (us) and slowdowns per (experiment, SCHED_ID, REQ_TYPE), from the full traces
+    # or, if streaming, from sketches
+    if streaming:
+        sketches = prepare_sketches(
+            exps, dt, clients=clients, relative_accuracy=relative_accuracy, reset_cache=reset_cache,
+            n_workers=n_workers, verbose=verbose, trim=trim
+        )
+    else:
+        setups = prepare_traces(
+            exps, [dt], clients=clients, trim=trim, reset_cache=reset_cache, n_workers=n_workers, verbose=verbose
+        )
+    frames = []
+    for exp in exps:
+        type_means = phase_type_means(read_exp_schedule(exp))
+        if streaming:
+            if exp not in sketches:
+                continue
+            # Sketches have no times: the phases last as scheduled (or trimmed)
+            bounds = steady_windows(exp, clients, schedule_phase_bounds(exp)) if trim else schedule_phase_bounds(exp)
+            durations = {sid: (end - start) / 1e9 for sid, (start, end) in bounds.items()}
+            df = sketch_phase_stats(sketches[exp], type_means, durations, quantiles)
+        else:
+            if exp not in setups or dt not in setups[exp]:
+                continue
+            df = trace_phase_stats(setups[exp][dt], type_means, quantiles)
+        df.insert(0, 'exp', exp)
+        frames.append(df)
+    if not frames:
+        return pd.DataFrame()
+    return pd.concat(frames, ignore_index=True)
+
+def sketch_stats(sketches, type_means, quantiles=DEFAULT_QUANTILES):
+    # Same table as typed_trace_stats, from TraceSketches (values in ns)
+    labels = [pctl_label(q) for q in quantiles]
+
+    def summarize(value_sketch, slowdown_values):
+        values = value_sketch.quantiles(quantiles) / 1000
+        stats = {'COUNT': value_sketch.count, 'MEAN': value_sketch.mean() / 1000}
+        stats.update(zip(labels, values))
+        stats.update(zip([l + '_slowdown' for l in labels], slowdown_values))
+        return stats
+
+    stats = {}
+    for t in sketches.keys('REQ_TYPE'):
+        value_sketch = sketches.get('VALUE', 'REQ_TYPE', t)
+        # Within a type, slowdown is the latency scaled by a constant
+        stats[t] = summarize(value_sketch, value_sketch.quantiles(quantiles) / 1000 / type_means[t])
+    stats['all'] = summarize(
+        sketches.get('VALUE'), sketches.get('SLOWDOWN').quantiles(quantiles)
+    )
+    return pd.DataFrame.from_dict(stats, orient='index')
+
+# Precomputed per-experiment summary, written next to the raw data once a run
+# is complete (see ingest.py) and used by the histogram path of
+# prepare_pctl_data while its client files are unchanged
+SUMMARY_FILE = 'summary.json'
+# Version of the computation of summaries: bump it whenever the percentiles,
+# rates or slowdowns they hold are computed differently, so that existing
+# summaries are treated as stale. 2: overall slowdowns from log-linear
+# histograms (parse_hist). 3: at an accuracy that keeps every client bucket
+# (slowdown_hist)
+SUMMARY_VERSION = 3
+SUMMARY_SOURCES = ['traces_hist', 'traces_rates', 'traces_throughput']
+
+def exp_clients(exp):
+    # Ids of the clients that have an output folder for exp
+    folders = Path(exp_base_folder, exp).glob('client*')
+    return sorted(int(f.name[6:]) for f in folders if f.is_dir() and f.name[6:].isdigit())
+
+def summary_signature(exp, clients):
+    sig = []
+    for clt in clients:
+        for f in SUMMARY_SOURCES:
+            path = os.path.join(exp_base_folder, exp, 'client'+str(clt), f)
+            if os.path.isfile(path):
+                st = os.stat(path)
+                sig.append([f'client{clt}/{f}', st.st_size, st.st_mtime_ns])
+    return sig
+
+def write_exp_summary(exp, dt='client-end-to-end', relative_accuracy=.01, verbose=False):
+    t0 = time.time()
+    workload = exp.split('_')[2].split('.')[0]
+    clients = exp_clients(exp)
+    summary = {'version': SUMMARY_VERSION, 'clients': clients, 'sources': summary_signature(exp, clients)}
+
+    # Percentiles of the merged client histograms, per type and overall
+    rtypes = set()
+    for clt in clients:
+        filename = os.path.join(exp_base_folder, exp, 'client'+str(clt), 'traces_hist')
+        if Path(filename).exists():
+            rtypes |= set(read_hist_file(filename)) - {'UNKNOWN'}
+    rtypes = sorted(rtypes)
+    hists = parse_hist(rtypes, [exp], clients=clients, dt=dt)
+    summary['pctls'] = {dt: {
+        t: {k: float(v) for k, v in hists[t][exp][dt].iloc[0].items()}
+        for t in hists if not hists[t][exp][dt].empty
+    }}
+
+    rates = parse_rates([exp], clients=clients)[exp]
+    summary['rates'] = {'OFFERED': float(rates.OFFERED[0]), 'ACHIEVED': float(rates.ACHIEVED[0])}
+
+    # Mean throughput (requests per second) of each type over the run
+    summary['throughput'] = {}
+    tp_clients = [c for c in clients if Path(exp_base_folder, exp, f'client{c}', 'traces_throughput').exists()]
+    if tp_clients:
+        tp = read_client_tp(exp, tp_clients)
+        epochs = np.unique(tp.TIME.values)
+        epoch = np.diff(epochs).min() if epochs.shape[0] > 1 else 1e9
+        span = (epochs[-1] - epochs[0] + epoch) / 1e9
+        summary['throughput'] = {str(t): float(n) / span for t, n in tp.groupby('TYPE').N.sum().items()}
+
+    # Per schedule phase (SCHED_ID) and type statistics, from the trace
+    # sketches. Slowdowns are against the means of the schedule the run used.
+    type_means = {}
+    if Path(exp_base_folder, exp, workload + '.yml').is_file():
+        type_means = phase_type_means(read_exp_schedule(exp))
+    summary['phases'] = []
+    sketches = exp_sketches(exp, dt, clients=clients, relative_accuracy=relative_accuracy, verbose=verbose)
+    if sketches is not None:
+        for sid, t in sketches.keys('SCHED_TYPE'):
+            s = sketches.get('VALUE', 'SCHED_TYPE', (sid, t))
+            values = s.quantiles([.5, .99, .999]) / 1000
+            phase = {
+                'SCHED_ID': sid, 'REQ_TYPE': t, 'COUNT': s.count, 'MEAN': s.mean() / 1000,
+                'MEDIAN': values[0], 'p99': values[1], 'p99.9': values[2],
+            }
+            if (sid, t) in type_means:
+                phase['p99.9_slowdown'] = values[2] * 1000 / type_means[(sid, t)]
+            summary['phases'].append(phase)
+
+    filename = os.path.join(exp_base_folder, exp, SUMMARY_FILE)
+    with open(filename + '.tmp', 'w') as f:
+        json.dump(summary, f)
+    os.replace(filename + '.tmp', filename)
+    if verbose:
+        print(f'[{exp}] Wrote {filename} in {time.time() - t0:.2f} seconds')
+    return summary
+
+def read_exp_summary(exp, clients=[], dt='client-end-to-end'):
+    # The experiment's summary if it covers these clients and is still fresh
+    # (same sources, computed by the current version)
+    filename = os.path.join(exp_base_folder, exp, SUMMARY_FILE)
+    if not Path(filename).is_file():
+        return None
+    with open(filename, 'r') as f:
+        summary = json.load(f)
+    if summary.get('version') != SUMMARY_VERSION:
+        return None
+    if sorted(clients) != summary['clients'] or dt not in summary['pctls']:
+        return None
+    if summary_signature(exp, summary['clients']) != summary['sources']:
+        return None
+    return summary
+
+def exp_pctl_rows(exp, rtypes, dt='client-end-to-end', remove_drops=False, full_sample=False, streaming=False, relative_accuracy=.01, verbose=False, trim=False, **kwargs):
+    # Summary rows (overall and per request type) for a single experiment.
+    # trim: only count requests of the steady window of their phase, which
+    # needs the traces (histograms cover whole runs): sketches by default.
+    fields = catalog.parse_exp_name(exp)
+    pol = policies[fields['policy']]
+    load = fields['load']
+    workload = fields['workload']
+    # The tables' n_resa is the number of workers without manual reservations
+    n_resa = fields['n_resas'] if fields['n_resas'] > -1 else fields['n_workers']
+    run_number = fields['run_number']
+
+    if trim and not full_sample:
+        streaming = True
+    summary = None
+    if not (streaming or full_sample):
+        summary = read_exp_summary(exp, clients=kwargs.get('clients', []), dt=dt)
+    if summary is not None:
+        rates_df = {exp: pd.DataFrame({k: [v] for k, v in summary['rates'].items()})}
+    else:
+        rates_df = parse_rates([exp], **kwargs)
+    if summary is not None:
+        dfs = {t: {exp: {dt: pd.DataFrame()}} for t in list(rtypes) + ['all']}
+        for t in dfs:
+            if t in summary['pctls'][dt]:
+                dfs[t][exp][dt] = pd.DataFrame([summary['pctls'][dt][t]])
+        if verbose:
+            print(f'[{exp}] Using precomputed summary')
+    elif streaming:
+        # Like full_sample, but from sketches built over bounded chunks of the traces
+        t0 = time.time()
+        dfs = {t: {exp: {dt: pd.DataFrame()}} for t in list(rtypes) + ['all']}
+        sketches = prepare_sketches([exp], dt, relative_accuracy=relative_accuracy, verbose=verbose, trim=trim, **kwargs)
+        if exp in sketches:
+            means = {t: workloads[workload][t]['MEAN'] for t in sketches[exp].keys('REQ_TYPE')}
+            stats = sketch_stats(sketches[exp], means)
+            for t in dfs:
+                if t in stats.index:
+                    dfs[t][exp][dt] = stats.loc[[t]].reset_index(drop=True)
+        if verbose:
+            print('sketched {} traces in {} seconds'.format(exp, time.time()-t0))
+    elif (full_sample):
+        t0 = time.time()
+        # All types and their union from a single load and a single grouped pass
+        dfs = {t: {exp: {dt: pd.DataFrame()}} for t in list(rtypes) + ['all']}
+        setups = prepare_traces([exp], [dt], trim=trim, **kwargs)
+        if exp in setups and dt in setups[exp] and not setups[exp][dt].empty:
+            df = setups[exp][dt]
+            means = {t: workloads[workload][t]['MEAN'] for t in df.REQ_TYPE.unique()}
+            stats = typed_trace_stats(df.VALUE.values / 1000, df.REQ_TYPE.values, means)
+            for t in dfs:
+                if t in stats.index:
+                    dfs[t][exp][dt] = stats.loc[[t]].reset_index(drop=True)
+        t1 = time.time()
+        if verbose:
+            print('loaded {} traces in {} seconds'.format(exp, t1-t0))
+    else:
+        t0 = time.time()
+        dfs = parse_hist(rtypes, [exp], dt=dt, **kwargs)
+        if verbose:
+            print(f'[{exp}] Parsed histograms in {time.time()-t0:.6f} seconds')
+            print(dfs)
+
+    rows = []
+    typed_rows = []
+    rate_df = rates_df[exp]
+    rate_data = [rate_df.OFFERED[0], rate_df.ACHIEVED[0]]
+    '''
+    if remove_drops and sum(rate_df.ACHIEVED < rate_df.OFFERED * .999) == 1:
+        print(f'Exp {exp} dropped requests (achieved={rate_df.ACHIEVED.values}, offered={rate_df.OFFERED.values}) passing.')
+        continue
+    '''
+
+    # So stupid that we have to get the [0] for each value in a 1row dataframe
+    for i, t in enumerate(rtypes):
+        if not (exp not in dfs[t] or dt not in dfs[t][exp] or dfs[t][exp][dt].empty):
+            df = dfs[t][exp][dt]
+
+            #if sum(rate_df.ACHIEVED < rate_df.OFFERED * .999) == 1 and not pol in ['c-PRE-MQ', 'c-PRE-SQ']:
+            #if sum(rate_df.ACHIEVED < rate_df.OFFERED * .999) == 1 and pol in ['c-PRE-MQ', 'c-PRE-SQ']:
+            #if remove_drops and sum(rate_df.ACHIEVED < rate_df.OFFERED * .999) == 1 and not pol in ['c-PRE-MQ', 'c-PRE-SQ']:
+            if remove_drops and sum(rate_df.ACHIEVED < rate_df.OFFERED * .999) == 1:
+                p999_slowdown = 1e9
+                p999 = 1e9
+            else:
+                p999_slowdown = df['p99.9_slowdown'][0]
+                p999 = df['p99.9'][0]
+            #if remove_drops and sum(rate_df.ACHIEVED < rate_df.OFFERED * .99) == 1 and not pol in ['c-PRE-MQ', 'c-PRE-SQ']:
+            if remove_drops and sum(rate_df.ACHIEVED < rate_df.OFFERED * .99) == 1:
+                p99_slowdown = 1e9
+                p99 = 1e9
+            else:
+                p99_slowdown = df['p99_slowdown'][0]
+                p99 = df['p99'][0]
+
+            data = [
+                pol, load, t, run_number,
+                df['MEAN'][0], df['MEDIAN'][0], p99, p999, df['p99.99'][0],
+                p99_slowdown, p999_slowdown
+            ]
+            typed_rows.append(data + rate_data + [n_resa])
+    if not (exp not in dfs['all'] or dt not in dfs['all'][exp] or dfs['all'][exp][dt].empty):
+        df = dfs['all'][exp][dt]
+
+        #if sum(rate_df.ACHIEVED < rate_df.OFFERED * .999) == 1 and not pol in ['c-PRE-MQ', 'c-PRE-SQ']:
+        #if sum(rate_df.ACHIEVED < rate_df.OFFERED * .999) == 1 and pol in ['c-PRE-MQ', 'c-PRE-SQ']:
+        #if remove_drops and sum(rate_df.ACHIEVED < rate_df.OFFERED * .999) == 1 and not pol in ['c-PRE-MQ', 'c-PRE-SQ']:
+        if remove_drops and sum(rate_df.ACHIEVED < rate_df.OFFERED * .999) == 1:
+            p999_slowdown = 1e9
+            p999 = 1e9
+        else:
+            p999_slowdown = df['p99.9_slowdown'][0]
+            p999 = df['p99.9'][0]
+        #if remove_drops and sum(rate_df.ACHIEVED < rate_df.OFFERED * .99) == 1 and not pol in ['c-PRE-MQ', 'c-PRE-SQ']:
+        if remove_drops and sum(rate_df.ACHIEVED < rate_df.OFFERED * .99) == 1:
+            p99_slowdown = 1e9
+            p99 = 1e9
+        else:
+            p99_slowdown = df['p99_slowdown'][0]
+            p99 = df['p99'][0]
+        data = [
+            pol, load, 'UNKNOWN', run_number,
+            df['MEAN'][0], df['MEDIAN'][0], p99, p999, df['p99.99'][0],
+            p99_slowdown, p999_slowdown
+        ]
+        rows.append(data + rate_data + [n_resa])
+    return rows, typed_rows
+
+def query_exps(query, scan=True):
+    # Names of the experiments of exp_base_folder matching a catalog query,
+    # e.g. {'policy': 'DARC', 'workload': 'SBIM2', 'load': (.8, 1.)}
+    cat = catalog.Catalog(exp_base_folder)
+    try:
+        if scan:
+            cat.scan()
+        return cat.exps(query)
+    finally:
+        cat.close()
+
+def prepare_pctl_data(rtypes, exps=[], exp_file=None, query=None, app="REST", dt='client-end-to-end', reset_cache=False, remove_drops=False, full_sample=False, streaming=False, relative_accuracy=.01, verbose=False, n_workers=1, **kwargs):
+    if exp_file is not None:
+        exps = read_exp_names_from_file(exp_file)
+    elif query is not None:
+        exps = query_exps(query)
+    if not exps:
+        print('No experiment labels given')
+        return
+
+    cache_name = exp_file if exp_file is not None else tuple(exps)
+    cache_args = {
+        'exps': list(exps), 'rtypes': list(rtypes), 'dt': dt, 'remove_drops': remove_drops,
+        'full_sample': full_sample, 'streaming': streaming, 'relative_accuracy': relative_accuracy, **kwargs
+    }
+    sig = files_signature([os.path.join(exp_base_folder, exp) for exp in exps])
+    if not reset_cache:
+        cached = cache.get('prepare_pctl_data', cache_name, cache_args, sig)
+        if cached is not None:
+            return cached['all'], cached['typed']
+
+    t0 = time.time()
+    results = map_exps(
+        exp_pctl_rows, exps, n_workers=n_workers, rtypes=rtypes, dt=dt,
+        remove_drops=remove_drops, full_sample=full_sample, streaming=streaming,
+        relative_accuracy=relative_accuracy, verbose=verbose, **kwargs
+    )
+    rows = [row for exp_rows, _ in results for row in exp_rows]
+    typed_rows = [row for _, exp_typed_rows in results for row in exp_typed_rows]
+    t1 = time.time()
+    print(f'[{exp_file}] Prepared df rows for {len(exps)} experiments in {t1-t0:.6f} seconds')
+#     print(rows)
+
+    t0 = time.time()
+    types = {
+        'policy': 'object', 'load': 'float', 'type': 'object', 'run_number': 'int', 'mean': 'int64',
+        'median': 'int64', 'p99': 'int64', 'p99_slowdown': 'int64', 'p99.9': 'int64',
+        'p99.99': 'int64', 'p99.9_slowdown': 'int64', 'offered': 'int64', 'achieved': 'int64',
+        'reserved': 'int64'
+    }
+    df = pd.DataFrame(
+        rows,
+        columns=[
+            'policy', 'load', 'type', 'run_number', 'mean', 'median', 'p99', 'p99.9', 'p99.99',
+            'p99_slowdown', 'p99.9_slowdown', 'offered', 'achieved', 'reserved'
+        ]
+    ).dropna().astype(dtype=types)
+    typed_df = pd.DataFrame(
+        typed_rows,
+        columns=[
+            'policy', 'load', 'type', 'run_number', 'mean', 'median', 'p99', 'p99.9', 'p99.99',
+            'p99_slowdown', 'p99.9_slowdown', 'offered', 'achieved', 'reserved'
+        ]
+    ).dropna().astype(dtype=types)
+    t1 = time.time()
+    print(f'[{exp_file}] Created df in {t1-t0:.6f} seconds')
+
+    # If we want to get Krps and us rather than rps and ns
+    df.achieved /= 1000
+    df.offered /= 1000
+    typed_df.achieved /= 1000
+    typed_df.offered /= 1000
+
+    cache.put('prepare_pctl_data', cache_name, cache_args, sig, {'all': df, 'typed': typed_df})
+
+    return df, typed_df
+
+def gen_wl_dsc(workload, req_names=None):
+    # The schedule file itself should have a dict rather than lists
+    wl_dict = {}
+    for i, rtype in enumerate(workload['rtype']):
+        wl_dict[rtype] = {}
+        wl_dict[rtype]['mean_ns'] = workload['mean_ns'][i]
+        wl_dict[rtype]['ratio'] = workload['ratios'][i]
+        wl_dict[rtype]['name'] = rtype
+        if req_names is not None:
+            wl_dict[rtype]['name'] = req_names[rtype]
+
+    req_iter = workload['rtype']
+    # Assume 1 or 2 request types
+    if len(workload['rtype']) > 1 and wl_dict[workload['rtype'][0]]['mean_ns'] > wl_dict[workload['rtype'][1]]['mean_ns']:
+        req_iter = [workload['rtype'][1], workload['rtype'][0]]
+    else:
+        req_iter = list(workload['rtype'])
+    # Get CPU demand
+    mean_ns = 0
+    for rtype in req_iter:
+        assert(rtype in wl_dict.keys())
+        mean_ns += wl_dict[rtype]['mean_ns'] * wl_dict[rtype]['ratio']
+    n_resas = 0
+    for rtype in req_iter:
+        demand = (wl_dict[rtype]['mean_ns'] * wl_dict[rtype]['ratio'] / mean_ns ) * 14
+        if round(demand) == 0:
+            demand = 1
+        else:
+            demand = round(demand)
+        demand = min(14 - n_resas, demand)
+        n_resas += demand
+        wl_dict[rtype]['demand'] = demand
+        wl_dict[rtype]['stealable'] = (14 - n_resas)
+    wl = ''
+    for i, rtype in enumerate(workload['rtype']):
+        wl += f"{wl_dict[rtype]['name']}: {wl_dict[rtype]['mean_ns']/1000} us, {wl_dict[rtype]['ratio'] * 100:.1f}%"
+#             wl += f" {wl_dict[rtype]['demand'] + wl_dict[rtype]['stealable']} cores ({wl_dict[rtype]['demand']} + {wl_dict[rtype]['stealable']})"
+        #wl += f" {wl_dict[rtype]['demand'] + wl_dict[rtype]['stealable']} cores"
+        if i < len(workload['rtype']):
+            wl += '\n'
+    return wl
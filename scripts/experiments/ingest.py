@@ -0,0 +1,32 @@
+#!/usr/bin/env python3
+# Post-run ingestion of an experiment's raw outputs.
+#
+# Converts the client traces to their columnar copies, builds the trace
+# sketches and writes the experiment's summary.json (percentiles, rates,
+# throughput and per-phase statistics), all next to the raw data. run.py
+# --ingest starts it in the background as soon as a run completes, so that a
+# finished sweep is ready to plot.
+import exp_data
+import trace_store
+import argparse
+import os
+import time
+
+def ingest_exp(exp, base_folder=exp_data.exp_base_folder, dt='client-end-to-end', verbose=True):
+    t0 = time.time()
+    exp_data.exp_base_folder = base_folder
+    trace_store.convert_exp(exp, base_folder, verbose=verbose)
+    summary = exp_data.write_exp_summary(exp, dt=dt, verbose=verbose)
+    if verbose:
+        print(f'[{exp}] Ingested in {time.time() - t0:.2f} seconds')
+    return summary
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Precompute summaries of finished experiments')
+    parser.add_argument('exp_folders', nargs='+', help='output folders of the experiments')
+    parser.add_argument('-d', '--data-type', type=str, default='client-end-to-end')
+    args = parser.parse_args()
+
+    for exp_folder in args.exp_folders:
+        exp_folder = os.path.abspath(exp_folder.rstrip('/'))
+        ingest_exp(os.path.basename(exp_folder), os.path.dirname(exp_folder) + '/', dt=args.data_type)
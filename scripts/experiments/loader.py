@@ -1,698 +1,33 @@
-import seaborn as sns
-import matplotlib
-import matplotlib.gridspec as gridspec
-import matplotlib.pyplot as plt
-import matplotlib.colors as mcolors
-from matplotlib.ticker import ScalarFormatter
-from matplotlib import lines
 import pandas as pd
 import numpy as np
-from pathlib import Path
 import os
-import sys
-import csv
 import time
 import yaml
+# Parsing and statistics live in exp_data.py, which batch jobs import directly
+from exp_data import *
 
-cache = {}
+# Plotting libraries are imported (and the rc settings applied) by the first
+# plot, so that importing loader stays fast. They are not defined before then,
+# so that `from loader import *` does not shadow the caller's own imports.
+_plotting_ready = False
 
-exp_base_folder = '/psp/experiments-data/'
-
-distros = {
-    'Figure3': 'DISP2',
-    'Figure4_a': 'DISP2',
-    'Figure4_b': 'SBIM2',
-    'Figure5_a': 'DISP2',
-    'Figure5_b': 'SBIM2',
-    'Figure6': 'TPCC',
-    'Figure7': 'ROCKSDB'
-}
-
-workloads = {
-    'BIM1': {
-        'avg_s': 1,
-        'name': '90.0:0.5 -- 10.0:5.5',
-        'max_load': 14000000,
-        'distribution': 'bimodal-90.0:0.5-10.0:5.5',
-        'SHORT': { 'MEAN': .5, 'RATIO': .9, 'YLIM': 60 },
-        'LONG': { 'MEAN': 5.5, 'RATIO': .1, 'YLIM': 60 },
-        'UNKNOWN': { 'MEAN': 1, 'RATIO': 1, 'YLIM': 60 }
-    },
-    'BIM2': {
-        'avg_s': 1,
-        'max_load': 14000000,
-        'name': '99.9:0.5-0.1:500.5',
-        'distribution': 'bimodal-99.9:0.5-0.1:500.5',
-        'SHORT': { 'MEAN': .5, 'RATIO': .999, 'YLIM': 400 },
-        'LONG': { 'MEAN': 500.5, 'RATIO': .001, 'YLIM': 1500 },
-        'UNKNOWN': { 'MEAN': 1, 'RATIO': 1, 'YLIM': 1500 }
-    },
-    'SBIM2': {
-        'avg_s': 2.9975,
-        'max_load': 4670558,
-        'name': '99.5:0.5-0.05:500',
-        'distribution': 'bimodal-99.5:0.5-0.5:500.0',
-        'SHORT': { 'MEAN': .5, 'RATIO': .995, 'YLIM': 300 },
-        'LONG': { 'MEAN': 500, 'RATIO': .005, 'YLIM': 3600 },
-        'UNKNOWN': { 'MEAN': 2.9975, 'RATIO': 1, 'YLIM': 3600 }
-    },
-    'DISP1': {
-        'avg_s': 5.5,
-        'name': '50.0:1.0 -- 50.0:10.0',
-        'max_load': 2545454,
-        'distribution': 'bimodal-50.0:1.0-50.0:10.0',
-        'SHORT': { 'MEAN': 1, 'RATIO': .5, 'YLIM': 50 },
-        'LONG': { 'MEAN': 10, 'RATIO': .5, 'YLIM': 300 },
-        'UNKNOWN': { 'MEAN': 5.5, 'RATIO': 1, 'YLIM': 300
-        }
-    },
-    'DISP2': {
-        'avg_s': 50.5,
-        'name': '50.0:1.0 -- 50.0:100.0',
-        'max_load': 277227,
-        'distribution': 'bimodal-50.0:1.0-50.0:100.0',
-        'SHORT': { 'MEAN': 1.0, 'RATIO': .5, 'YLIM': 300 },
-        'LONG': { 'MEAN': 100.0, 'RATIO': .5, 'YLIM': 300 },
-        'UNKNOWN': { 'MEAN': 50.5, 'RATIO': 1, 'YLIM': 300 }
-    },
-    'DISP3': {
-        'avg_s': 50.950,
-        'name': '95.0.0:1.0 -- 0.5:100.0',
-        'max_load': 274779,
-        'distribution': 'bimodal-95.0:1.0-0.5:100.0',
-        'SHORT': { 'MEAN': 1.0, 'RATIO': .95, 'YLIM': 300 },
-        'LONG': { 'MEAN': 100.0, 'RATIO': .5, 'YLIM': 300 },
-        'UNKNOWN': { 'MEAN': 50.5, 'RATIO': 1, 'YLIM': 300 }
-    },
-    'ROCKSDB': {
-        'avg_s': 526,
-        'name': 'ROCKSDB',
-        'max_load': 45000,
-        'distribution': 'bimodal-50.0:0.0-50.0:0.0',
-        'GET': { 'MEAN': 2.0, 'RATIO': .5, 'YLIM': 300 },
-        'SCAN': { 'MEAN': 1050.0, 'RATIO': .5, 'YLIM': 1000 },
-        'UNKNOWN': { 'MEAN': 526, 'RATIO': 1, 'YLIM': 200 }
-    },
-    'TPCC': {
-        'avg_s': 19,
-        'name': 'TPC-C',
-        'max_load': 735000,
-        'distribution': 'tpcc',
-        'NewOrder': { 'MEAN': 20, 'RATIO': .44, 'YLIM': 250 },
-        'Payment': { 'MEAN': 5.7, 'RATIO': .44, 'YLIM': 250 },
-        'Delivery': { 'MEAN': 88, 'RATIO': .04, 'YLIM': 250 },
-        'OrderStatus': { 'MEAN': 6, 'RATIO': .04, 'YLIM': 250 },
-        'StockLevel': { 'MEAN': 100, 'RATIO': .04, 'YLIM': 250 },
-        'UNKNOWN': { 'MEAN': 19, 'RATIO': 1, 'YLIM': 50 }
-    }
-}
-
-apps = {
-    'TPCC': ['Payment', 'OrderStatus', 'NewOrder', 'Delivery', 'StockLevel'],
-    'MB': ['SHORT', 'LONG'],
-    'REST': ['PAGE', 'REGEX'],
-    'ROCKSDB': ['GET', 'SCAN'],
-}
-
-policies = {
-    'DFCFS': 'd-FCFS',
-    'CFCFS': 'c-FCFS',
-    'shen-DFCFS': 'shen-DFCFS',
-    'shen-CFCFS': 'shen-CFCFS',
-    'SJF': 'ARS-FP',
-    'EDF': 'EDF',
-#     'CSCQ-half': 'CSCQ-half',
-#     'CSCQ': 'ARS-CS',
-#     'EDFNP': 'ARS-EDF',
-     'cPRESQ': 'cPRESQ',
-    'cPREMQ': 'cPREMQ',
-    'DARC': 'DARC'
-}
-
-# For final print
-pol_names = {
-    'DARC': 'DARC',
-    'c-FCFS': 'c-FCFS',
-    'd-FCFS': 'd-FCFS',
-    'cPREMQ': 'c-PRE',
-    'cPRESQ': 'c-PRE',
-    'ARS-FP': 'FP',
-    'EDF': 'EDF',
-    'shen-DFCFS': 'd-FCFS',
-    'shen-CFCFS': 'c-FCFS'
-}
-
-system_pol = {
-    'DFCFS': 'Perséphone',
-    'CFCFS': 'Perséphone',
-    'shen-DFCFS': 'Shenango',
-    'shen-CFCFS': 'Shenango',
-    'SJF': 'Perséphone',
-    'CSCQ-half': 'Perséphone',
-    'CSCQ': 'Perséphone',
-    'EDF': 'Perséphone',
-    'cPRESQ': 'Shinjuku',
-    'cPREMQ': 'Shinjuku',
-    'DARC': 'Perséphone'
-}
-
-trace_label_to_dtype = {
-    'client-end-to-end' : ['SENDING', 'COMPLETED'],
-    'client-receive'    : ['READING', 'COMPLETED'],
-    'client-send'       : ['SENDING', 'READING'],
-}
-
-CLT_TRACE_ORDER = [
-    'SENDING',
-    'READING',
-    'COMPLETED'
-]
-
-def read_profiling_node(exp, app, orders=CLT_TRACE_ORDER, verbose=True):
-    # First get traces
-    exp_folder = os.path.join(exp_base_folder, exp, app, '')
-    filename = os.path.join(exp_folder, 'traces')
-    if not Path(filename).is_file():
-        print('{} does not exist. Skipping {} {} traces.'.format(filename, exp, app))
-        return pd.DataFrame()
-    if verbose:
-        print(f"Parsing {filename}")
-
-    app_trace_df = pd.read_csv(filename, delimiter='\t')
-    app_trace_df = app_trace_df[app_trace_df.COMPLETED > 0]
-    if verbose:
-        print(f'{app} traces shape: {app_trace_df.shape}')
-
-    #Rename QLEN
-    cols = list(set(orders) & set(app_trace_df.columns)) + ['REQ_ID', 'REQ_TYPE', 'MEAN_NS', 'SCHED_ID']
-    return app_trace_df[cols]#.set_index('REQ_ID')
-
-def read_exp_traces(exp, verbose=True, clients=None):
-    if clients is None:
-        df = read_profiling_node(exp, 'client', verbose=verbose)
-    else:
-        clt_dfs = []
-        for clt in clients:
-            clt_df = read_profiling_node(
-                exp, 'client'+str(clt), verbose=verbose
-            )
-            clt_df['TIME'] = clt_df['SENDING'] - min(clt_df['SENDING'])
-            clt_dfs.append(clt_df)
-        df = pd.concat(clt_dfs)
-    #TODO check number of rows here
-    return df
-
-def prepare_traces(exps, data_types=list(trace_label_to_dtype), reset_time=True,
-                   reset_cache=False, seconds=True, pctl=1, req_type=None,
-                   verbose=False, get_schedule_data=False, **kwargs):
-    if not isinstance(data_types, list):
-        data_types = [data_types]
-
-    setups = {}
-    for exp in exps:
-        if (not reset_cache) and exp in cache:
-            setups[exp]= cache[exp]
-            continue
-
-        # First gather the traces
-        workload = exp.split('_')[2].split('.')[0]
-        if verbose:
-            print(f'================= PREPARING DATA FOR EXP {exp} =================')
-        main_df = read_exp_traces(exp, verbose=verbose, **kwargs)
-        if main_df.empty:
-            print('No data for {}'.format(exp))
-            continue
-        setups[exp] = {}
-        for data_type in data_types:
-            if verbose:
-                print(f'PARSING {data_type}')
-            c0 = trace_label_to_dtype[data_type][0]
-            c1 = trace_label_to_dtype[data_type][1]
-            if c0 not in main_df.columns or c1 not in main_df.columns:
-                print('{} not present in traces'.format(c0))
-                continue
-            setups[exp][data_type] = pd.DataFrame({
-                #'TIME': main_df[c0],
-                'TIME': main_df.TIME,
-                'VALUE': main_df[c1] - main_df[c0],
-                'SLOWDOWN': (main_df[c1] - main_df[c0]) / main_df['MEAN_NS'],
-                'SCHED_ID': main_df.SCHED_ID,
-                'REQ_TYPE': main_df.REQ_TYPE,
-                })
-            setups[exp][data_type].SCHED_ID = setups[exp][data_type].SCHED_ID.astype('uint64')
-            setups[exp][data_type].TIME = setups[exp][data_type].TIME.astype('uint64') #FIXME: is this forcing a copy???
-            setups[exp][data_type].VALUE = setups[exp][data_type].VALUE.astype('uint64')
-            if req_type is not None:
-                if setups[exp][data_type][setups[exp][data_type].REQ_TYPE == req_type].empty:
-                    setups[exp] = {}
-                    print('No {} in {} traces'.format(req_type, exp))
-                    continue
-                setups[exp][data_type] = setups[exp][data_type][setups[exp][data_type].REQ_TYPE == req_type]
-                if verbose:
-                    print('Filtering {} requests ({} found)'.format(req_type, setups[exp][data_type].shape[0]))
-            if reset_time:
-                # This is wrong for multiple clients
-                setups[exp][data_type].TIME -= min(setups[exp][data_type].TIME)
-
-            duration = (max(setups[exp][data_type].TIME) - min(setups[exp][data_type].TIME)) / 1e9
-            if verbose:
-                print(f"Experiment spanned {duration} seconds")
-            if verbose:
-                print(setups[exp][data_type].VALUE.describe([.5, .75, .9, .99, .9999, .99999, .999999]))
-            if seconds:
-                setups[exp][data_type].TIME /= 1e9
-            if pctl != 1:
-                setups[exp][data_type] = setups[exp][data_type][setups[exp][data_type].VALUE >= setups[exp][data_type].VALUE.quantile(pctl)]
-
-        # Then if needed retrieve other experiment data
-        if get_schedule_data:
-            df = setups[exp][data_type]
-            # Define number of bins (total duration in nanoseconds / 1e8, for 100ms bins)
-            bins = int((max(df.TIME) - min(df.TIME)) / 1e8)
-            print(f'Slicing {(max(df.TIME) - min(df.TIME)) / 1e9} seconds of data in {bins} bins')
-            # Create the bins
-            t0 = time.time()
-            df['time_bin'] = pd.cut(x=df.TIME, bins=bins)
-            print(f'Bins created in {time.time() - t0}')
-            # Get schedule information
-            sched_name = exp.split('_')[2] + '.yml'
-            sched_file = os.path.join(exp_base_folder, exp, sched_name)
-            with open(sched_file, 'r') as f:
-                schedule = yaml.load(f, Loader=yaml.FullLoader)
-            alloc_file = os.path.join(exp_base_folder, exp, 'server', 'windows')
-            alloc = pd.DataFrame()
-            if os.path.exists(alloc_file):
-                with open(alloc_file, 'r') as f:
-                    types = {
-                        'ID': 'uint32', 'START': 'float64', 'END': 'float64',
-                        'GID': 'uint32', 'RES': 'uint32', 'STEAL': 'uint32',
-                        'COUNT': 'uint32', 'UPDATED': 'uint32', 'QLEN': 'uint32'
-                    }
-                    alloc = pd.read_csv(f, delimiter='\t', dtype=types)
-                if not alloc.empty:
-                    # Add a last datapoint to prolongate the line
-                    alloc.START -= min(alloc.START)
-                    alloc.START /= 1e9
-                    alloc.END -= min(alloc.END)
-                    alloc.END /= 1e9
-                    last_dp1 = pd.DataFrame(alloc[-1:].values, index=[max(alloc.index)+1], columns=alloc.columns).astype(alloc.dtypes.to_dict())
-                    last_dp2 = pd.DataFrame(alloc[-2:-1].values, index=[max(alloc.index)+2], columns=alloc.columns).astype(alloc.dtypes.to_dict())
-                    assert(last_dp1.iloc[0].GID != last_dp2.iloc[0].GID)
-                    last_dp1.START = max(df.TIME) / 1e9
-                    last_dp2.START = max(df.TIME) / 1e9
-                    alloc = alloc.append([last_dp1, last_dp2])
-            # Get throughput
-            throughput_df = read_client_tp(exp)
-        #     throughput_df.N /= 1000
-            throughput_df.TIME -= min(throughput_df.TIME)
-            setups[exp]['bins'] = df
-            setups[exp]['tp'] = throughput_df
-            setups[exp]['schedule'] = schedule
-            setups[exp]['alloc'] = alloc
-        cache[exp] = setups[exp]
-
-    return setups
-
-def read_client_tp(exp, clients=[0]):
-    clt_dfs = []
-    for client in clients:
-        filename = os.path.join(exp_base_folder, exp, 'client'+str(client), 'traces_throughput')
-        clt_dfs.append(pd.read_csv(filename, delimiter="\t"))
-    return pd.concat(clt_dfs)
-
-def read_exp_names_from_file(filename, basedir=exp_base_folder):
-    filepath = Path(basedir, filename)
-    if not filepath.is_file():
-        print('{} does not exist'.format(filepath))
-    exps = []
-    with open(filepath, 'r') as f:
-        lines = f.readlines()
-        for line in lines:
-            exps.append(os.path.basename(line.rstrip()))
-    return exps
-
-def merge_hists(df):
-    base_cols = {}
-    base_cols['MIN'] = min(df['MIN'])
-    base_cols['MAX'] = max(df['MAX'])
-    base_cols['COUNT'] = df['COUNT'].sum()
-    base_cols['TOTAL'] = df['TOTAL'].sum()
-
-    # This is stupid
-    buckets = list(map(str,sorted(list(map(int, df.drop(['MIN', 'MAX', 'COUNT', 'TOTAL'], axis=1).columns)))))
-    return pd.DataFrame({**base_cols, **dict(df[buckets].sum())}, index=[0])
-
-def compute_pctls(hist):
-    pctls = {}
-    pctls['MIN'] = hist['MIN'] / 1000
-    pctls['MAX'] = hist['MAX'] / 1000
-    count = int(hist['COUNT'])
-    pctls['MEAN'] = (int(hist['TOTAL']) / count) / 1000
-    hist = hist.drop(['MIN', 'MAX', 'COUNT', 'TOTAL'], axis=1).sum()
-    c = 0
-    #Assume 1000ns buckets and consider average value.
-    for bucket in range(hist.shape[0]):
-        b_count = hist.iloc[bucket]
-        b_value = (int(hist.index[bucket]) + 500) / 1000
-        if c < count * .25 and c + b_count >= count * .25:
-            pctls['p25'] = b_value
-        if c < count * .5 and c + b_count >= count * .5:
-            pctls['MEDIAN'] = b_value
-        if c < count * .75 and c + b_count >= count * .75:
-            pctls['p75'] = b_value
-        if c < count * .99 and c + b_count >= count * .99:
-            pctls['p99'] = b_value
-        if c < count * .999 and c + b_count >= count * .999:
-            pctls['p99.9'] = b_value
-        if c < count * .9999 and c + b_count >= count * .9999:
-            pctls['p99.99'] = b_value
-        c += b_count
-    return pd.DataFrame(pctls, index=[0])
-
-def parse_hist(rtypes, exps, clients=[], dt='client-end-to-end'):
-    if not clients:
-        print('No clients given')
-        return {}
-
-    hists = {t: {exp: {dt : None} for exp in exps} for t in rtypes}
-    hists['all'] = {exp: {dt: None} for exp in exps}
-    for exp in exps:
-        wl = exp.split('_')[2].split('.')[0]
-        tdfs = {t: [] for t in rtypes}
-        for clt in clients:
-#        tdfs = {t: {} for t in rtypes}
-#        for i, clt in enumerate(clients):
-            exp_folder = os.path.join(exp_base_folder, exp, 'client'+str(clt), '')
-            filename = os.path.join(exp_folder, 'traces_hist')
-            if not Path(filename).exists():
-                print(f'{filename} does not exist')
-                continue
-            with open(filename, 'r') as f:
-                lines = f.readlines()
-                for (header,values) in zip(lines[::2], lines[1::2]):
-                    t = values.split()[0]
-                    if t == 'UNKNOWN':
-                        continue
-                    tdfs[t].append(pd.DataFrame(
-                        {k:v for (k,v) in zip(header.split()[1:], values.split()[1:])},
-                        index=[0]
-                    ))
-##                    if i == 0:
-##                        tdfs[t]['MIN'] = int(values.split()[1])
-##                        tdfs[t]['MAX'] = int(values.split()[2])
-##                        tdfs[t]['COUNT'] = int(values.split()[3])
-##                        tdfs[t]['TOTAL'] = int(values.split()[4])
-##                        tdfs[t].update(
-##                            {int(k):int(v) for (k,v) in zip(header.split()[5:], values.split()[5:])}
-##                        )
-##                    else:
-##                        if int(values.split()[1]) < tdfs[t]['MIN']:
-##                            tdfs[t]['MIN'] = int(values.split()[1])
-##                        if int(values.split()[2]) > tdfs[t]['MAX']:
-##                            tdfs[t]['MAX'] = int(values.split()[2])
-##                        tdfs[t]['COUNT'] += int(values.split()[3])
-##                        tdfs[t]['TOTAL'] += int(values.split()[4])
-##                        for k, v in zip(header.split()[5:], values.split()[5:]):
-##                            if int(k) in tdfs[t]:
-##                                tdfs[t][int(k)] += int(v)
-##                            else:
-##                                tdfs[t][int(k)] = int(v)
-
-        if len(clients) > len(tdfs[rtypes[0]]):
-            print(f'[{exp}] Missing {len(clients) - len(tdfs[rtypes[0]])} client histogram(s)')
-        # Compute percentiles for request types
-        typed_hists = {}
-        for t in rtypes:
-            typed_hists[t] = merge_hists(pd.concat(tdfs[t]).fillna(0).astype('uint64'))
-            #typed_hists[t] = pd.DataFrame(tdfs[t], index=[0]).astype('uint64')
-            hists[t][exp][dt] = compute_pctls(typed_hists[t])
-            hists[t][exp][dt]['p99_slowdown'] = hists[t][exp][dt]['p99'] / workloads[wl][t]['MEAN']
-            hists[t][exp][dt]['p99.9_slowdown'] = hists[t][exp][dt]['p99.9'] / workloads[wl][t]['MEAN']
-
-        # Merge them into an overall histogram
-        hists['all'][exp][dt] = compute_pctls(
-            merge_hists(pd.concat(typed_hists.values()).fillna(0).astype('uint64'))
-        )
-
-        # Compute slowdown hist for each req type
-        slowdown_hists = []
-        for t in rtypes:
-            h = typed_hists[t]
-            # Slowdown is bucket value / type mean service time
-            m = workloads[wl][t]['MEAN']
-            base_cols = {
-                'MIN': h['MIN'] / m,
-                'MAX': h['MAX'] / m,
-                'TOTAL': h['TOTAL'] / m,
-                'COUNT': h['COUNT'],
-            }
-            buckets = list(set(h.columns) - set(['MIN', 'MAX', 'COUNT', 'TOTAL']))
-            cols = {}
-            for bucket in buckets:
-                col = str(int(int(bucket) / m))
-                if col in cols:
-                    cols[col] += h[bucket].values[0]
-                else:
-                    cols[col] = h[bucket].values[0]
-            slowdown_hists.append(pd.DataFrame({**base_cols, **cols}))
-        merged_slowdown_hist = merge_hists(pd.concat(slowdown_hists).fillna(0).astype('uint64'))
-        slowdown_pctls = compute_pctls(merged_slowdown_hist)
-
-        hists['all'][exp][dt]['p99_slowdown'] = slowdown_pctls['p99']
-        hists['all'][exp][dt]['p99.9_slowdown'] = slowdown_pctls['p99.9']
-
-    return hists
-
-def parse_rates(exps, clients=[]):
-    if not clients:
-        print('No clients given')
-        return {}
-
-    rates = {}
-    for exp in exps:
-        dfs = []
-        for clt in clients:
-            exp_folder = os.path.join(exp_base_folder, exp, 'client'+str(clt), '')
-            filename = os.path.join(exp_folder, 'traces_rates')
-            if not Path(filename).exists():
-                print(f'{filename} does not exist')
-                continue
-            clt_df = pd.read_csv(filename, delimiter='\t', engine='c')
-            dfs.append(clt_df)
-
-        df = pd.concat(dfs)
-        #rates[exp] = pd.DataFrame({'OFFERED': [df.OFFERED.values[0] * len(clients)], 'ACHIEVED': [df.ACHIEVED.sum()]})
-        rates[exp] = pd.DataFrame({'OFFERED': [df.OFFERED.sum()], 'ACHIEVED': [df.ACHIEVED.sum()]})
-
-    return rates
-
-def prepare_pctl_data(rtypes, exps=[], exp_file=None, app="REST", dt='client-end-to-end', reset_cache=False, remove_drops=False, full_sample=False, verbose=False, **kwargs):
-    if (not reset_cache) and exp_file in cache:
-        return cache[exp_file]['all'], cache[exp_file]['typed']
+fd = {'family': 'normal', 'weight': 'bold', 'size': 9}
 
-    if exp_file is not None:
-        exps = read_exp_names_from_file(exp_file)
-    if not exps:
-        print('No experiment labels given')
+def setup_plotting():
+    global sns, matplotlib, gridspec, plt, mcolors, ScalarFormatter, lines, _plotting_ready
+    if _plotting_ready:
         return
+    import seaborn as sns
+    import matplotlib
+    import matplotlib.gridspec as gridspec
+    import matplotlib.pyplot as plt
+    import matplotlib.colors as mcolors
+    from matplotlib.ticker import ScalarFormatter
+    from matplotlib import lines
+    matplotlib.rc('font', **fd)
+    matplotlib.rcParams['lines.markersize'] = 3
+    _plotting_ready = True
 
-    rates_df = parse_rates(exps, **kwargs)
-    if (full_sample):
-        t0 = time.time()
-        dfs = {t: prepare_traces(exps, [dt], req_type=t, client_only=True, **kwargs) for t in rtypes}
-        dfs['all'] = prepare_traces(exps, [dt], client_only=True, **kwargs)
-        t1 = time.time()
-        print('loaded {} traces in {} seconds'.format(len(exps), t1-t0))
-    else:
-        t0 = time.time()
-        dfs = parse_hist(rtypes, exps, **kwargs)
-        print(f'[{exp_file}] Parsed histograms in {time.time()-t0:.6f} seconds')
-        if verbose:
-            print(dfs)
-
-    t0 = time.time()
-    rows = []
-    typed_rows = []
-    for exp in exps:
-        pol = policies[exp.split('_')[0]]
-        load = float(exp.split('_')[1])
-        workload = exp.split('_')[2].split('.')[0]
-        n_resa = int(exp.split('_')[-1].split('.')[0])
-        run_number = int(exp.split('.')[2])
-
-        rate_df = rates_df[exp]
-        rate_data = [rate_df.OFFERED[0], rate_df.ACHIEVED[0]]
-        '''
-        if remove_drops and sum(rate_df.ACHIEVED < rate_df.OFFERED * .999) == 1:
-            print(f'Exp {exp} dropped requests (achieved={rate_df.ACHIEVED.values}, offered={rate_df.OFFERED.values}) passing.')
-            continue
-        '''
-
-        if full_sample:
-            for i, t in enumerate(rtypes):
-                if not (exp not in dfs[t] or dt not in dfs[t][exp] or dfs[t][exp][dt].empty):
-                    df = dfs[t][exp][dt]
-                    df.VALUE /= 1000
-                    df['slowdown'] = df.VALUE / workloads[workload][t]['MEAN']
-                    data = [
-                        pol, load, t,
-                        int(df.VALUE.mean()), int(df.VALUE.median()), int(df.VALUE.quantile(q=.99)),
-                        int(df.VALUE.quantile(q=.999)), int(df.VALUE.quantile(q=.9999)),
-                        int(df.slowdown.quantile(q=.99)), int(df.slowdown.quantile(q=.999))
-                    ]
-                    typed_rows.append(data + rate_data)
-
-            if not (exp not in dfs['all'] or dt not in dfs['all'][exp] or dfs['all'][exp][dt].empty):
-                df = dfs['all'][exp][dt]
-                df.VALUE /= 1000
-                df['slowdown'] = df.apply(lambda x: x.VALUE / workloads[workload][x.REQ_TYPE]['MEAN'], axis = 1)
-                data = [
-                    pol, load, 'UNKNOWN',
-                    int(df.VALUE.mean()), int(df.VALUE.median()), int(df.VALUE.quantile(q=.99)),
-                    int(df.VALUE.quantile(q=.999)), int(df.VALUE.quantile(q=.9999)),
-                    int(df.slowdown.quantile(q=.99)), int(df.slowdown.quantile(q=.999))
-                ]
-                rows.append(data + rate_data)
-        else:
-            # So stupid that we have to get the [0] for each value in a 1row dataframe
-            for i, t in enumerate(rtypes):
-                if not (exp not in dfs[t] or dt not in dfs[t][exp] or dfs[t][exp][dt].empty):
-                    df = dfs[t][exp][dt]
-
-                    #if sum(rate_df.ACHIEVED < rate_df.OFFERED * .999) == 1 and not pol in ['c-PRE-MQ', 'c-PRE-SQ']:
-                    #if sum(rate_df.ACHIEVED < rate_df.OFFERED * .999) == 1 and pol in ['c-PRE-MQ', 'c-PRE-SQ']:
-                    #if remove_drops and sum(rate_df.ACHIEVED < rate_df.OFFERED * .999) == 1 and not pol in ['c-PRE-MQ', 'c-PRE-SQ']:
-                    if remove_drops and sum(rate_df.ACHIEVED < rate_df.OFFERED * .999) == 1:
-                        p999_slowdown = 1e9
-                        p999 = 1e9
-                    else:
-                        p999_slowdown = df['p99.9_slowdown'][0]
-                        p999 = df['p99.9'][0]
-                    #if remove_drops and sum(rate_df.ACHIEVED < rate_df.OFFERED * .99) == 1 and not pol in ['c-PRE-MQ', 'c-PRE-SQ']:
-                    if remove_drops and sum(rate_df.ACHIEVED < rate_df.OFFERED * .99) == 1:
-                        p99_slowdown = 1e9
-                        p99 = 1e9
-                    else:
-                        p99_slowdown = df['p99_slowdown'][0]
-                        p99 = df['p99'][0]
-
-                    data = [
-                        pol, load, t, run_number,
-                        df['MEAN'][0], df['MEDIAN'][0], p99, p999, df['p99.99'][0],
-                        p99_slowdown, p999_slowdown
-                    ]
-                    typed_rows.append(data + rate_data + [n_resa])
-            if not (exp not in dfs['all'] or dt not in dfs['all'][exp] or dfs['all'][exp][dt].empty):
-                df = dfs['all'][exp][dt]
-
-                #if sum(rate_df.ACHIEVED < rate_df.OFFERED * .999) == 1 and not pol in ['c-PRE-MQ', 'c-PRE-SQ']:
-                #if sum(rate_df.ACHIEVED < rate_df.OFFERED * .999) == 1 and pol in ['c-PRE-MQ', 'c-PRE-SQ']:
-                #if remove_drops and sum(rate_df.ACHIEVED < rate_df.OFFERED * .999) == 1 and not pol in ['c-PRE-MQ', 'c-PRE-SQ']:
-                if remove_drops and sum(rate_df.ACHIEVED < rate_df.OFFERED * .999) == 1:
-                    p999_slowdown = 1e9
-                    p999 = 1e9
-                else:
-                    p999_slowdown = df['p99.9_slowdown'][0]
-                    p999 = df['p99.9'][0]
-                #if remove_drops and sum(rate_df.ACHIEVED < rate_df.OFFERED * .99) == 1 and not pol in ['c-PRE-MQ', 'c-PRE-SQ']:
-                if remove_drops and sum(rate_df.ACHIEVED < rate_df.OFFERED * .99) == 1:
-                    p99_slowdown = 1e9
-                    p99 = 1e9
-                else:
-                    p99_slowdown = df['p99_slowdown'][0]
-                    p99 = df['p99'][0]
-                data = [
-                    pol, load, 'UNKNOWN', run_number,
-                    df['MEAN'][0], df['MEDIAN'][0], p99, p999, df['p99.99'][0],
-                    p99_slowdown, p999_slowdown
-                ]
-                rows.append(data + rate_data + [n_resa])
-    t1 = time.time()
-    print(f'[{exp_file}] Prepared df rows in {t1-t0:.6f} seconds')
-#     print(rows)
-
-    t0 = time.time()
-    types = {
-        'policy': 'object', 'load': 'float', 'type': 'object', 'run_number': 'int', 'mean': 'int64',
-        'median': 'int64', 'p99': 'int64', 'p99_slowdown': 'int64', 'p99.9': 'int64',
-        'p99.99': 'int64', 'p99.9_slowdown': 'int64', 'offered': 'int64', 'achieved': 'int64',
-        'reserved': 'int64'
-    }
-    df = pd.DataFrame(
-        rows,
-        columns=[
-            'policy', 'load', 'type', 'run_number', 'mean', 'median', 'p99', 'p99.9', 'p99.99',
-            'p99_slowdown', 'p99.9_slowdown', 'offered', 'achieved', 'reserved'
-        ]
-    ).dropna().astype(dtype=types)
-    typed_df = pd.DataFrame(
-        typed_rows,
-        columns=[
-            'policy', 'load', 'type', 'run_number', 'mean', 'median', 'p99', 'p99.9', 'p99.99',
-            'p99_slowdown', 'p99.9_slowdown', 'offered', 'achieved', 'reserved'
-        ]
-    ).dropna().astype(dtype=types)
-    t1 = time.time()
-    print(f'[{exp_file}] Created df in {t1-t0:.6f} seconds')
-
-    # If we want to get Krps and us rather than rps and ns
-    df.achieved /= 1000
-    df.offered /= 1000
-    typed_df.achieved /= 1000
-    typed_df.offered /= 1000
-
-    cache[exp_file] = {}
-    cache[exp_file]['all'] = df
-    cache[exp_file]['typed'] = typed_df
-
-    return df, typed_df
-
-def gen_wl_dsc(workload, req_names=None):
-    # The schedule file itself should have a dict rather than lists
-    wl_dict = {}
-    for i, rtype in enumerate(workload['rtype']):
-        wl_dict[rtype] = {}
-        wl_dict[rtype]['mean_ns'] = workload['mean_ns'][i]
-        wl_dict[rtype]['ratio'] = workload['ratios'][i]
-        wl_dict[rtype]['name'] = rtype
-        if req_names is not None:
-            wl_dict[rtype]['name'] = req_names[rtype]
-
-    req_iter = workload['rtype']
-    # Assume 1 or 2 request types
-    if len(workload['rtype']) > 1 and wl_dict[workload['rtype'][0]]['mean_ns'] > wl_dict[workload['rtype'][1]]['mean_ns']:
-        req_iter = [workload['rtype'][1], workload['rtype'][0]]
-    else:
-        req_iter = list(workload['rtype'])
-    # Get CPU demand
-    mean_ns = 0
-    for rtype in req_iter:
-        assert(rtype in wl_dict.keys())
-        mean_ns += wl_dict[rtype]['mean_ns'] * wl_dict[rtype]['ratio']
-    n_resas = 0
-    for rtype in req_iter:
-        demand = (wl_dict[rtype]['mean_ns'] * wl_dict[rtype]['ratio'] / mean_ns ) * 14
-        if round(demand) == 0:
-            demand = 1
-        else:
-            demand = round(demand)
-        demand = min(14 - n_resas, demand)
-        n_resas += demand
-        wl_dict[rtype]['demand'] = demand
-        wl_dict[rtype]['stealable'] = (14 - n_resas)
-    wl = ''
-    for i, rtype in enumerate(workload['rtype']):
-        wl += f"{wl_dict[rtype]['name']}: {wl_dict[rtype]['mean_ns']/1000} us, {wl_dict[rtype]['ratio'] * 100:.1f}%"
-#             wl += f" {wl_dict[rtype]['demand'] + wl_dict[rtype]['stealable']} cores ({wl_dict[rtype]['demand']} + {wl_dict[rtype]['stealable']})"
-        #wl += f" {wl_dict[rtype]['demand'] + wl_dict[rtype]['stealable']} cores"
-        if i < len(workload['rtype']):
-            wl += '\n'
-    return wl
-
-
-fd = {'family': 'normal', 'weight': 'bold', 'size': 9}
-matplotlib.rc('font', **fd)
-matplotlib.rcParams['lines.markersize'] = 3
 pd.set_option('display.max_rows', 500)
 pd.options.display.float_format = '{:.9f}'.format
 
@@ -717,6 +52,7 @@ ts_pal = {"SHORT": "C0", "LONG": "C1", "PAGE":"C0","REGEX":"C1", 'NewOrder': 'C0
 np.set_printoptions(precision=3)
 
 def plot_setups_traces(exps, data_types=[], show_ts=False, pctl=1, reset_figure=True, app='REST', **kwargs):
+    setup_plotting()
     req_types = apps[app]
 
     if reset_figure:
@@ -724,6 +60,8 @@ def plot_setups_traces(exps, data_types=[], show_ts=False, pctl=1, reset_figure=
     if (len(data_types) == 0):
         data_types = ['client-end-to-end']
 
+    # Times are always plotted in seconds, from the integer ns setups
+    kwargs.pop('seconds', None)
     setups = prepare_traces(exps, data_types, pctl=pctl, **kwargs)
 
     if show_ts:
@@ -740,20 +78,22 @@ def plot_setups_traces(exps, data_types=[], show_ts=False, pctl=1, reset_figure=
             sy=False
         fig, axs = plt.subplots(1, ncols, squeeze=False, sharey=sy, sharex=False, num=i+1)
         for j, setup in enumerate(setups.keys()):
-            setups[setup][t].VALUE /= 1000
+            # Prepared (and cached) frames are not modified: derive the
+            # plotted units locally
+            df = setups[setup][t]
+            df = pd.DataFrame({'TIME': time_seconds(df), 'VALUE': df.VALUE / 1000, 'REQ_TYPE': df.REQ_TYPE})
             if show_ts:
                 c_index = j % ncols
-                sns.scatterplot(x=setups[setup][t].TIME, y='VALUE', data=setups[setup][t], hue="REQ_TYPE", ax=axs[0][c_index], label=setup, palette=ts_pal)#, style="REQ_TYPE")
+                sns.scatterplot(x='TIME', y='VALUE', data=df, hue="REQ_TYPE", ax=axs[0][c_index], label=setup, palette=ts_pal)#, style="REQ_TYPE")
                 axs[0][c_index].set(xlabel='Time', ylabel='latency (us)')
             else:
                 if pctl != 1:
                     base = pctl
                 else:
                     base = 0
-                setups[setup][t].sort_values(by=['VALUE'], inplace=True)
 
                 for col, rtype in enumerate(req_types):
-                    type_df = setups[setup][t][setups[setup][t].REQ_TYPE == rtype]
+                    type_df = df[df.REQ_TYPE == rtype]
                     y = np.linspace(base, 1, len(type_df.VALUE))
                     x = np.sort(type_df.VALUE)
                     print('[{}: {}] mean: {}, median: {}, p99: {}'.format(
@@ -772,7 +112,12 @@ def plot_setups_traces(exps, data_types=[], show_ts=False, pctl=1, reset_figure=
             axs[0][0].legend()
 
 alph = ['(a)', '(b)', '(c)', '(d)', '(e)', '(f)']
-def plot_p99s(exp_files, app="MB", value='p99', use_ylim=True, close_all=True, ncols=2, **kwargs):
+def plot_p99s(exp_files, app="MB", value='p99', use_ylim=True, close_all=True, ncols=2, output=None, pctl_data=None, **kwargs):
+    # pctl_data: prepare_pctl_data's (overall, typed) tables of some exp_files,
+    # already computed by the caller
+    if pctl_data is None:
+        pctl_data = {}
+    setup_plotting()
     if close_all:
         plt.close('all')
     colors = list(mcolors.TABLEAU_COLORS.keys())[:len(policies)]
@@ -805,7 +150,10 @@ def plot_p99s(exp_files, app="MB", value='p99', use_ylim=True, close_all=True, n
     row_labels = []
     for row, exp_file in enumerate(exp_files):
         dist = distros[exp_file]
-        psp_df_all, psp_df_typed = prepare_pctl_data(req_types, exp_file=exp_file, **kwargs)
+        if exp_file in pctl_data:
+            psp_df_all, psp_df_typed = pctl_data[exp_file]
+        else:
+            psp_df_all, psp_df_typed = prepare_pctl_data(req_types, exp_file=exp_file, **kwargs)
         df = psp_df_all.groupby(['achieved', 'policy', 'type']).min().reset_index(drop=False)
         typed_df = psp_df_typed.groupby(['achieved', 'policy', 'type']).min().reset_index(drop=False)
 
@@ -828,7 +176,7 @@ def plot_p99s(exp_files, app="MB", value='p99', use_ylim=True, close_all=True, n
                 if use_ylim:
                     axes[row][0].set_ylim(bottom=-5, top=workloads[dist]['UNKNOWN']['YLIM'])
                 axes[row][0].set_xlim(left=left, right=workloads[dist]['max_load']/1000)
-                axes[row][0].grid(b=True, axis='y', linestyle='-', linewidth=1)
+                axes[row][0].grid(True, axis='y', linestyle='-', linewidth=1)
                 axes[row][0].set_title('Overall', fd)
                 axes[row][0].set_ylabel(f'p99.9 slowdown', fd)
 
@@ -842,7 +190,7 @@ def plot_p99s(exp_files, app="MB", value='p99', use_ylim=True, close_all=True, n
                         if use_ylim:
                             axes[row][col].set_ylim(bottom=-5, top=workloads[dist][rtype]['YLIM'])
                         axes[row][col].set_xlim(left=left, right=workloads[dist]['max_load']/1000)
-                        axes[row][col].grid(b=True, axis='y', linestyle='-', linewidth=1)
+                        axes[row][col].grid(True, axis='y', linestyle='-', linewidth=1)
                         if col == 1:
                              axes[row][col].set_ylabel(f'p99.9 latency (us)', fd)
                         axes[row][col].set_title(f'{rtype}', fd)
@@ -855,7 +203,7 @@ def plot_p99s(exp_files, app="MB", value='p99', use_ylim=True, close_all=True, n
 #                     axes[row][0].set_ylim(bottom=-5, top=3500)
                 axes[row][0].set_xlim(left=left, right=workloads[dist]['max_load']/1000)
 #                 axes[row][0].set_xlim(left=left, right=4000)
-                axes[row][0].grid(b=True, axis='y', linestyle='-', linewidth=1)
+                axes[row][0].grid(True, axis='y', linestyle='-', linewidth=1)
                 axes[row][0].set_title('Overall', fd)
                 axes[row][0].set_ylabel(f'p99.9 slowdown', fd)
 
@@ -872,7 +220,7 @@ def plot_p99s(exp_files, app="MB", value='p99', use_ylim=True, close_all=True, n
                     axes[row][col].set_xlim(left=left, right=workloads[dist]['max_load']/1000)
 #                     axes[row][0].set_xlim(left=left, right=4000)
 
-                    axes[row][col].grid(b=True, axis='y', linestyle='-', linewidth=1)
+                    axes[row][col].grid(True, axis='y', linestyle='-', linewidth=1)
                     if col == 1:
                          axes[row][col].set_ylabel(f'p99.9 latency (us)', fd)
 
@@ -923,7 +271,9 @@ def plot_p99s(exp_files, app="MB", value='p99', use_ylim=True, close_all=True, n
 #     plt.subplots_adjust(left=0.05, bottom=None, right=0.95, top=None, wspace=0.3, hspace=0)
     plt.subplots_adjust(left=None, bottom=None, right=None, top=.8, wspace=None, hspace=None)
 #     fig.set_canvas(plt.gcf().canvas)
-    plt.savefig(f'/psp/experiments-data/{exp_files[0]}.pdf', format='pdf')
+    if output is None:
+        output = f'/psp/experiments-data/{exp_files[0]}.pdf'
+    plt.savefig(output, format='pdf')
 #     gs1 = gridspec.GridSpec(23, 8)
 #     gs1.update(wspace=0.025, hspace=0.05) # set the spacing between axes.
 #     set_size(20,5)
@@ -931,6 +281,7 @@ def plot_p99s(exp_files, app="MB", value='p99', use_ylim=True, close_all=True, n
 
 def set_size(w,h, ax=None):
     """ w, h: width, height in inches """
+    setup_plotting()
     if not ax: ax=plt.gca()
     l = ax.figure.subplotpars.left
     r = ax.figure.subplotpars.right
@@ -942,6 +293,7 @@ def set_size(w,h, ax=None):
 
 
 def plot_wcc(exp_file, value='p99', darc_cores=2, **kwargs):
+    setup_plotting()
     req_types = apps['MB']
     df, typed_df = prepare_pctl_data(req_types, exp_file=exp_file, **kwargs)
     df = df[df.policy == 'DARC'].sort_values(by=['load'])
@@ -951,7 +303,7 @@ def plot_wcc(exp_file, value='p99', darc_cores=2, **kwargs):
     fig, ax = plt.subplots(1, 1, figsize=(6.5, 3.25))
     ax.set_ylabel(f'{value} slowdown', fd)
     ax.set_xlabel('Number of reserved workers', fd)
-    ax.grid(b=True, axis='y', linestyle='-', linewidth=1)
+    ax.grid(True, axis='y', linestyle='-', linewidth=1)
 
     # Plot DARC with varying reserved cores
     line, = ax.plot(df.reserved, df[value+'_slowdown'], marker='^', linestyle='solid', color='green', label='DARC-static')
@@ -969,6 +321,7 @@ def plot_wcc(exp_file, value='p99', darc_cores=2, **kwargs):
     fig.tight_layout()
 
 def plot_tp(exps, hue=False):
+    setup_plotting()
     plt.close('all')
     fig, axes = plt.subplots(len(exps), 1, squeeze=False, num=1)
     for i, exp in enumerate(exps):
@@ -989,30 +342,31 @@ def plot_tp(exps, hue=False):
 #         axes[i][0].set_ylim(ymin=0)
 
 def plot_allocs(exp):
+    setup_plotting()
     plt.close('all')
-    fname = os.path.join('/home/maxdml/experiments', exp, 'server', 'windows');
-    with open(fname, 'r') as f:
-        df = pd.read_csv(fname, delimiter='\t')
-    df.TIME -= min(df.TIME)
-    df.TIME /= 1e9
+    df = exp_reservations(exp).frame()
+    if df.empty:
+        print(f'No DARC windows for {exp}')
+        return
     fig, axes = plt.subplots(3, 1, squeeze=False)
-    sns.scatterplot(x='TIME', y='RES', data=df, hue="GID", ax=axes[0][0], s=16)
+    sns.scatterplot(x='START', y='RES', data=df, hue="GID", ax=axes[0][0], s=16)
 #     for gid in df.GID.unique():
 #         gdf = df[df.GID == gid]
 #         gdf.TIME -= min(gdf.TIME)
 #         sns.scatterplot(x='TIME', y='RES', data=gdf, ax=axes[0][0], s=16, label=gid)
     time_series = df[df.GID == 0].reset_index()
-    time_series = time_series.TIME - time_series.TIME.shift()
+    time_series = time_series.START - time_series.START.shift()
     print(time_series.describe())
-    sns.scatterplot(data=time_series, ax=axes[1][0], hue="GID", s=16, label=0)
+    sns.scatterplot(data=time_series, ax=axes[1][0], s=16, label=0)
     axes[1][0].get_legend().remove()
-    sns.scatterplot(x='TIME', y='COUNT', data=df, hue='GID', ax=axes[2][0] ,color='black')
+    sns.scatterplot(x='START', y='COUNT', data=df, hue='GID', ax=axes[2][0] ,color='black')
     axes[2][0].get_legend().remove()
 #     axes[2][0].set_ylim(top=100000)typed_lat_df
 
 #TODO: setup the right color/markers for each exp
 #TODO: check that schedule is the same across experiments
-def plot_agg_p99_over_time(exps, app='MB', debug=False, **kwargs):
+def plot_agg_p99_over_time(exps, app='MB', debug=False, bin_width=1e8, **kwargs):
+    setup_plotting()
     if not isinstance(exps, list):
         exps = [exps]
     req_types = apps[app] # Assume the schedule has the same types
@@ -1040,7 +394,7 @@ def plot_agg_p99_over_time(exps, app='MB', debug=False, **kwargs):
     # Plot each req type
     plt.close('all')
     t0 =  time.time()
-    setups = prepare_traces(exps, ['client-end-to-end'], pctl=1, clients=[0,1,2,3,4,5], seconds=False, get_schedule_data=True, **kwargs)
+    setups = prepare_traces(exps, ['client-end-to-end'], pctl=1, clients=[0,1,2,3,4,5], get_schedule_data=True, bin_width=bin_width, **kwargs)
     nrows = 2
     if debug:
         nrows += 2
@@ -1049,17 +403,17 @@ def plot_agg_p99_over_time(exps, app='MB', debug=False, **kwargs):
     for e, exp in enumerate(exps):
         pol = policies[exp.split('_')[0]]
         df, throughput_df, schedule, alloc = setups[exp]['bins'], setups[exp]['tp'], setups[exp]['schedule'], setups[exp]['alloc']
+        # p99.9 per bin and request type, in one pass
+        pctls = time_binned_pctls(
+            df, bin_width=bin_width, quantiles=[.999], include_all=False, origin=setups[exp].get('bin_origin')
+        )
         for i, req_type in enumerate(req_types):
-            typed_lat_df = df[df.REQ_TYPE == req_type]
-    #         print(typed_lat_df.VALUE.describe([.25, .5, .75, .9, .99, .999, .9999]))
-            # Groupby bins and get p99.9
-            total_p999 = typed_lat_df.VALUE.quantile(.999) / 1000
     #         total_p99 = typed_lat_df.VALUE.quantile(.99) / 1000
     #         total_p90 = typed_lat_df.VALUE.quantile(.9) / 1000
     #         total_p50 = typed_lat_df.VALUE.quantile(.5) / 1000
     #         import pdb; pdb.set_trace()
-            lat_df = typed_lat_df.groupby(['time_bin'])[['VALUE', 'SCHED_ID']].quantile(0.999).reset_index() # This is a shitty/buggy way to keep the sched_id
-            lat_df.VALUE /= 1000
+            lat_df = pctls[pctls.REQ_TYPE == req_type].reset_index(drop=True)
+            lat_df['VALUE'] = lat_df['p99.9'] / 1000
             if max(lat_df.VALUE) > max_y:
                 max_y = max(lat_df.VALUE) + max(lat_df.VALUE)*.05
             #axes[0][0].hlines(y=total_p999, xmin=0, xmax=max(lat_df.index/1e1), linestyles=':', color=c[req_type], label=req_names[req_type] +'_p999')
@@ -1069,7 +423,7 @@ def plot_agg_p99_over_time(exps, app='MB', debug=False, **kwargs):
             label = req_names[req_type] + '_' + pol if len(exps) > 1 else req_names[req_type]
             if debug:
                 sns.lineplot(
-                    x=lat_df.index / 1e1, y='VALUE', data=lat_df, ax=axes[0][0], hue="SCHED_ID",
+                    x=lat_df.TIME / 1e9, y='VALUE', data=lat_df, ax=axes[0][0], hue="SCHED_ID",
                     color=style[label]['color'], marker=style[label]['marker'],  markersize=7,
                     style="SCHED_ID", label=label
                 )
@@ -1078,7 +432,7 @@ def plot_agg_p99_over_time(exps, app='MB', debug=False, **kwargs):
 #                 axes[2][0].set_ylabel(f'Throughput (Krps)', fd)
             else:
                 sns.lineplot(
-                    x=lat_df.index / 1e1, y='VALUE', data=lat_df, ax=axes[0][0],
+                    x=lat_df.TIME / 1e9, y='VALUE', data=lat_df, ax=axes[0][0],
                     color=style[label]['color'], marker=style[label]['marker'], linewidth=lsizes[pol], markersize=msizes[pol],
                     label=label
                 )
@@ -1103,11 +457,13 @@ def plot_agg_p99_over_time(exps, app='MB', debug=False, **kwargs):
 
     # Fill background // Assume same schedule across provided experiments
 #     offset = 0
-    start_times_df = df.groupby('SCHED_ID').time_bin.min()
-    start_times = np.insert(start_times_df[1:].apply(lambda x: x.left).values, 0, 0)
+    # Only the phases present (all of them, unless given a time_range)
+    start_times_df = df.groupby('SCHED_ID').time_bin.min() * bin_width
+    start_times = np.insert(start_times_df[1:].values, 0, min(df.TIME))
     end_times = np.append(start_times[1:], max(df.TIME))
     schedule = setups[exps[0]]['schedule']
-    for w, workload in enumerate(schedule):
+    for w, sched_id in enumerate(start_times_df.index):
+        workload = schedule[sched_id]
 #         start_time = offset
 #         end_time = (start_time + workload['duration'])
 #         offset += workload['duration']
@@ -1115,7 +471,7 @@ def plot_agg_p99_over_time(exps, app='MB', debug=False, **kwargs):
         end = end_times[w] / 1e9
         print(f'filling between {start:.3f} and {end:.3f}')
         for n in range(nrows):
-            axes[n][0].axvspan(start, end, alpha=.1, color=list(mcolors.TABLEAU_COLORS.keys())[w%2])# color=colors[w%2])
+            axes[n][0].axvspan(start, end, alpha=.1, color=list(mcolors.TABLEAU_COLORS.keys())[sched_id%2])# color=colors[w%2])
             axes[n][0].axvline(x=start, linewidth=1, color='black', dashes=(5, 2, 1, 2))
         wl = gen_wl_dsc(workload, req_names)
         axes[0][0].text(
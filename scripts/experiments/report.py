@@ -0,0 +1,179 @@
+#!/usr/bin/env python3
+# Headless build of the figures' percentile tables and plots.
+#
+# A figure is an experiment list file (e.g. experiments-data/Figure3, as read
+# by plot_p99s) or a directory of experiment folders. For each figure, writes
+# the prepare_pctl_data tables (overall and per type) to
+# <output>/<figure>/pctls and pctls_typed (parquet or CSV) and, for the paper's
+# figures (keys of exp_data.distros), renders plot_p99s to
+# <output>/<figure>/<figure>.pdf with the Agg backend. Figures are built in a
+# pool of worker processes.
+#
+# Each build records a signature of its inputs (the list file and every file
+# of its experiments) and options in <output>/<figure>/report.json. A figure
+# whose signature did not change is skipped, so that rebuilding all figures
+# after adding a run only reprocesses the figure(s) that include it.
+import exp_data
+from result_cache import files_signature
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+import traceback
+import argparse
+import hashlib
+import json
+import os
+import time
+
+REPORT_FILE = 'report.json'
+# Request types of the workloads that plot_p99s knows the application of
+WORKLOAD_APPS = {'DISP2': 'MB', 'SBIM2': 'MB', 'TPCC': 'TPCC', 'ROCKSDB': 'ROCKSDB'}
+# plot_p99s options of the paper's figures, as in psp.ipynb
+FIGURE_PLOTS = {
+    'Figure3': {'ncols': 1},
+    'Figure6': {'ncols': -1},
+    'Figure7': {'ncols': 1},
+}
+
+def figure_exps(figure, base_folder=exp_data.exp_base_folder):
+    # (name, folder of the experiments, experiment names, list file or None)
+    path = Path(figure)
+    if not path.exists():
+        path = Path(base_folder, figure)
+    if path.is_dir():
+        exps = sorted(p.name for p in path.iterdir() if p.is_dir() and any(p.glob('client*')))
+        return path.name, str(path), exps, None
+    if not path.is_file():
+        print(f'{path} does not exist')
+        return path.name, base_folder, [], None
+    # Experiments of a list file are next to it
+    exps = exp_data.read_exp_names_from_file(path.name, basedir=path.parent)
+    return path.name, str(path.parent), exps, str(path)
+
+def figure_rtypes(exps):
+    workload = exps[0].split('_')[2].split('.')[0]
+    if workload in WORKLOAD_APPS:
+        return WORKLOAD_APPS[workload], exp_data.apps[WORKLOAD_APPS[workload]]
+    wl = exp_data.workloads[workload]
+    return None, [t for t, v in wl.items() if isinstance(v, dict) and t != 'UNKNOWN']
+
+def figure_clients(folder, exps):
+    # Every client that has an output folder in one of the experiments
+    exp_data.exp_base_folder = folder
+    return sorted(set(c for exp in exps for c in exp_data.exp_clients(exp)))
+
+def figure_signature(folder, exps, list_file, options):
+    paths = [os.path.join(folder, exp) for exp in exps]
+    if list_file is not None:
+        paths.append(list_file)
+    key = repr((sorted(options.items()), files_signature(paths)))
+    return hashlib.sha1(key.encode()).hexdigest()
+
+def read_report(out_dir):
+    filename = os.path.join(out_dir, REPORT_FILE)
+    if not os.path.isfile(filename):
+        return None
+    with open(filename, 'r') as f:
+        return json.load(f)
+
+def write_table(df, filename, fmt):
+    if fmt == 'csv':
+        df.to_csv(filename + '.csv', index=False)
+        return filename + '.csv'
+    df.reset_index(drop=True).to_parquet(filename + '.parquet', index=False)
+    return filename + '.parquet'
+
+def render_figure(name, app, df, typed_df, output):
+    # Plots the tables build_figure computed. Imported here, so that the
+    # backend is set before pyplot is.
+    import matplotlib
+    matplotlib.use('Agg')
+    import loader
+    try:
+        loader.plot_p99s(
+            [name], app=app, value='p99.9', use_ylim=True, close_all=True, output=output,
+            pctl_data={name: (df, typed_df)}, **FIGURE_PLOTS.get(name, {})
+        )
+    finally:
+        loader.plt.close('all')
+
+def build_figure(name, folder, exps, out_dir, app, rtypes, clients, remove_drops=True, fmt='parquet', plot=True):
+    t0 = time.time()
+    exp_data.exp_base_folder = folder
+    os.makedirs(out_dir, exist_ok=True)
+    df, typed_df = exp_data.prepare_pctl_data(rtypes, exps=exps, clients=clients, remove_drops=remove_drops)
+    outputs = {
+        'pctls': write_table(df, os.path.join(out_dir, 'pctls'), fmt),
+        'pctls_typed': write_table(typed_df, os.path.join(out_dir, 'pctls_typed'), fmt),
+    }
+    if plot and name in exp_data.distros and app is not None:
+        output = os.path.join(out_dir, name + '.pdf')
+        try:
+            render_figure(name, app, df, typed_df, output)
+            outputs['figure'] = output
+        except Exception:
+            # The tables are still valid
+            print(f'[{name}] Could not render the figure:\n{traceback.format_exc()}')
+    return outputs, time.time() - t0
+
+def build_reports(figures, output, base_folder=exp_data.exp_base_folder, remove_drops=True, fmt='parquet',
+                  plot=True, force=False, n_workers=-1):
+    if n_workers == -1:
+        n_workers = os.cpu_count()
+    jobs = {}
+    for figure in figures:
+        name, folder, exps, list_file = figure_exps(figure, base_folder)
+        if not exps:
+            print(f'[{name}] No experiments, skipping')
+            continue
+        app, rtypes = figure_rtypes(exps)
+        clients = figure_clients(folder, exps)
+        options = {'rtypes': rtypes, 'clients': clients, 'remove_drops': remove_drops, 'format': fmt, 'plot': plot}
+        signature = figure_signature(folder, exps, list_file, options)
+        out_dir = os.path.join(output, name)
+        report = read_report(out_dir)
+        if not force and report is not None and report['signature'] == signature:
+            print(f'[{name}] Inputs unchanged since {report["date"]}, skipping')
+            continue
+        jobs[name] = (signature, len(exps), (name, folder, exps, out_dir, app, rtypes, clients, remove_drops, fmt, plot))
+
+    built = {}
+    with ProcessPoolExecutor(max_workers=max(1, min(n_workers, len(jobs)))) as executor:
+        futures = {executor.submit(build_figure, *args): name for name, (_, _, args) in jobs.items()}
+        for future in as_completed(futures):
+            name = futures[future]
+            signature, n_exps, args = jobs[name]
+            try:
+                outputs, seconds = future.result()
+            except Exception:
+                # No report, so that the figure is built again next time
+                print(f'[{name}] Failed:\n{traceback.format_exc()}')
+                continue
+            report = {
+                'signature': signature, 'date': time.strftime('%Y-%m-%d %H:%M:%S'),
+                'n_exps': n_exps, 'outputs': outputs,
+            }
+            with open(os.path.join(args[3], REPORT_FILE), 'w') as f:
+                json.dump(report, f, indent=2)
+            print(f'[{name}] Built {n_exps} experiments in {seconds:.2f} seconds')
+            built[name] = outputs
+    return built
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Build the percentile tables and plots of figures, without a notebook')
+    parser.add_argument('figures', nargs='*', default=list(exp_data.distros),
+                        help='experiment list files or directories of experiments (default: the paper figures)')
+    parser.add_argument('-b', '--base-folder', type=str, default=exp_data.exp_base_folder,
+                        help='where to look for figures given by name')
+    parser.add_argument('-o', '--output', type=str, default=None, help='default: <base-folder>/reports')
+    parser.add_argument('-f', '--format', type=str, default='parquet', choices=['parquet', 'csv'])
+    parser.add_argument('-j', '--n-workers', type=int, default=-1, help='-1 for one per core')
+    parser.add_argument('--keep-drops', action='store_true', help='do not mask the percentiles of runs that dropped requests')
+    parser.add_argument('--no-plot', action='store_true', help='only write the tables')
+    parser.add_argument('--force', action='store_true', help='rebuild figures whose inputs did not change')
+    args = parser.parse_args()
+
+    output = args.output or os.path.join(args.base_folder, 'reports')
+    build_reports(
+        args.figures, output, base_folder=args.base_folder, remove_drops=not args.keep_drops,
+        fmt=args.format, plot=not args.no_plot, force=args.force, n_workers=args.n_workers
+    )
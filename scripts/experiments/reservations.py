@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+# DARC reservation timelines, from the server's windows file.
+#
+# Each time the dispatcher updates its reservations (see
+# Dispatcher::update_darc), it records one row per type group (GID): the
+# window's START and END (ns, server clock), the group's reserved (RES) and
+# stealable (STEAL) cores, the requests it counted (COUNT), whether the
+# reservations changed (UPDATED) and the group's queue length (QLEN).
+#
+# A ReservationTimeline parses the file once into typed arrays per GID, and is
+# a step function of time: the reservations in force at t are those of the
+# latest window started at or before t. The server's and the clients' clocks
+# differ, so times are counted from the first window, as trace times are from
+# the first request: the two share an origin, and latency bins can be
+# annotated, by an as-of join, with the reservations in force.
+import numpy as np
+import pandas as pd
+import argparse
+import os
+
+WINDOWS_TYPES = {
+    'ID': 'uint32', 'START': 'float64', 'END': 'float64',
+    'GID': 'uint32', 'RES': 'uint32', 'STEAL': 'uint32',
+    'COUNT': 'uint32', 'UPDATED': 'uint32', 'QLEN': 'uint32'
+}
+# Columns of the windows a timeline steps through
+STEP_COLUMNS = ['RES', 'STEAL', 'QLEN']
+
+def windows_path(exp_folder):
+    return os.path.join(exp_folder, 'server', 'windows')
+
+class ReservationTimeline:
+    def __init__(self, windows):
+        # windows: DataFrame of a windows file
+        self.origin = float(windows.START.min()) if not windows.empty else 0.
+        self.gids = np.unique(windows.GID.values) if not windows.empty else np.empty(0, dtype='uint32')
+        self.steps = {}
+        for gid in self.gids.tolist():
+            w = windows[windows.GID.values == gid].sort_values('START', kind='stable')
+            self.steps[gid] = {c: w[c].values for c in WINDOWS_TYPES if c not in ['GID', 'START', 'END']}
+            self.steps[gid]['START'] = w.START.values - self.origin
+            self.steps[gid]['END'] = w.END.values - self.origin
+
+    @classmethod
+    def read(cls, filename):
+        if not os.path.exists(filename):
+            return cls(pd.DataFrame(columns=list(WINDOWS_TYPES)).astype(WINDOWS_TYPES))
+        return cls(pd.read_csv(filename, delimiter='\t', dtype=WINDOWS_TYPES))
+
+    @property
+    def empty(self):
+        return len(self.steps) == 0
+
+    @property
+    def duration(self):
+        # ns from the first window's start to the last window's end
+        return max((s['END'].max() for s in self.steps.values()), default=0.)
+
+    def at(self, gid, times, column='RES'):
+        # Value of column in force at each of times (ns since the first
+        # window), NaN before the group's first window
+        steps = self.steps[gid]
+        idx = np.searchsorted(steps['START'], np.asarray(times, dtype='float64'), side='right') - 1
+        values = np.full(idx.shape, np.nan)
+        valid = idx >= 0
+        values[valid] = steps[column][idx[valid]]
+        return values
+
+    def annotate(self, df, time_column='TIME', columns=STEP_COLUMNS):
+        # As-of join: a copy of df with, for each GID, columns <column>_<GID>
+        # of the reservations in force at its times (ns since the first request)
+        df = df.copy()
+        times = df[time_column].values.astype('float64')
+        for gid in self.gids.tolist():
+            for column in columns:
+                df[f'{column}_{gid}'] = self.at(gid, times, column)
+        return df
+
+    def frame(self, start=None, end=None):
+        # Windows in seconds since the first one, one row per GID and window.
+        # With start and/or end (seconds), only the windows started in that
+        # range are kept, and the reservations in force at its bounds are
+        # added at them, so that step plots span the whole range.
+        frames = []
+        for gid, steps in self.steps.items():
+            frame = pd.DataFrame({c: v for c, v in steps.items()})
+            frame['GID'] = np.uint32(gid)
+            starts = frame.START.values
+            kept = np.ones(starts.shape[0], dtype=bool)
+            bounds = []
+            if start is not None:
+                kept &= starts > start * 1e9
+                idx = np.searchsorted(starts, start * 1e9, side='right') - 1
+                if idx >= 0:
+                    bounds.append(frame.iloc[idx:idx + 1].assign(START=start * 1e9))
+            if end is not None:
+                kept &= starts <= end * 1e9
+                idx = np.searchsorted(starts, end * 1e9, side='right') - 1
+                if idx >= 0 and starts[idx] < end * 1e9:
+                    bounds.append(frame.iloc[idx:idx + 1].assign(START=end * 1e9))
+            frames.extend([frame[kept]] + bounds)
+        if not frames:
+            return pd.DataFrame(columns=list(WINDOWS_TYPES))
+        df = pd.concat(frames, ignore_index=True)
+        df['START'] /= 1e9
+        df['END'] /= 1e9
+        return df.sort_values(['START', 'GID'], kind='stable').reset_index(drop=True)[list(WINDOWS_TYPES)]
+
+    def changes(self):
+        # Number of windows that updated the reservations, per GID
+        return {gid: int(np.count_nonzero(s['UPDATED'])) for gid, s in self.steps.items()}
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Print the DARC reservations of experiments')
+    parser.add_argument('exps', nargs='+', help='experiment folders')
+    args = parser.parse_args()
+
+    for exp in args.exps:
+        timeline = ReservationTimeline.read(windows_path(exp))
+        if timeline.empty:
+            print(f'[{exp}] No windows')
+            continue
+        print(f'[{exp}] {timeline.duration / 1e9:.3f} seconds, updates per group: {timeline.changes()}')
+        print(timeline.frame().to_string(index=False))
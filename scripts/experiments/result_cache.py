@@ -0,0 +1,177 @@
+# Two-level (memory + disk) cache for parsed experiment results.
+#
+# Entries are identified by what was computed (kind), on which experiment(s)
+# and with which arguments. Each entry also records a signature of the source
+# files (path, size, mtime): a lookup with a different signature is a miss and
+# drops the stale entry, so re-running an experiment invalidates its results
+# automatically. Only the files results are computed from are signed, not the
+# sidecars derived from them (columnar copies, block indices, sketches,
+# summaries), so that writing those does not invalidate anything.
+#
+# The memory level is an LRU bounded by max_bytes. The disk level keeps one
+# pickle per entry under cache_dir and survives kernel restarts. It is an LRU
+# too, bounded by max_disk_bytes: entries are touched when read, and the
+# least recently used pickles are deleted when a new one exceeds the budget.
+from collections import OrderedDict
+from pathlib import Path
+import pandas as pd
+import numpy as np
+import hashlib
+import pickle
+import os
+import sys
+
+DEFAULT_CACHE_DIR = os.environ.get('PSP_CACHE_DIR', os.path.expanduser('~/.cache/psp'))
+DEFAULT_MAX_BYTES = int(os.environ.get('PSP_CACHE_MAX_BYTES', 4 * 1024 ** 3))
+DEFAULT_MAX_DISK_BYTES = int(os.environ.get('PSP_CACHE_MAX_DISK_BYTES', 16 * 1024 ** 3))
+
+# Outputs of a run (clients' and server's), plus its schedule (*.yml)
+SOURCE_FILES = {'traces', 'traces_hist', 'traces_rates', 'traces_throughput', 'windows'}
+
+def is_source_file(path):
+    if path.name in SOURCE_FILES or path.suffix == '.yml':
+        return True
+    # A columnar copy stands for its trace if the latter was not kept
+    return path.name == 'traces.parquet' and not path.with_name('traces').exists()
+
+def files_signature(paths, sources_only=True):
+    # Files given explicitly are always signed, those of folders only if
+    # they are sources (unless sources_only is False)
+    sig = []
+    for path in paths:
+        path = Path(path)
+        if path.is_dir():
+            files = sorted(p for p in path.rglob('*') if p.is_file() and (not sources_only or is_source_file(p)))
+        elif path.is_file():
+            files = [path]
+        else:
+            files = []
+        for f in files:
+            st = f.stat()
+            sig.append((str(f), st.st_size, st.st_mtime_ns))
+    return tuple(sig)
+
+def size_of(value):
+    if isinstance(value, pd.DataFrame):
+        return int(value.memory_usage(deep=True).sum())
+    if isinstance(value, pd.Series):
+        return int(value.memory_usage(deep=True))
+    if isinstance(value, np.ndarray):
+        return value.nbytes
+    if isinstance(value, dict):
+        return sys.getsizeof(value) + sum(size_of(v) for v in value.values())
+    if isinstance(value, (list, tuple)):
+        return sys.getsizeof(value) + sum(size_of(v) for v in value)
+    return sys.getsizeof(value)
+
+class ResultCache:
+    def __init__(self, cache_dir=DEFAULT_CACHE_DIR, max_bytes=DEFAULT_MAX_BYTES, use_disk=True,
+                 max_disk_bytes=DEFAULT_MAX_DISK_BYTES):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.max_disk_bytes = max_disk_bytes
+        self.use_disk = use_disk
+        self.entries = OrderedDict() # entry id -> (signature, value, size)
+        self.nbytes = 0
+
+    @staticmethod
+    def entry_id(kind, name, args):
+        key = repr((kind, name, sorted(args.items())))
+        return hashlib.sha1(key.encode()).hexdigest()
+
+    def _disk_path(self, eid):
+        return os.path.join(self.cache_dir, eid + '.pkl')
+
+    def _drop(self, eid, disk=False):
+        if eid in self.entries:
+            self.nbytes -= self.entries.pop(eid)[2]
+        if disk and self.use_disk and os.path.exists(self._disk_path(eid)):
+            os.remove(self._disk_path(eid))
+
+    def _remember(self, eid, sig, value):
+        size = size_of(value)
+        self._drop(eid)
+        if size > self.max_bytes:
+            return
+        self.entries[eid] = (sig, value, size)
+        self.nbytes += size
+        # Evict least recently used entries (they remain on disk)
+        while self.nbytes > self.max_bytes:
+            _, (_, _, evicted_size) = self.entries.popitem(last=False)
+            self.nbytes -= evicted_size
+
+    def get(self, kind, name, args, sig):
+        eid = self.entry_id(kind, name, args)
+        if eid in self.entries:
+            entry_sig, value, _ = self.entries[eid]
+            if entry_sig == sig:
+                self.entries.move_to_end(eid)
+                return value
+            self._drop(eid, disk=True)
+            return None
+        if not self.use_disk or not os.path.exists(self._disk_path(eid)):
+            return None
+        try:
+            with open(self._disk_path(eid), 'rb') as f:
+                entry_sig, value = pickle.load(f)
+        except Exception as e:
+            print(f'Could not load cache entry {eid} ({e}), dropping it')
+            self._drop(eid, disk=True)
+            return None
+        if entry_sig != sig:
+            self._drop(eid, disk=True)
+            return None
+        # Mark as recently used (atime is often not updated on reads)
+        os.utime(self._disk_path(eid))
+        self._remember(eid, sig, value)
+        return value
+
+    def _trim_disk(self, keep):
+        # Delete the least recently used pickles (but keep) until the disk
+        # level fits in max_disk_bytes
+        files = []
+        for f in Path(self.cache_dir).glob('*.pkl'):
+            try:
+                st = f.stat()
+            except FileNotFoundError:
+                # Deleted by another process
+                continue
+            files.append((max(st.st_atime, st.st_mtime), st.st_size, f))
+        total = sum(size for _, size, _ in files)
+        for _, size, f in sorted(files, key=lambda x: x[0]):
+            if total <= self.max_disk_bytes:
+                break
+            if str(f) == keep:
+                continue
+            try:
+                f.unlink()
+            except FileNotFoundError:
+                pass
+            total -= size
+
+    def put(self, kind, name, args, sig, value):
+        eid = self.entry_id(kind, name, args)
+        self._remember(eid, sig, value)
+        if self.use_disk:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            # Per process, as concurrent workers may write the same entry
+            tmp_path = f'{self._disk_path(eid)}.{os.getpid()}.tmp'
+            with open(tmp_path, 'wb') as f:
+                pickle.dump((sig, value), f, protocol=pickle.HIGHEST_PROTOCOL)
+            if os.path.getsize(tmp_path) > self.max_disk_bytes:
+                # Larger than the whole disk level: only kept in memory
+                os.remove(tmp_path)
+                return value
+            os.replace(tmp_path, self._disk_path(eid))
+            self._trim_disk(keep=self._disk_path(eid))
+        return value
+
+    def clear(self, disk=False):
+        self.entries.clear()
+        self.nbytes = 0
+        if disk and self.use_disk and os.path.isdir(self.cache_dir):
+            for f in Path(self.cache_dir).glob('*.pkl'):
+                f.unlink()
+
+    def __len__(self):
+        return len(self.entries)
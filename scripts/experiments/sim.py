@@ -0,0 +1,416 @@
+#!/usr/bin/env python3
+# Discrete-event simulation of the psp server's dispatch policies.
+#
+# Predicts the latency curves of a schedule (Shremote_cfgs/schedules format)
+# before booking the cluster. Each simulated run writes the client's
+# traces_hist and traces_rates files under <base-output>/<title>/client<i>, with
+# the same titles as run.py, so prepare_pctl_data and plot_p99s read simulated
+# sweeps unchanged.
+#
+# Model: each phase of the schedule sends Poisson (or uniform) arrivals at the
+# clients' rate for that load, with a type drawn from the phase ratios and a
+# deterministic service time equal to the type's mean_ns, as PSP_MB requests
+# do. Like the client, phases run one after the other and the next one starts
+# once all requests of the previous one completed, and the first 10% of each
+# client's requests are left out of its histograms. Network, dispatcher and
+# profiling overheads are not modeled.
+import numpy as np
+import yaml
+import heapq
+from collections import deque, OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+import argparse
+import shutil
+import time
+import os
+
+POLICIES = ['DFCFS', 'CFCFS', 'SJF', 'EDF', 'DARC']
+# Types whose mean service times are within DARC_DELTA of each other share a
+# reservation, see Dispatcher::set_darc
+DARC_DELTA = .2
+# Client histogram buckets, in ns (psp/hist.hh)
+BUCKET_SIZE = 1000
+# Share of each client's requests discarded as warm up (downsample = -1)
+WARMUP = .1
+
+def load_schedule(path):
+    with open(path, 'r') as f:
+        return yaml.load(f, Loader=yaml.FullLoader)
+
+def schedule_types(schedule):
+    # Types in the order the server declares them (see psp_configs.server_config)
+    types = []
+    for phase in schedule:
+        types.extend(phase['rtype'])
+    return list(OrderedDict.fromkeys(types))
+
+def client_rate(phase, n_clients, n_workers, load):
+    # Requests per second sent by each client (psp_configs.client_schedules)
+    mean_ns = sum([u * r for u, r in zip(phase['mean_ns'], phase['ratios'])])
+    return int(((1e9 / (mean_ns / n_workers)) / n_clients) * load)
+
+def gen_phase(phase, types, rate, duration, rng):
+    # Send times (ns from the phase start), type index and service time (ns)
+    n = int(rate * duration)
+    if phase['uniform']:
+        times = np.arange(n) * (1e9 / rate)
+    else:
+        # A few more than the expected count, then cut at the phase's end
+        gaps = rng.exponential(1e9 / rate, int(n + 6 * np.sqrt(n) + 10))
+        times = np.cumsum(gaps) - gaps[0]
+        times = times[times < duration * 1e9]
+    ratios = np.array(phase['ratios'], dtype='float64')
+    idx = rng.choice(len(ratios), times.shape[0], p=ratios / ratios.sum())
+    rtypes = np.array([types.index(t) for t in phase['rtype']], dtype='int64')[idx]
+    services = np.array(phase['mean_ns'], dtype='float64')[idx]
+    return times, rtypes, services
+
+def sim_dfcfs(times, services, n_workers):
+    # Round robin to per worker FIFO queues: one Lindley recursion per worker,
+    # f_i = S_i + max_{j<=i}(a_j - S_{j-1}) with S the running service time
+    finish = np.empty_like(times)
+    for w in range(n_workers):
+        a = times[w::n_workers]
+        s = services[w::n_workers]
+        S = np.cumsum(s)
+        finish[w::n_workers] = S + np.maximum.accumulate(a - (S - s))
+    return finish
+
+def sim_cfcfs(times, services, n_workers):
+    # Single central queue: each request goes to the first worker to be free
+    free_at = [0.] * n_workers
+    finish = []
+    replace = heapq.heapreplace
+    for a, s in zip(times.tolist(), services.tolist()):
+        t = free_at[0]
+        f = (a if a > t else t) + s
+        replace(free_at, f)
+        finish.append(f)
+    return np.array(finish)
+
+def typed_queues(times, rtypes, services, n_types):
+    # Per type FIFO queues, as lists of (send times, service times, indices)
+    queues = []
+    for k in range(n_types):
+        idx = np.flatnonzero(rtypes == k)
+        queues.append((times[idx].tolist(), services[idx].tolist(), idx.tolist()))
+    return queues
+
+def sim_priority(times, rtypes, services, n_workers, order, deadlines=None):
+    # Non preemptive per type queues on identical workers: whenever a worker is
+    # free, it takes the head of the first non empty queue in order (SJF), or
+    # the head with the earliest send time + deadline (EDF)
+    queues = typed_queues(times, rtypes, services, len(order))
+    queues = [queues[k] for k in order]
+    if deadlines is not None:
+        deadlines = [deadlines[k] for k in order]
+    heads = [0] * len(queues)
+    sizes = [len(q[0]) for q in queues]
+    kinds = range(len(queues))
+    free_at = [0.] * n_workers
+    finish = np.empty(times.shape[0])
+    replace = heapq.heapreplace
+    for _ in range(times.shape[0]):
+        t = free_at[0]
+        pick = -1
+        if deadlines is None:
+            for k in kinds:
+                if heads[k] < sizes[k] and queues[k][0][heads[k]] <= t:
+                    pick = k
+                    break
+        else:
+            best = 0
+            for k in kinds:
+                if heads[k] < sizes[k] and queues[k][0][heads[k]] <= t:
+                    ttdl = queues[k][0][heads[k]] + deadlines[k]
+                    if pick == -1 or ttdl < best:
+                        pick, best = k, ttdl
+        start = t
+        if pick == -1:
+            # Nothing queued: the worker waits for the next request
+            for k in kinds:
+                if heads[k] < sizes[k] and (pick == -1 or queues[k][0][heads[k]] < start):
+                    pick, start = k, queues[k][0][heads[k]]
+        a, s, idx = queues[pick]
+        i = heads[pick]
+        heads[pick] += 1
+        f = start + s[i]
+        replace(free_at, f)
+        finish[idx[i]] = f
+    return finish
+
+def darc_groups(means, ratios, n_workers, delta=DARC_DELTA):
+    # Worker reservations of Dispatcher::set_darc, given each type's mean service
+    # time and ratio: (member types, reserved workers, stealable workers) of
+    # each group of types, shortest first
+    order = sorted(range(len(means)), key=lambda k: means[k])
+    groups = []
+    grouped = set()
+    for j, k in enumerate(order):
+        if k in grouped:
+            continue
+        group = [k]
+        grouped.add(k)
+        for peer in order[j+1:]:
+            if means[peer] - means[k] < means[k] * delta:
+                group.append(peer)
+                grouped.add(peer)
+            else:
+                break
+        groups.append(group)
+
+    window_mean = sum(means[k] * ratios[k] for k in order)
+    n_resas = 0
+    reservations = []
+    for group in groups:
+        cpu_demand = (sum(means[k] * ratios[k] for k in group) / window_mean) * n_workers
+        shared_demand, full_demand = np.modf(cpu_demand)
+        if full_demand == 0:
+            demand = 1
+        elif shared_demand <= .5:
+            demand = int(full_demand)
+        else:
+            demand = int(np.ceil(cpu_demand))
+        if demand > n_workers - n_resas:
+            # All remaining workers, plus the spillway core
+            reserved = list(range(n_resas, n_workers)) + [0]
+            n_resas = n_workers
+        else:
+            reserved = list(range(n_resas, n_resas + demand))
+            n_resas += demand
+        stealable = list(range(n_resas, n_workers))
+        reservations.append((group, reserved, stealable))
+    return reservations
+
+def darc_reservations(means, ratios, n_workers, delta=DARC_DELTA):
+    # Per type, the workers it may use in order of preference: its group's
+    # reserved workers, then the ones it can steal
+    candidates = [[] for _ in means]
+    for group, reserved, stealable in darc_groups(means, ratios, n_workers, delta):
+        for k in group:
+            candidates[k] = reserved + stealable
+    return candidates
+
+def manual_reservations(types, n_workers, n_resas):
+    # Manual DARC (n_resas in the server config): SHORT gets the first n_resas
+    # workers and may steal the others, reserved to LONG
+    if sorted(types) != ['LONG', 'SHORT']:
+        raise ValueError('Manual DARC reservations require a SHORT/LONG schedule')
+    candidates = [None, None]
+    candidates[types.index('SHORT')] = list(range(n_workers))
+    candidates[types.index('LONG')] = list(range(n_resas, n_workers))
+    return candidates
+
+def sim_darc(times, rtypes, services, n_workers, order, candidates):
+    # Event driven: a request goes to the first free worker among its type's
+    # candidates, or waits in its type queue; a worker that completes takes the
+    # oldest request of the first type in order that may use it
+    allowed = [[k for k in order if w in candidates[k]] for w in range(n_workers)]
+    free = [True] * n_workers
+    busy = []
+    queues = [deque() for _ in candidates]
+    finish = np.empty(times.shape[0])
+    s_list = services.tolist()
+    push, pop = heapq.heappush, heapq.heappop
+
+    def complete(t, w):
+        for k in allowed[w]:
+            if queues[k]:
+                j = queues[k].popleft()
+                f = t + s_list[j]
+                finish[j] = f
+                push(busy, (f, w))
+                return
+        free[w] = True
+
+    for i, (a, k) in enumerate(zip(times.tolist(), rtypes.tolist())):
+        while busy and busy[0][0] <= a:
+            complete(*pop(busy))
+        if not queues[k]:
+            for w in candidates[k]:
+                if free[w]:
+                    free[w] = False
+                    f = a + s_list[i]
+                    finish[i] = f
+                    push(busy, (f, w))
+                    break
+            else:
+                queues[k].append(i)
+        else:
+            queues[k].append(i)
+    while busy:
+        complete(*pop(busy))
+    return finish
+
+def simulate_phase(policy, phase, types, times, rtypes, services, n_workers, darc_manual=-1,
+                   edf_deadline=0):
+    means = [0.] * len(types)
+    ratios = [0.] * len(types)
+    for t, mean_ns, ratio in zip(phase['rtype'], phase['mean_ns'], phase['ratios']):
+        means[types.index(t)] = mean_ns
+        ratios[types.index(t)] = ratio
+    if policy == 'DFCFS':
+        return sim_dfcfs(times, services, n_workers)
+    elif policy == 'CFCFS':
+        return sim_cfcfs(times, services, n_workers)
+    elif policy == 'SJF':
+        # Without mean_ns in its config, the server keeps types in declaration order
+        return sim_priority(times, rtypes, services, n_workers, list(range(len(types))))
+    elif policy == 'EDF':
+        deadlines = [mean_ns * edf_deadline * 2.5 for mean_ns in means]
+        return sim_priority(times, rtypes, services, n_workers, list(range(len(types))), deadlines)
+    elif policy == 'DARC':
+        # Oracle reservations from the phase's service times and ratios
+        active = [k for k in range(len(types)) if ratios[k] > 0]
+        order = sorted(active, key=lambda k: means[k])
+        if darc_manual > -1:
+            candidates = manual_reservations(types, n_workers, darc_manual)
+        else:
+            candidates = [[] for _ in types]
+            active_candidates = darc_reservations([means[k] for k in active], [ratios[k] for k in active], n_workers)
+            for k, c in zip(active, active_candidates):
+                candidates[k] = c
+        return sim_darc(times, rtypes, services, n_workers, order, candidates)
+    raise ValueError(f'Unknown policy {policy}')
+
+def hist_lines(name, latencies):
+    # Sparse histogram in the client's traces_hist format
+    buckets, counts = np.unique(latencies // np.uint64(BUCKET_SIZE), return_counts=True)
+    header = 'TYPE\tMIN\tMAX\tCOUNT\tTOTAL' + ''.join(f'\t{b * BUCKET_SIZE}' for b in buckets.tolist())
+    values = f'{name}\t{latencies.min()}\t{latencies.max()}\t{latencies.shape[0]}\t{latencies.sum()}'
+    values += ''.join(f'\t{c}' for c in counts.tolist())
+    return [header, values]
+
+def write_client(folder, types, rtypes, latencies, rates):
+    os.makedirs(folder, exist_ok=True)
+    lines = hist_lines('UNKNOWN', latencies)
+    for k, t in enumerate(types):
+        mask = rtypes == k
+        if mask.any():
+            lines.extend(hist_lines(t, latencies[mask]))
+    with open(os.path.join(folder, 'traces_hist'), 'w') as f:
+        f.write('\n'.join(lines) + '\n')
+    with open(os.path.join(folder, 'traces_rates'), 'w') as f:
+        f.write('OFFERED\tACHIEVED\n')
+        for offered, achieved in rates:
+            f.write(f'{offered}\t{achieved}\n')
+
+def simulate(policy, schedule, load, n_workers=14, n_clients=1, darc_manual=-1, edf_deadline=0,
+             max_requests=2e6, seed=0, output=None, verbose=True):
+    # Simulate a run and, if output is given, write its client files there
+    t0 = time.time()
+    if isinstance(schedule, str):
+        schedule = load_schedule(schedule)
+    types = schedule_types(schedule)
+    rng = np.random.default_rng(seed)
+    rates = [client_rate(phase, n_clients, n_workers, load) for phase in schedule]
+    # Shorten all phases by the same factor to bound the number of requests
+    n_expected = sum(rate * n_clients * phase['duration'] for rate, phase in zip(rates, schedule))
+    scale = min(1, max_requests / n_expected)
+
+    client_ids, all_rtypes, all_latencies, client_rates = [], [], [], []
+    for rate, phase in zip(rates, schedule):
+        times, rtypes, services = gen_phase(phase, types, rate * n_clients, phase['duration'] * scale, rng)
+        # Phases are simulated separately: the client only starts the next one
+        # once every request of the previous one completed
+        finish = simulate_phase(
+            policy, phase, types, times, rtypes, services, n_workers, darc_manual, edf_deadline
+        )
+        clients = rng.integers(n_clients, size=times.shape[0])
+        for c in range(n_clients):
+            mask = clients == c
+            if mask.sum() < 2:
+                client_rates.append((0, 0))
+                continue
+            sent = times[mask]
+            offered = mask.sum() / ((sent[-1] - sent[0]) / 1e9)
+            achieved = mask.sum() / ((finish[mask].max() - sent[0]) / 1e9)
+            client_rates.append((offered, achieved))
+        client_ids.append(clients)
+        all_rtypes.append(rtypes)
+        # Integer ns, as the client computes them
+        all_latencies.append((finish - times).astype('uint64'))
+
+    client_ids = np.concatenate(client_ids)
+    all_rtypes = np.concatenate(all_rtypes)
+    all_latencies = np.concatenate(all_latencies)
+    results = {}
+    for c in range(n_clients):
+        idx = np.flatnonzero(client_ids == c)
+        idx = idx[int(idx.shape[0] * WARMUP):]
+        results[c] = (all_rtypes[idx], all_latencies[idx], client_rates[c::n_clients])
+        if output is not None:
+            write_client(os.path.join(output, f'client{c}'), types, *results[c])
+    if verbose:
+        n = all_latencies.shape[0]
+        elapsed = time.time() - t0
+        print(f'[{policy} {load:.2f}] Simulated {n} requests in {elapsed:.2f} seconds ({n / elapsed:.0f} req/s)')
+    return results
+
+def exp_title(policy, load, schedule_name, n_workers, darc_manual=-1, run_number=0):
+    # Same experiment names as run.py
+    title = f'{policy}_{load:.2f}_{schedule_name}_{n_workers}'
+    if darc_manual > -1:
+        title += f'_{darc_manual}'
+    return title + f'.{run_number}'
+
+def _sim_task(policy, load, schedule_file, output, **kwargs):
+    simulate(policy, schedule_file, load, output=output, **kwargs)
+    shutil.copy(schedule_file, output)
+    return output
+
+def sim_sweep(schedule_file, policies=POLICIES, load_range=[.05, 1.06], base_output='.', n_workers=14,
+              n_clients=1, darc_manual=-1, run_number=0, seed=0, n_jobs=1, **kwargs):
+    # Simulate each policy at each load of the range, like run.py's sweep
+    schedule_name = os.path.basename(schedule_file).split('.')[0]
+    tasks = []
+    for i, load in enumerate(np.arange(load_range[0], load_range[1], .05)):
+        for policy in policies:
+            title = exp_title(policy, load, schedule_name, n_workers, darc_manual, run_number)
+            tasks.append((policy, load, os.path.join(base_output, title), {
+                'n_workers': n_workers, 'n_clients': n_clients, 'darc_manual': darc_manual,
+                # Same arrivals for all policies at a given load
+                'seed': seed + i, **kwargs,
+            }))
+    t0 = time.time()
+    if n_jobs > 1:
+        with ProcessPoolExecutor(max_workers=n_jobs) as executor:
+            futures = [
+                executor.submit(_sim_task, policy, load, schedule_file, output, **task_kwargs)
+                for policy, load, output, task_kwargs in tasks
+            ]
+            output_paths = [f.result() for f in futures]
+    else:
+        output_paths = [
+            _sim_task(policy, load, schedule_file, output, **task_kwargs)
+            for policy, load, output, task_kwargs in tasks
+        ]
+    print(f'Simulated {len(tasks)} experiments in {time.time() - t0:.2f} seconds')
+    return output_paths
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Simulate a sweep of dispatch policies and loads')
+    parser.add_argument('schedule', help='schedule file, e.g. Shremote_cfgs/schedules/SBIM2.yml')
+    parser.add_argument('-p', '--policies', nargs='+', type=str, default=POLICIES, choices=POLICIES)
+    parser.add_argument('-w', '--n-workers', type=int, default=14)
+    parser.add_argument('-c', '--n-clients', type=int, default=1)
+    parser.add_argument('-b', '--base-output', type=str, default='/psp/experiments-data/sim')
+    parser.add_argument('-m', '--darc-manual', type=int, default=-1)
+    parser.add_argument('-L', '--load-range', nargs=2, type=float, default=[.05, 1.06])
+    parser.add_argument('-r', '--run-number', type=int, default=0)
+    parser.add_argument('-s', '--seed', type=int, default=0)
+    parser.add_argument('-n', '--max-requests', type=float, default=2e6,
+                        help='shorten the schedule so that a run sends at most this many requests')
+    parser.add_argument('-e', '--edf-deadline', type=float, default=0,
+                        help="EDF deadlines in multiples of each type's mean service time (0, as the server gets no deadline from schedules)")
+    parser.add_argument('-j', '--jobs', type=int, default=os.cpu_count(), help='number of runs simulated in parallel')
+    args = parser.parse_args()
+
+    output_paths = sim_sweep(
+        args.schedule, policies=args.policies, load_range=args.load_range, base_output=args.base_output,
+        n_workers=args.n_workers, n_clients=args.n_clients, darc_manual=args.darc_manual,
+        run_number=args.run_number, seed=args.seed, n_jobs=args.jobs, max_requests=args.max_requests,
+        edf_deadline=args.edf_deadline
+    )
+    for p in output_paths:
+        print(p)
@@ -0,0 +1,348 @@
+# Mergeable quantile sketches for streaming trace processing.
+#
+# QuantileSketch is a DDSketch-style sketch: positive values are counted in
+# logarithmic buckets of ratio gamma = (1 + a) / (1 - a), so every quantile is
+# returned within a relative error a of the exact one. Its size only depends on
+# the range of values (~1200 buckets from 1ns to 10s at a=1%), sketches with the
+# same accuracy merge exactly, and their state serializes to plain JSON.
+#
+# LogLinearHistogram keeps integer multiples of a unit (e.g. the clients'
+# 1000ns histogram buckets) in HdrHistogram-style buckets: exact below 2^p
+# units, then 2^p linear sub-buckets per power of two, so that bucket
+# midpoints are within the relative accuracy. A traces_hist histogram converts
+# to it without splitting any of its buckets, and scaling (e.g. to slowdown)
+# only changes the unit.
+import numpy as np
+import json
+import math
+
+class QuantileSketch:
+    def __init__(self, relative_accuracy=.01):
+        self.relative_accuracy = relative_accuracy
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self.log_gamma = math.log(self.gamma)
+        self.keys = np.empty(0, dtype='int64') # sorted bucket indices
+        self.counts = np.empty(0, dtype='uint64')
+        self.zero_count = 0 # values <= 0
+        self.count = 0
+        self.sum = 0.
+        self.min = math.inf
+        self.max = -math.inf
+
+    def _insert(self, keys, counts):
+        keys, inverse = np.unique(np.concatenate([self.keys, keys]), return_inverse=True)
+        self.counts = np.bincount(
+            inverse, weights=np.concatenate([self.counts, counts]), minlength=keys.shape[0]
+        ).astype('uint64')
+        self.keys = keys
+
+    def add(self, values):
+        values = np.asarray(values, dtype='float64')
+        if values.shape[0] == 0:
+            return self
+        self.count += values.shape[0]
+        self.sum += float(values.sum())
+        self.min = min(self.min, float(values.min()))
+        self.max = max(self.max, float(values.max()))
+        positive = values[values > 0]
+        self.zero_count += values.shape[0] - positive.shape[0]
+        keys, counts = np.unique(
+            np.ceil(np.log(positive) / self.log_gamma).astype('int64'), return_counts=True
+        )
+        self._insert(keys, counts)
+        return self
+
+    def merge(self, other):
+        if other.relative_accuracy != self.relative_accuracy:
+            raise ValueError('Cannot merge sketches with different relative accuracies '
+                             f'({self.relative_accuracy} and {other.relative_accuracy})')
+        self.count += other.count
+        self.sum += other.sum
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        self.zero_count += other.zero_count
+        self._insert(other.keys, other.counts)
+        return self
+
+    def scale(self, m):
+        # Sketch of the values divided by m. Buckets move whole to the bucket
+        # of their midpoint, so errors are within about twice the accuracy.
+        sketch = QuantileSketch(self.relative_accuracy)
+        sketch.count, sketch.zero_count = self.count, self.zero_count
+        sketch.sum, sketch.min, sketch.max = self.sum / m, self.min / m, self.max / m
+        values = 2 * np.power(self.gamma, self.keys) / (self.gamma + 1) / m
+        sketch._insert(np.ceil(np.log(values) / self.log_gamma).astype('int64'), self.counts)
+        return sketch
+
+    def quantiles(self, qs):
+        qs = np.asarray(qs, dtype='float64')
+        if self.count == 0:
+            return np.full(qs.shape, np.nan)
+        ranks = qs * (self.count - 1)
+        cum = np.cumsum(np.concatenate([[self.zero_count], self.counts]).astype('float64'))
+        idx = np.searchsorted(cum, ranks, side='right')
+        idx = np.minimum(idx, cum.shape[0] - 1)
+        # Bucket i holds (gamma^(i-1), gamma^i]: its relative-error midpoint
+        keys = self.keys[np.maximum(idx - 1, 0)]
+        values = 2 * np.power(self.gamma, keys) / (self.gamma + 1)
+        values[idx == 0] = 0
+        return np.clip(values, self.min, self.max)
+
+    def quantile(self, q):
+        return float(self.quantiles([q])[0])
+
+    def mean(self):
+        return self.sum / self.count if self.count else math.nan
+
+    def to_dict(self):
+        return {
+            'relative_accuracy': self.relative_accuracy,
+            'keys': self.keys.tolist(),
+            'counts': self.counts.tolist(),
+            'zero_count': self.zero_count,
+            'count': self.count,
+            'sum': self.sum,
+            'min': self.min if self.count else None,
+            'max': self.max if self.count else None,
+        }
+
+    @classmethod
+    def from_dict(cls, d):
+        sketch = cls(d['relative_accuracy'])
+        sketch.keys = np.array(d['keys'], dtype='int64')
+        sketch.counts = np.array(d['counts'], dtype='uint64')
+        sketch.zero_count = d['zero_count']
+        sketch.count = d['count']
+        sketch.sum = d['sum']
+        if d['count']:
+            sketch.min = d['min']
+            sketch.max = d['max']
+        return sketch
+
+class LogLinearHistogram:
+    def __init__(self, relative_accuracy=.01, unit=1.):
+        self.relative_accuracy = relative_accuracy
+        # Sub-buckets per power of two, so that midpoints are within the accuracy
+        self.precision_bits = max(0, math.ceil(math.log2(1 / (2 * relative_accuracy))))
+        self.n_sub = 1 << self.precision_bits
+        self.unit = unit # value of one integer step (e.g. ns)
+        self.keys = np.empty(0, dtype='int64') # sorted bucket indices
+        self.counts = np.empty(0, dtype='uint64')
+        self.count = 0
+        self.total = 0.
+        self.min = math.inf
+        self.max = -math.inf
+
+    def bucket_keys(self, steps):
+        # Bucket of non-negative integer steps: the steps themselves below
+        # n_sub, then (shift, sub-bucket) with steps = sub << shift
+        steps = np.asarray(steps, dtype='int64')
+        _, exponents = np.frexp(steps.astype('float64'))
+        shifts = np.maximum(exponents - 1 - self.precision_bits, 0)
+        return shifts * self.n_sub + (steps >> shifts)
+
+    def bucket_bounds(self, keys):
+        # Lower bound and width of buckets, in steps
+        keys = np.asarray(keys, dtype='int64')
+        shifts = np.maximum(keys // self.n_sub - 1, 0)
+        return (keys - shifts * self.n_sub) << shifts, np.left_shift(1, shifts)
+
+    def _insert(self, keys, counts):
+        keys, inverse = np.unique(np.concatenate([self.keys, keys]), return_inverse=True)
+        self.counts = np.bincount(
+            inverse, weights=np.concatenate([self.counts, counts]), minlength=keys.shape[0]
+        ).astype('uint64')
+        self.keys = keys
+
+    def add(self, values):
+        values = np.asarray(values, dtype='float64')
+        if values.shape[0] == 0:
+            return self
+        self.count += values.shape[0]
+        self.total += float(values.sum())
+        self.min = min(self.min, float(values.min()))
+        self.max = max(self.max, float(values.max()))
+        keys, counts = np.unique(
+            self.bucket_keys(np.maximum(values // self.unit, 0)), return_counts=True
+        )
+        self._insert(keys, counts)
+        return self
+
+    def midpoints(self):
+        lower, width = self.bucket_bounds(self.keys)
+        return (lower + width / 2) * self.unit
+
+    def rebucket(self, unit):
+        # Same histogram with another unit, each bucket moving whole to the
+        # bucket of its midpoint
+        hist = LogLinearHistogram(self.relative_accuracy, unit)
+        hist.count, hist.total, hist.min, hist.max = self.count, self.total, self.min, self.max
+        keys = hist.bucket_keys(self.midpoints() // unit)
+        hist._insert(keys, self.counts)
+        return hist
+
+    def merge(self, other):
+        # Other is rebucketed to this histogram's unit if they differ
+        if other.precision_bits != self.precision_bits:
+            raise ValueError('Cannot merge histograms with different relative accuracies '
+                             f'({self.relative_accuracy} and {other.relative_accuracy})')
+        if other.unit != self.unit:
+            other = other.rebucket(self.unit)
+        self.count += other.count
+        self.total += other.total
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        self._insert(other.keys, other.counts)
+        return self
+
+    @classmethod
+    def merge_all(cls, hists):
+        # Merge of histograms of possibly different units, in the finest one
+        hists = list(hists)
+        merged = cls(hists[0].relative_accuracy, min(h.unit for h in hists))
+        for hist in hists:
+            merged.merge(hist)
+        return merged
+
+    def scale(self, m):
+        # Histogram of the values divided by m (e.g. a type's mean service
+        # time, for slowdown): the buckets are unchanged, in units m times
+        # smaller
+        hist = LogLinearHistogram(self.relative_accuracy, self.unit / m)
+        hist.keys, hist.counts = self.keys.copy(), self.counts.copy()
+        hist.count, hist.total, hist.min, hist.max = self.count, self.total / m, self.min / m, self.max / m
+        return hist
+
+    def quantiles(self, qs):
+        # Midpoint of the first bucket whose cumulative count reaches q * count
+        qs = np.asarray(qs, dtype='float64')
+        if self.count == 0:
+            return np.full(qs.shape, np.nan)
+        cum = np.cumsum(self.counts.astype('float64'))
+        idx = np.minimum(np.searchsorted(cum, qs * cum[-1], side='left'), cum.shape[0] - 1)
+        return np.clip(self.midpoints()[idx], self.min, self.max)
+
+    def quantile(self, q):
+        return float(self.quantiles([q])[0])
+
+    def mean(self):
+        return self.total / self.count if self.count else math.nan
+
+    def to_dict(self):
+        return {
+            'relative_accuracy': self.relative_accuracy,
+            'unit': self.unit,
+            'keys': self.keys.tolist(),
+            'counts': self.counts.tolist(),
+            'count': self.count,
+            'total': self.total,
+            'min': self.min if self.count else None,
+            'max': self.max if self.count else None,
+        }
+
+    @classmethod
+    def from_dict(cls, d):
+        hist = cls(d['relative_accuracy'], d['unit'])
+        hist.keys = np.array(d['keys'], dtype='int64')
+        hist.counts = np.array(d['counts'], dtype='uint64')
+        hist.count = d['count']
+        hist.total = d['total']
+        if d['count']:
+            hist.min = d['min']
+            hist.max = d['max']
+        return hist
+
+    @staticmethod
+    def exact_accuracy(max_steps, relative_accuracy=.01):
+        # Relative accuracy, at most relative_accuracy, at which every integer
+        # step up to max_steps has a bucket of its own
+        return min(relative_accuracy, 2. ** -int(max_steps).bit_length())
+
+    @classmethod
+    def from_traces_hist(cls, hist, relative_accuracy=.01, bucket_size=1000):
+        # From a client histogram (see exp_data.read_hist_file), in ns. Its
+        # buckets are bucket_size wide, so they are the unit: each falls in a
+        # single bucket, unchanged below 2^p units. Above, neighbouring buckets
+        # share one, unless relative_accuracy is the exact_accuracy of the
+        # largest bucket.
+        loghist = cls(relative_accuracy, bucket_size)
+        loghist.count = int(hist['COUNT'])
+        loghist.total = float(hist['TOTAL'])
+        if loghist.count:
+            loghist.min = float(hist['MIN'])
+            loghist.max = float(hist['MAX'])
+        loghist._insert(loghist.bucket_keys(hist['BUCKETS'] // bucket_size), hist['COUNTS'])
+        return loghist
+
+class TraceSketches:
+    # Latency (VALUE) sketches of a trace per REQ_TYPE, per SCHED_ID, per
+    # (SCHED_ID, REQ_TYPE) and overall, plus slowdown (SLOWDOWN) sketches for
+    # the groups mixing request types. Keys are (metric, group, key) tuples,
+    # e.g. ('VALUE', 'REQ_TYPE', 'SHORT') or ('SLOWDOWN', 'all', 'all').
+    GROUPS = ['all', 'REQ_TYPE', 'SCHED_ID', 'SCHED_TYPE']
+
+    def __init__(self, relative_accuracy=.01):
+        self.relative_accuracy = relative_accuracy
+        self.sketches = {}
+
+    def _sketch(self, metric, group, key):
+        k = (metric, group, key)
+        if k not in self.sketches:
+            self.sketches[k] = QuantileSketch(self.relative_accuracy)
+        return self.sketches[k]
+
+    def add(self, values, slowdowns, req_types, sched_ids):
+        values = np.asarray(values)
+        slowdowns = np.asarray(slowdowns)
+        req_types = np.asarray(req_types).astype(str)
+        sched_ids = np.asarray(sched_ids).astype('int64')
+        self._sketch('VALUE', 'all', 'all').add(values)
+        self._sketch('SLOWDOWN', 'all', 'all').add(slowdowns)
+        for t in np.unique(req_types):
+            self._sketch('VALUE', 'REQ_TYPE', str(t)).add(values[req_types == t])
+        for sid in np.unique(sched_ids):
+            in_sched = sched_ids == sid
+            self._sketch('VALUE', 'SCHED_ID', int(sid)).add(values[in_sched])
+            self._sketch('SLOWDOWN', 'SCHED_ID', int(sid)).add(slowdowns[in_sched])
+            for t in np.unique(req_types[in_sched]):
+                mask = in_sched & (req_types == t)
+                self._sketch('VALUE', 'SCHED_TYPE', (int(sid), str(t))).add(values[mask])
+        return self
+
+    def merge(self, other):
+        for (metric, group, key), sketch in other.sketches.items():
+            self._sketch(metric, group, key).merge(sketch)
+        return self
+
+    def get(self, metric='VALUE', group='all', key='all'):
+        return self.sketches.get((metric, group, key))
+
+    def keys(self, group, metric='VALUE'):
+        return sorted(k for (m, g, k) in self.sketches if m == metric and g == group)
+
+    def to_dict(self):
+        return {
+            'relative_accuracy': self.relative_accuracy,
+            'sketches': [
+                {'metric': m, 'group': g, 'key': list(k) if isinstance(k, tuple) else k, 'sketch': s.to_dict()}
+                for (m, g, k), s in self.sketches.items()
+            ]
+        }
+
+    @classmethod
+    def from_dict(cls, d):
+        trace_sketches = cls(d['relative_accuracy'])
+        for entry in d['sketches']:
+            key = tuple(entry['key']) if isinstance(entry['key'], list) else entry['key']
+            trace_sketches.sketches[(entry['metric'], entry['group'], key)] = \
+                QuantileSketch.from_dict(entry['sketch'])
+        return trace_sketches
+
+    def save(self, filename):
+        with open(filename, 'w') as f:
+            json.dump(self.to_dict(), f)
+
+    @classmethod
+    def load(cls, filename):
+        with open(filename, 'r') as f:
+            return cls.from_dict(json.load(f))
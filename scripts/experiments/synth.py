@@ -0,0 +1,234 @@
+#!/usr/bin/env python3
+# Synthetic experiment outputs, to measure how the loader scales.
+#
+# Writes an experiment folder laid out like a real run (client traces,
+# traces_hist, traces_rates and traces_throughput, the server's DARC windows
+# and the schedule) with any number of rows and clients. The schedule comes
+# from the workload's entry in exp_data.workloads, and the policy, load and
+# workload from the experiment name, as for real runs. Latencies are simulated
+# with sim.py, a chunk of rows at a time so that memory stays bounded: queues
+# start empty at each chunk.
+import exp_data
+import sim
+import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.csv as pcsv
+import yaml
+import argparse
+import json
+import os
+import time
+
+# Rows simulated and written at once
+CHUNK_ROWS = 1 << 22
+# Clients print timestamps since their clock's epoch
+BASE_TIME = 500000000000000
+# Epoch of traces_throughput, in ns
+THROUGHPUT_EPOCH = 1000000
+SYNTH_FILE = 'synth.json'
+TRACE_COLUMNS = ['W_ID', 'REQ_ID', 'REQ_TYPE', 'SENDING', 'COMPLETED', 'RESP_TIME', 'MEAN_NS', 'SCHED_ID']
+
+def workload_schedule(workload, n_phases=1, duration=5):
+    # A schedule in the Shremote_cfgs/schedules format with the workload's types
+    wl = exp_data.workloads[workload]
+    types = [t for t, v in wl.items() if isinstance(v, dict) and t != 'UNKNOWN']
+    return [{
+        'mean_ns': [int(wl[t]['MEAN'] * 1000) for t in types],
+        'ratios': [wl[t]['RATIO'] for t in types],
+        'uniform': False,
+        'ptype': 'PSP_MB',
+        'duration': duration,
+        'rtype': list(types),
+    } for _ in range(n_phases)]
+
+def fixed_ns(values):
+    # Integer ns as the client prints them (std::fixed: 6 decimals), much
+    # faster than formatting floats
+    return pc.binary_join_element_wise(pc.cast(pa.array(values), pa.string()), '000000', '.')
+
+class ClientOutput:
+    # Incremental writer of a client's output files
+    def __init__(self, folder, types, n_expected):
+        os.makedirs(folder, exist_ok=True)
+        self.folder = folder
+        self.types = types
+        self.n_sent = 0
+        # Like the client, the first 10% of requests are left out of histograms
+        self.warmup = int(n_expected * sim.WARMUP)
+        self.hists = {t: {'MIN': 0, 'MAX': 0, 'COUNT': 0, 'TOTAL': 0, 'COUNTS': np.zeros(0, dtype='int64')} for t in ['UNKNOWN'] + types}
+        self.throughput = {t: np.zeros(0, dtype='int64') for t in types}
+        self.first_sent = None
+        self.rates = []
+        self.traces = open(os.path.join(folder, 'traces'), 'wb')
+        self.traces.write(('\t'.join(TRACE_COLUMNS) + '\n').encode())
+
+    def add_to_hist(self, name, latencies):
+        if latencies.shape[0] == 0:
+            return
+        hist = self.hists[name]
+        buckets = np.bincount((latencies // sim.BUCKET_SIZE).astype('int64'))
+        if buckets.shape[0] > hist['COUNTS'].shape[0]:
+            hist['COUNTS'] = np.pad(hist['COUNTS'], (0, buckets.shape[0] - hist['COUNTS'].shape[0]))
+        hist['COUNTS'][:buckets.shape[0]] += buckets
+        hist['MIN'] = latencies.min() if hist['COUNT'] == 0 else min(hist['MIN'], latencies.min())
+        hist['MAX'] = max(hist['MAX'], latencies.max())
+        hist['COUNT'] += latencies.shape[0]
+        hist['TOTAL'] += int(latencies.sum())
+
+    def add_requests(self, times, rtypes, finish, services, sched_id):
+        n = times.shape[0]
+        if n == 0:
+            return
+        # Integer ns
+        sending = times.astype('int64') + BASE_TIME
+        completed = finish.astype('int64') + BASE_TIME
+        latencies = completed - sending
+        pcsv.write_csv(pa.table({
+            'W_ID': np.zeros(n, dtype='uint16'),
+            'REQ_ID': np.arange(self.n_sent, self.n_sent + n),
+            'REQ_TYPE': pa.DictionaryArray.from_arrays(rtypes.astype('int32'), self.types),
+            'SENDING': fixed_ns(sending),
+            'COMPLETED': fixed_ns(completed),
+            'RESP_TIME': fixed_ns(latencies),
+            'MEAN_NS': services.astype('int64'),
+            'SCHED_ID': np.full(n, sched_id, dtype='uint8'),
+        }), self.traces, pcsv.WriteOptions(include_header=False, delimiter='\t', quoting_style='none'))
+
+        kept = slice(max(self.warmup - self.n_sent, 0), n)
+        self.add_to_hist('UNKNOWN', latencies[kept])
+        for k, t in enumerate(self.types):
+            self.add_to_hist(t, latencies[kept][rtypes[kept] == k])
+
+        # Completions per epoch, counted from the first request sent
+        if self.first_sent is None:
+            self.first_sent = sending[0]
+        epochs = ((completed - self.first_sent) // THROUGHPUT_EPOCH).astype('int64')
+        for k, t in enumerate(self.types):
+            counts = np.bincount(epochs[rtypes == k])
+            if counts.shape[0] > self.throughput[t].shape[0]:
+                self.throughput[t] = np.pad(self.throughput[t], (0, counts.shape[0] - self.throughput[t].shape[0]))
+            self.throughput[t][:counts.shape[0]] += counts
+        self.n_sent += n
+
+    def close(self):
+        self.traces.close()
+        with open(os.path.join(self.folder, 'traces_hist'), 'w') as f:
+            for name, hist in self.hists.items():
+                if hist['COUNT'] == 0:
+                    continue
+                buckets = np.flatnonzero(hist['COUNTS'])
+                f.write('TYPE\tMIN\tMAX\tCOUNT\tTOTAL' + ''.join(f'\t{b * sim.BUCKET_SIZE}' for b in buckets.tolist()) + '\n')
+                f.write(f"{name}\t{hist['MIN']}\t{hist['MAX']}\t{hist['COUNT']}\t{hist['TOTAL']}")
+                f.write(''.join(f'\t{c}' for c in hist['COUNTS'][buckets].tolist()) + '\n')
+        with open(os.path.join(self.folder, 'traces_rates'), 'w') as f:
+            f.write('OFFERED\tACHIEVED\n')
+            for offered, achieved in self.rates:
+                f.write(f'{offered}\t{achieved}\n')
+        with open(os.path.join(self.folder, 'traces_throughput'), 'w') as f:
+            f.write('W_ID\tTIME\tTYPE\tN\n')
+            for t, counts in self.throughput.items():
+                for e in np.flatnonzero(counts).tolist():
+                    f.write(f'0\t{e * THROUGHPUT_EPOCH}\t{t}\t{counts[e]}\n')
+
+def write_windows(folder, phase_windows):
+    # One row per type group each time the DARC reservations change
+    os.makedirs(folder, exist_ok=True)
+    with open(os.path.join(folder, 'windows'), 'w') as f:
+        f.write('ID\tSTART\tEND\tGID\tRES\tSTEAL\tCOUNT\tUPDATED\tQLEN\n')
+        for i, (start, end, groups, count) in enumerate(phase_windows):
+            for gid, (res, steal) in enumerate(groups):
+                f.write(f'{i}\t{BASE_TIME + int(start)}\t{BASE_TIME + int(end)}\t{gid}\t{res}\t{steal}\t{count}\t1\t0\n')
+
+def write_synthetic_exp(exp, n_rows, base_folder=exp_data.exp_base_folder, n_clients=1, n_workers=14,
+                        n_phases=1, chunk_rows=CHUNK_ROWS, seed=0, verbose=True):
+    t0 = time.time()
+    policy = exp.split('_')[0]
+    load = float(exp.split('_')[1])
+    workload = exp.split('_')[2].split('.')[0]
+    exp_folder = os.path.join(base_folder, exp)
+    os.makedirs(exp_folder, exist_ok=True)
+
+    schedule = workload_schedule(workload, n_phases)
+    types = sim.schedule_types(schedule)
+    rate = sim.client_rate(schedule[0], 1, n_workers, load)
+    # Phase durations match the number of rows
+    for phase in schedule:
+        phase['duration'] = round(n_rows / n_phases / rate, 6)
+    with open(os.path.join(exp_folder, workload + '.yml'), 'w') as f:
+        yaml.dump(schedule, f)
+
+    rng = np.random.default_rng(seed)
+    clients = [
+        ClientOutput(os.path.join(exp_folder, f'client{c}'), types, n_rows / n_clients)
+        for c in range(n_clients)
+    ]
+    windows = []
+    start = 0.
+    for sched_id, phase in enumerate(schedule):
+        n_phase_rows = n_rows // n_phases + (sched_id < n_rows % n_phases)
+        n_clt_sent = np.zeros(n_clients, dtype='int64')
+        first_sent = np.full(n_clients, np.inf)
+        last_sent = np.zeros(n_clients)
+        last_completed = np.zeros(n_clients)
+        chunk_start = start
+        while n_phase_rows > 0:
+            n = min(chunk_rows, n_phase_rows)
+            times, rtypes, services = sim.gen_phase(phase, types, rate, n / rate, rng)
+            times, rtypes, services = times[:n], rtypes[:n], services[:n]
+            finish = sim.simulate_phase(policy, phase, types, times, rtypes, services, n_workers)
+            times += chunk_start
+            finish += chunk_start
+            clt_ids = rng.integers(n_clients, size=times.shape[0])
+            for c, client in enumerate(clients):
+                mask = clt_ids == c
+                if not mask.any():
+                    continue
+                client.add_requests(times[mask], rtypes[mask], finish[mask], services[mask], sched_id)
+                n_clt_sent[c] += mask.sum()
+                first_sent[c] = min(first_sent[c], times[mask][0])
+                last_sent[c] = times[mask][-1]
+                last_completed[c] = max(last_completed[c], finish[mask].max())
+            n_phase_rows -= times.shape[0]
+            chunk_start = times[-1] + 1
+        for c, client in enumerate(clients):
+            client.rates.append((
+                n_clt_sent[c] / ((last_sent[c] - first_sent[c]) / 1e9),
+                n_clt_sent[c] / ((last_completed[c] - first_sent[c]) / 1e9)
+            ))
+        end = last_completed.max()
+        if policy == 'DARC':
+            groups = sim.darc_groups(phase['mean_ns'], phase['ratios'], n_workers)
+            windows.append((
+                start, end, [(len(res), len(steal)) for _, res, steal in groups], int(n_clt_sent.sum())
+            ))
+        # The clients start the next phase once every request completed
+        start = end
+    for client in clients:
+        client.close()
+    if windows:
+        write_windows(os.path.join(exp_folder, 'server'), windows)
+
+    with open(os.path.join(exp_folder, SYNTH_FILE), 'w') as f:
+        json.dump({'n_rows': n_rows, 'n_clients': n_clients, 'n_workers': n_workers,
+                   'n_phases': n_phases, 'seed': seed}, f)
+    if verbose:
+        print(f'[{exp}] Wrote {n_rows} rows for {n_clients} client(s) in {time.time() - t0:.2f} seconds')
+    return exp_folder
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Write synthetic experiment outputs')
+    parser.add_argument('exps', nargs='+', help='experiment names, e.g. DARC_0.80_SBIM2_14.0')
+    parser.add_argument('-n', '--n-rows', type=float, default=1e6, help='number of requests, across clients')
+    parser.add_argument('-c', '--n-clients', type=int, default=1)
+    parser.add_argument('-w', '--n-workers', type=int, default=14)
+    parser.add_argument('-P', '--n-phases', type=int, default=1)
+    parser.add_argument('-b', '--base-folder', type=str, default=exp_data.exp_base_folder)
+    parser.add_argument('-s', '--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    for exp in args.exps:
+        write_synthetic_exp(
+            exp, int(args.n_rows), base_folder=args.base_folder, n_clients=args.n_clients,
+            n_workers=args.n_workers, n_phases=args.n_phases, seed=args.seed
+        )
@@ -0,0 +1,68 @@
+import catalog
+import exp_data
+import synth
+import pytest
+import shutil
+import sqlite3
+import os
+
+def test_parse_exp_name():
+    assert catalog.parse_exp_name('DARC_0.80_SBIM2_14.0') == {
+        'name': 'DARC_0.80_SBIM2_14.0', 'system': 'psp', 'policy': 'DARC', 'load': .8,
+        'workload': 'SBIM2', 'n_workers': 14, 'n_resas': -1, 'run_number': 0,
+    }
+    manual = catalog.parse_exp_name('DARC_1.00_SBIM2_14_2.12')
+    assert (manual['load'], manual['n_workers'], manual['n_resas'], manual['run_number']) == (1., 14, 2, 12)
+    shenango = catalog.parse_exp_name('shen-CFCFS_0.50_TPCC_14.1')
+    assert (shenango['system'], shenango['policy'], shenango['workload']) == ('shenango', 'shen-CFCFS', 'TPCC')
+    for name in ['reports', 'DARC_x_SBIM2_14.0']:
+        with pytest.raises((ValueError, IndexError)):
+            catalog.parse_exp_name(name)
+
+def test_query_clause():
+    assert catalog.query_clause({}) == ('1', [])
+    where, params = catalog.query_clause({'policy': ['DARC', 'CFCFS'], 'load': (.8, 1.), 'workload': 'SBIM2'})
+    assert where == 'load BETWEEN ? AND ? AND policy IN (?, ?) AND workload = ?'
+    assert params == [.8, 1., 'DARC', 'CFCFS', 'SBIM2']
+    with pytest.raises(ValueError):
+        catalog.query_clause({'lod': .8})
+
+def test_catalog_scan_and_query(base_folder):
+    exps = ['CFCFS_0.50_SBIM2_14.0', 'DARC_0.50_SBIM2_14.0', 'DARC_0.80_SBIM2_14.0', 'DARC_0.80_SBIM2_14_2.0']
+    for exp in exps:
+        synth.write_synthetic_exp(exp, 2000, base_folder=base_folder, verbose=False)
+    os.makedirs(os.path.join(base_folder, 'reports'))
+
+    cat = catalog.Catalog(base_folder)
+    assert cat.scan() == (4, 0)
+    assert cat.exps() == exps
+    assert cat.exps({'policy': 'DARC', 'load': (.7, 1.)}) == ['DARC_0.80_SBIM2_14.0', 'DARC_0.80_SBIM2_14_2.0']
+    assert cat.exps({'policy': 'DARC', 'n_resas': -1}) == ['DARC_0.50_SBIM2_14.0', 'DARC_0.80_SBIM2_14.0']
+    entry = cat.query({'name': 'DARC_0.80_SBIM2_14.0'})[0]
+    assert (entry['n_clients'], entry['n_phases'], entry['has_hist'], entry['has_traces']) == (1, 1, 1, 1)
+    assert (entry['has_columnar'], entry['has_windows'], entry['has_summary']) == (0, 1, 0)
+    assert entry['traces_bytes'] == os.path.getsize(os.path.join(base_folder, 'DARC_0.80_SBIM2_14.0', 'client0', 'traces'))
+
+    # Only new, changed and deleted experiments are looked at again
+    assert cat.scan() == (0, 0)
+    shutil.rmtree(os.path.join(base_folder, 'CFCFS_0.50_SBIM2_14.0'))
+    os.remove(os.path.join(base_folder, 'DARC_0.50_SBIM2_14.0', 'client0', 'traces'))
+    assert cat.scan() == (1, 1)
+    assert cat.query({'name': 'DARC_0.50_SBIM2_14.0'})[0]['has_traces'] == 0
+    cat.close()
+
+    # Through the loader
+    assert exp_data.query_exps({'load': .5}) == ['DARC_0.50_SBIM2_14.0']
+
+def test_catalog_version(base_folder):
+    synth.write_synthetic_exp('DARC_0.80_SBIM2_14.0', 2000, base_folder=base_folder, verbose=False)
+    cat = catalog.Catalog(base_folder)
+    cat.scan()
+    cat.close()
+    # Entries of another catalog version are scanned again
+    db = sqlite3.connect(os.path.join(base_folder, catalog.CATALOG_FILE))
+    db.execute('PRAGMA user_version = 0')
+    db.close()
+    cat = catalog.Catalog(base_folder)
+    assert cat.exps() == [] and cat.scan() == (1, 0)
+    cat.close()
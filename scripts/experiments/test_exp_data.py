@@ -0,0 +1,327 @@
+import exp_data
+import trace_store
+import os
+import numpy as np
+import pandas as pd
+import pytest
+
+QUANTILES = [0, .25, .5, .9, .99, 1]
+
+def lower_rank(x, q):
+    # Smallest value whose empirical CDF reaches q (inverted CDF)
+    x = np.sort(x)
+    return x[max(int(np.ceil(q * x.shape[0])) - 1, 0)]
+
+def test_bucket_quantiles_match_samples(rng):
+    samples = [rng.integers(0, 50000, n) for n in [1, 7, 1000]]
+    buckets = np.arange(0, 50000, 1000)
+    counts = np.array([np.bincount(s // 1000, minlength=buckets.shape[0]) for s in samples])
+    values = exp_data.bucket_quantiles(buckets, counts, QUANTILES)
+    for s, row in zip(samples, values):
+        expected = [lower_rank(s, q) // 1000 * 1000 + 500 for q in QUANTILES]
+        assert np.array_equal(row, expected)
+
+def test_bucket_quantiles_interpolated(rng):
+    buckets = np.array([0, 1000, 5000, 9000])
+    counts = rng.integers(0, 20, (5, 4))
+    counts[0] = 0
+    values = exp_data.bucket_quantiles(buckets, counts, QUANTILES, interpolate=True)
+    assert np.isnan(values[0]).all()
+    for row, hist in zip(values[1:], counts[1:]):
+        cum = np.cumsum(hist)
+        for v, q in zip(row, QUANTILES):
+            target = q * cum[-1]
+            i = next(i for i in range(4) if cum[i] >= target)
+            before = cum[i] - hist[i]
+            frac = (target - before) / hist[i] if hist[i] else 0
+            assert v == pytest.approx(buckets[i] + frac * 1000)
+
+
+def test_parse_hist_missing_histograms(synthetic_exp):
+    # A client without outputs and a type without histogram stay empty
+    hists = exp_data.parse_hist(['SHORT', 'LONG', 'GET'], [synthetic_exp], clients=[0, 1, 2])
+    assert hists['GET'][synthetic_exp]['client-end-to-end'].empty
+    assert not hists['all'][synthetic_exp]['client-end-to-end'].empty
+    rows, typed_rows = exp_data.exp_pctl_rows(synthetic_exp, ['SHORT', 'LONG', 'GET'], clients=[0, 1, 2])
+    assert len(rows) == 1 and [r[2] for r in typed_rows] == ['SHORT', 'LONG']
+
+    # No histogram at all
+    hists = exp_data.parse_hist(['SHORT', 'LONG'], [synthetic_exp], clients=[2])
+    assert all(hists[t][synthetic_exp]['client-end-to-end'].empty for t in ['SHORT', 'LONG', 'all'])
+
+def test_parse_hist_matches_traces(synthetic_exp):
+    # Client histograms leave out the first 10% of the requests expected
+    # from each client (the fixture sends 10000 per client)
+    clients = [0, 1]
+    hists = exp_data.parse_hist(['SHORT', 'LONG'], [synthetic_exp], clients=clients)
+    values = []
+    for clt in clients:
+        df = exp_data.read_profiling_node(synthetic_exp, f'client{clt}', verbose=False)
+        values.append(df.iloc[1000:].assign(VALUE=lambda d: d.COMPLETED - d.SENDING))
+    df = pd.concat(values)
+    for t, group in df.groupby('REQ_TYPE'):
+        pctls = hists[t][synthetic_exp]['client-end-to-end']
+        assert pctls.MEAN[0] == pytest.approx(group.VALUE.mean() / 1000)
+        # Bucket midpoints, within half a bucket
+        assert abs(pctls['p99'][0] - lower_rank(group.VALUE.values, .99) / 1000) <= .5
+
+def test_slowdown_hist(rng):
+    # Types of very different means: every client bucket keeps its own
+    # slowdown bucket, and quantiles are those of the bucket midpoints
+    means = {'SHORT': .5, 'LONG': 500.}
+    typed_hists = {}
+    slowdowns = []
+    for t, top in [('SHORT', 10 ** 4), ('LONG', 10 ** 5)]:
+        buckets = np.unique(rng.integers(0, top, 2000)) * 1000
+        counts = rng.integers(1, 50, buckets.shape[0]).astype('uint64')
+        typed_hists[t] = {'MIN': buckets[0], 'MAX': buckets[-1] + 999, 'COUNT': int(counts.sum()), 'TOTAL': 0,
+                          'BUCKETS': buckets, 'COUNTS': counts}
+        slowdowns.append(np.repeat((buckets + 500.) / (means[t] * 1000), counts.astype('int64')))
+    hist = exp_data.slowdown_hist(typed_hists, means)
+    assert hist.keys.shape[0] == sum(h['BUCKETS'].shape[0] for h in typed_hists.values())
+    slowdowns = np.concatenate(slowdowns)
+    for q, v in zip([.5, .9, .99, .999], hist.quantiles([.5, .9, .99, .999])):
+        # Within one step of the finest unit (LONG's: 1000 ns / 500 us)
+        assert abs(v - lower_rank(slowdowns, q)) <= .002
+
+def test_merge_sorted_frames(rng):
+    frames = []
+    for k in range(4):
+        n = [0, 1, 50, 300][k]
+        frames.append(pd.DataFrame({
+            'TIME': np.sort(rng.integers(0, 1000, n)),
+            'CLIENT': np.full(n, k),
+            'REQ_TYPE': pd.Categorical(rng.choice(['A', 'B', 'C'][:k + 1], n)),
+        }))
+    merged = exp_data.merge_sorted_frames(frames, 'TIME')
+    expected = pd.concat(frames, ignore_index=True).sort_values('TIME', kind='stable').reset_index(drop=True)
+    assert np.array_equal(merged.TIME.values, expected.TIME.values)
+    assert np.array_equal(merged.CLIENT.values, expected.CLIENT.values)
+    assert merged.REQ_TYPE.astype(str).tolist() == expected.REQ_TYPE.astype(str).tolist()
+    assert exp_data.merge_sorted_frames([pd.DataFrame()], 'TIME').empty
+
+def test_read_exp_traces_clients(synthetic_exp):
+    # One frame sorted on SENDING, with a time origin shared by the clients
+    df = exp_data.read_exp_traces(synthetic_exp, verbose=False, clients=[0, 1])
+    clients = [exp_data.read_profiling_node(synthetic_exp, f'client{c}', verbose=False).assign(CLIENT=c) for c in [0, 1]]
+    expected = pd.concat(clients).sort_values('SENDING', kind='stable').reset_index(drop=True)
+    assert np.array_equal(df.SENDING.values, expected.SENDING.values)
+    assert np.array_equal(df.CLIENT.values, expected.CLIENT.values)
+    assert np.array_equal(df.TIME.values, expected.SENDING.values - expected.SENDING.min())
+
+def test_select_quantiles(rng):
+    for n in [1, 2, 1001]:
+        values = rng.exponential(size=n)
+        assert np.allclose(exp_data.select_quantiles(values, QUANTILES), np.quantile(values, QUANTILES))
+    assert np.isnan(exp_data.select_quantiles(np.array([]), QUANTILES)).all()
+
+def test_typed_trace_stats(rng):
+    values = rng.exponential(10, 5000)
+    req_types = rng.choice(['SHORT', 'LONG'], 5000, p=[.99, .01])
+    means = {'SHORT': .5, 'LONG': 500}
+    stats = exp_data.typed_trace_stats(values, req_types, means, QUANTILES)
+    df = pd.DataFrame({'VALUE': values, 'REQ_TYPE': req_types})
+    df['SLOWDOWN'] = df.VALUE / df.REQ_TYPE.map(means)
+    for t, group in list(df.groupby('REQ_TYPE')) + [('all', df)]:
+        assert stats.loc[t, 'COUNT'] == group.shape[0]
+        assert stats.loc[t, 'MEAN'] == pytest.approx(group.VALUE.mean())
+        assert np.allclose(stats.loc[t, ['p0', 'MEDIAN', 'p99', 'p100']].astype(float), group.VALUE.quantile([0, .5, .99, 1]))
+        assert stats.loc[t, 'p99_slowdown'] == pytest.approx(group.SLOWDOWN.quantile(.99))
+
+    single = exp_data.typed_trace_stats([7.], ['LONG'], means, QUANTILES)
+    assert single.loc['LONG', 'COUNT'] == 1 and single.loc['all', 'p99'] == 7.
+
+def test_exp_sketches_match_traces(synthetic_exp):
+    sketches = exp_data.exp_sketches(synthetic_exp, clients=[0, 1], save=False)
+    df = exp_data.read_exp_traces(synthetic_exp, verbose=False, clients=[0, 1])
+    values = (df.COMPLETED - df.SENDING).values
+    assert sketches.get('VALUE').count == df.shape[0]
+    for t in ['SHORT', 'LONG']:
+        exact = np.sort(values[(df.REQ_TYPE == t).values])
+        approx = sketches.get('VALUE', 'REQ_TYPE', t).quantile(.99)
+        assert abs(approx - exact[int(.99 * (exact.shape[0] - 1))]) <= .01 * approx
+
+def test_client_sketches_skip_unknown_types(synthetic_exp, base_folder, monkeypatch, capsys):
+    # A type without a mean service time in the workload is left out,
+    # rather than counted with a NaN slowdown
+    monkeypatch.delitem(exp_data.workloads['SBIM2'], 'LONG')
+    filename = os.path.join(base_folder, synthetic_exp, 'client0', 'traces')
+    sketches = exp_data.client_sketches(filename, 'SBIM2', save=False, chunksize=1000)
+    assert 'no mean service time for LONG' in capsys.readouterr().out
+    assert sketches.keys('REQ_TYPE') == ['SHORT']
+    short = exp_data.read_profiling_node(synthetic_exp, 'client0', verbose=False).query('REQ_TYPE == "SHORT"')
+    assert sketches.get('SLOWDOWN').count == sketches.get('VALUE').count == short.shape[0]
+    slowdowns = np.sort((short.COMPLETED - short.SENDING).values / 500.)
+    assert sketches.get('SLOWDOWN').quantile(0) == pytest.approx(slowdowns[0], rel=.01)
+
+def pandas_grouped(keys, values, quantiles):
+    grouped = pd.Series(values, dtype='float64').groupby(keys)
+    return np.array([[grouped.get_group(k).quantile(q) for q in quantiles] for k in sorted(set(keys))])
+
+@pytest.mark.parametrize('dtype', ['uint64', 'int64', 'float64'])
+def test_grouped_quantiles(rng, dtype):
+    keys = rng.integers(0, 40, 5000)
+    values = rng.integers(0, 10 ** 9, 5000).astype(dtype)
+    if dtype == 'float64':
+        # Negative and non integer values take the lexsort path
+        values = values / 7 - 1e8
+    uniq, counts, pctls = exp_data.grouped_quantiles(keys, values, QUANTILES)
+    assert np.array_equal(uniq, np.unique(keys))
+    assert np.array_equal(counts, np.bincount(keys)[uniq])
+    assert np.allclose(pctls, pandas_grouped(keys, values, QUANTILES), rtol=1e-12)
+
+def test_grouped_quantiles_empty_and_single():
+    uniq, counts, pctls = exp_data.grouped_quantiles([], np.array([], dtype='uint64'), QUANTILES)
+    assert uniq.shape == (0,) and counts.shape == (0,) and pctls.shape == (0, len(QUANTILES))
+    uniq, counts, pctls = exp_data.grouped_quantiles([5], np.array([42], dtype='uint64'), QUANTILES)
+    assert uniq.tolist() == [5] and counts.tolist() == [1]
+    assert (pctls == 42).all()
+
+def test_time_binned_pctls(rng):
+    n = 3000
+    df = pd.DataFrame({
+        'TIME': np.sort(rng.integers(0, 10 ** 9, n)).astype('uint64'),
+        'VALUE': rng.integers(0, 10 ** 6, n).astype('uint64'),
+        'SCHED_ID': np.zeros(n, dtype='uint8'),
+        'REQ_TYPE': pd.Categorical(rng.choice(['LONG', 'SHORT'], n)),
+    })
+    pctls = exp_data.time_binned_pctls(df, bin_width=1e8, quantiles=[.5, .99], include_all=False)
+    bins = (df.TIME.values - df.TIME.values.min()) // 1e8
+    expected = df.assign(b=bins).groupby(['b', 'REQ_TYPE']).VALUE.quantile(.99).dropna()
+    assert np.allclose(pctls['p99'].values, expected.values)
+
+def test_time_binned_pctls_origin(rng):
+    # With the run's origin, the bins of a time range are those of the run
+    n = 3000
+    df = pd.DataFrame({
+        'TIME': np.sort(rng.integers(0, 10 ** 9, n)).astype('uint64'),
+        'VALUE': rng.integers(0, 10 ** 6, n).astype('uint64'),
+        'SCHED_ID': rng.integers(0, 2, n).astype('uint8'),
+        'REQ_TYPE': pd.Categorical(rng.choice(['LONG', 'SHORT'], n)),
+    })
+    origin = df.TIME.values.min()
+    full = exp_data.time_binned_pctls(df, bin_width=1e8, quantiles=[.5, .99])
+    part = exp_data.time_binned_pctls(df[df.TIME >= origin + 3e8], bin_width=1e8, quantiles=[.5, .99], origin=origin)
+    pd.testing.assert_frame_equal(part, full[full.time_bin >= 3].reset_index(drop=True))
+    assert (part.TIME == origin + part.time_bin * 1e8).all()
+    # Without it, bin 0 starts at the range's first request
+    assert exp_data.time_binned_pctls(df[df.TIME >= origin + 3e8], bin_width=1e8).time_bin.min() == 0
+
+def test_read_exp_time_range(synthetic_exp, base_folder):
+    full = exp_data.read_exp_traces(synthetic_exp, clients=[0, 1], verbose=False)
+    end = full.TIME.values.max() / 1e9
+    for convert in [False, True]:
+        if convert:
+            trace_store.convert_exp(synthetic_exp, base_folder, verbose=False)
+        for start, stop, req_types in [(end * .2, end * .6, None), (end * .5, end * .7, ['LONG']), (0, end * 2, None)]:
+            df = exp_data.read_exp_time_range(synthetic_exp, start, stop, clients=[0, 1], req_types=req_types, verbose=False)
+            mask = (full.TIME >= int(start * 1e9)) & (full.TIME < int(stop * 1e9))
+            if req_types is not None:
+                mask &= full.REQ_TYPE.isin(req_types)
+            expected = full[mask].reset_index(drop=True)[df.columns]
+            pd.testing.assert_frame_equal(df, expected, check_categorical=False)
+
+def mser_reference(x, max_trim):
+    n = len(x)
+    if n < 4:
+        return 0
+    scores = [np.var(x[d:]) / (n - d) for d in range(max(1, int(n * max_trim)))]
+    return int(np.argmin(scores))
+
+def test_mser_start(rng):
+    for n in [1, 3, 4, 10, 500]:
+        x = rng.normal(size=n)
+        x[:n // 5] += 10
+        assert exp_data.mser_start(x, .5) == mser_reference(x, .5)
+
+def test_steady_state_trims_transients(rng):
+    x = np.concatenate([np.linspace(10, 1, 20), rng.normal(1, .05, 200), np.linspace(1, 10, 10)])
+    x[50] = np.nan
+    start, end = exp_data.steady_state(x)
+    assert 15 <= start <= 25 and 215 <= end <= 225
+
+def test_steady_mask():
+    times = np.array([0, 5, 10, 15, 20, 25], dtype='float64')
+    sched_ids = np.array([0, 0, 0, 1, 1, 2], dtype='uint8')
+    # Phase 2 has no window: none of its requests are kept
+    mask = exp_data.steady_mask(times, sched_ids, {0: (5, 10), 1: (0, 100)})
+    assert mask.tolist() == [False, True, False, True, True, False]
+    assert exp_data.steady_mask(times[:0], sched_ids[:0], {0: (5, 10)}).shape == (0,)
+
+def test_prepare_traces_trim(synthetic_exp):
+    full = exp_data.prepare_traces([synthetic_exp], ['client-end-to-end'], clients=[0, 1])[synthetic_exp]['client-end-to-end']
+    trimmed = exp_data.prepare_traces([synthetic_exp], ['client-end-to-end'], clients=[0, 1], trim=True)[synthetic_exp]['client-end-to-end']
+    assert 0 < trimmed.shape[0] <= full.shape[0]
+    # One contiguous window per phase, all of whose requests are kept
+    for sid, group in full.groupby('SCHED_ID'):
+        kept = trimmed[trimmed.SCHED_ID == sid]
+        assert not kept.empty
+        window = group[(group.TIME >= kept.TIME.min()) & (group.TIME <= kept.TIME.max())]
+        assert window.shape[0] == kept.shape[0]
+
+def test_prepare_traces_seconds(synthetic_exp):
+    ns = exp_data.prepare_traces([synthetic_exp], ['client-end-to-end'], clients=[0, 1], get_schedule_data=True)
+    s = exp_data.prepare_traces([synthetic_exp], ['client-end-to-end'], clients=[0, 1], get_schedule_data=True, seconds=True)
+    ns, s = ns[synthetic_exp], s[synthetic_exp]
+    assert ns['client-end-to-end'].TIME.dtype == 'uint64'
+    assert np.allclose(s['client-end-to-end'].TIME.values, ns['client-end-to-end'].TIME.values / 1e9)
+    assert s['bins'] is s['client-end-to-end'] and np.array_equal(s['bins'].time_bin, ns['bins'].time_bin)
+    # The cached setup is left in ns
+    again = exp_data.prepare_traces([synthetic_exp], ['client-end-to-end'], clients=[0, 1], get_schedule_data=True)
+    assert again[synthetic_exp] is ns and ns['client-end-to-end'].TIME.dtype == 'uint64'
+    single = exp_data.prepare_exp_traces(synthetic_exp, ['client-end-to-end'], clients=[0], seconds=True)
+    assert single['client-end-to-end'].TIME.dtype == 'float64'
+
+def test_prepare_traces_does_not_cache_empty(synthetic_exp):
+    assert exp_data.prepare_traces([synthetic_exp], ['client-end-to-end'], clients=[0], req_type='GET') == {synthetic_exp: {}}
+    assert len(exp_data.cache) == 0
+    setups = exp_data.prepare_traces([synthetic_exp], ['client-end-to-end'], clients=[0], req_type='LONG')
+    assert (setups[synthetic_exp]['client-end-to-end'].REQ_TYPE == 'LONG').all()
+    assert len(exp_data.cache) == 1
+
+def test_exp_summary(synthetic_exp):
+    summary = exp_data.write_exp_summary(synthetic_exp)
+    assert summary['clients'] == [0, 1] and summary['throughput'].keys() == {'SHORT', 'LONG'}
+    assert {(p['SCHED_ID'], p['REQ_TYPE']) for p in summary['phases']} == {(s, t) for s in [0, 1] for t in ['SHORT', 'LONG']}
+    # Same rows from the summary as from the histograms, whatever the other
+    # arguments of exp_pctl_rows
+    rows = exp_data.exp_pctl_rows(synthetic_exp, ['SHORT', 'LONG'], clients=[0, 1], chunksize=1000)
+    os.remove(os.path.join(exp_data.exp_base_folder, synthetic_exp, exp_data.SUMMARY_FILE))
+    assert rows == exp_data.exp_pctl_rows(synthetic_exp, ['SHORT', 'LONG'], clients=[0, 1])
+    # Summaries of other clients are not used
+    assert exp_data.read_exp_summary(synthetic_exp, clients=[0]) is None
+
+def test_exp_summary_partial_outputs(synthetic_exp, monkeypatch):
+    # A type missing from the workloads table, and no throughput files
+    monkeypatch.delitem(exp_data.workloads['SBIM2'], 'LONG')
+    for clt in [0, 1]:
+        os.remove(os.path.join(exp_data.exp_base_folder, synthetic_exp, f'client{clt}', 'traces_throughput'))
+    summary = exp_data.write_exp_summary(synthetic_exp)
+    assert summary['throughput'] == {}
+    assert np.isnan(summary['pctls']['client-end-to-end']['LONG']['p99_slowdown'])
+    assert not np.isnan(summary['pctls']['client-end-to-end']['all']['p99_slowdown'])
+    # Phase slowdowns come from the schedule's means
+    for phase in summary['phases']:
+        assert phase['REQ_TYPE'] == 'SHORT' and phase['p99.9_slowdown'] == pytest.approx(phase['p99.9'] / .5)
+
+def test_trace_phase_stats(synthetic_exp):
+    setup = exp_data.prepare_traces([synthetic_exp], ['client-end-to-end'], clients=[0, 1])[synthetic_exp]
+    df = setup['client-end-to-end']
+    type_means = exp_data.phase_type_means(exp_data.read_exp_schedule(synthetic_exp))
+    stats = exp_data.trace_phase_stats(df, type_means, QUANTILES).set_index(['SCHED_ID', 'REQ_TYPE'])
+    assert stats.COUNT.sum() == 2 * df.shape[0]
+    for (sid, t), group in df.groupby(['SCHED_ID', 'REQ_TYPE']):
+        row = stats.loc[(sid, t)]
+        assert row.COUNT == group.shape[0]
+        assert row.MEAN == pytest.approx(group.VALUE.mean() / 1000)
+        assert row['p99'] == pytest.approx(group.VALUE.quantile(.99) / 1000)
+        assert row['p99_slowdown'] == pytest.approx(group.VALUE.quantile(.99) / type_means[(sid, t)])
+    for sid, group in df.groupby('SCHED_ID'):
+        slowdowns = group.VALUE / [type_means[(sid, t)] for t in group.REQ_TYPE]
+        assert stats.loc[(sid, 'all')]['p99_slowdown'] == pytest.approx(slowdowns.quantile(.99))
+
+def test_trace_phase_stats_empty_and_unscheduled(synthetic_exp):
+    df = exp_data.prepare_traces([synthetic_exp], ['client-end-to-end'], clients=[0])[synthetic_exp]['client-end-to-end']
+    stats = exp_data.trace_phase_stats(df, {}, [.5])
+    assert stats.COUNT.sum() > 0 and stats.MEDIAN_slowdown.isna().all()
+    assert exp_data.trace_phase_stats(df.iloc[:0], {}, [.5]).empty
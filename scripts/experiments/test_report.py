@@ -0,0 +1,48 @@
+import exp_data
+import loader
+import report
+import synth
+import numpy as np
+import pandas as pd
+import os
+
+EXPS = ['CFCFS_0.50_SBIM2_14.0', 'DARC_0.50_SBIM2_14.0', 'DARC_0.80_SBIM2_14.0']
+
+def write_figure(base_folder, name):
+    folder = os.path.join(base_folder, name)
+    for exp in EXPS:
+        synth.write_synthetic_exp(exp, 5000, base_folder=folder, verbose=False)
+    return folder
+
+def test_build_figure(base_folder):
+    write_figure(base_folder, 'Figure4_b')
+    name, folder, exps, list_file = report.figure_exps('Figure4_b', base_folder=base_folder)
+    assert (name, exps, list_file) == ('Figure4_b', EXPS, None)
+    app, rtypes = report.figure_rtypes(exps)
+    out_dir = os.path.join(base_folder, 'reports', name)
+    outputs, _ = report.build_figure(name, folder, exps, out_dir, app, rtypes, [0], fmt='csv', plot=False)
+    assert set(outputs) == {'pctls', 'pctls_typed'}
+
+    df, typed_df = exp_data.prepare_pctl_data(rtypes, exps=exps, clients=[0], remove_drops=True)
+    written = pd.read_csv(outputs['pctls'])
+    assert written.shape[0] == df.shape[0] == len(EXPS)
+    for column in ['p99', 'p99.9', 'p99.9_slowdown', 'achieved']:
+        assert np.allclose(written[column], df[column], equal_nan=True)
+    assert pd.read_csv(outputs['pctls_typed']).shape[0] == typed_df.shape[0] == 2 * len(EXPS)
+
+def test_build_figure_plots_its_tables(base_folder, monkeypatch):
+    # The figure is drawn from the tables build_figure computed, not recomputed
+    folder = write_figure(base_folder, 'Figure4_b')
+    calls = []
+    prepare_pctl_data = exp_data.prepare_pctl_data
+    def counted(*args, **kwargs):
+        calls.append(kwargs)
+        return prepare_pctl_data(*args, **kwargs)
+    monkeypatch.setattr(exp_data, 'prepare_pctl_data', counted)
+    monkeypatch.setattr(loader, 'prepare_pctl_data', counted)
+
+    out_dir = os.path.join(base_folder, 'reports', 'Figure4_b')
+    app, rtypes = report.figure_rtypes(EXPS)
+    outputs, _ = report.build_figure('Figure4_b', folder, EXPS, out_dir, app, rtypes, [0])
+    assert len(calls) == 1
+    assert outputs['figure'] == os.path.join(out_dir, 'Figure4_b.pdf') and os.path.getsize(outputs['figure']) > 0
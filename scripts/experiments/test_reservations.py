@@ -0,0 +1,43 @@
+import exp_data
+import reservations
+import numpy as np
+import pandas as pd
+import os
+
+def windows_frame(rng, n_windows, n_groups=2):
+    starts = np.sort(rng.choice(10 ** 6, n_windows, replace=False)).astype('float64') + 5e14
+    rows = []
+    for i, s in enumerate(starts):
+        for gid in range(n_groups):
+            rows.append((i, s, s + 10, gid, rng.integers(1, 14), rng.integers(0, 14), 1, 1, rng.integers(0, 50)))
+    return pd.DataFrame(rows, columns=list(reservations.WINDOWS_TYPES)).astype(reservations.WINDOWS_TYPES)
+
+def test_reservation_asof_join(rng):
+    windows = windows_frame(rng, 30)
+    timeline = reservations.ReservationTimeline(windows)
+    bins = pd.DataFrame({'TIME': np.sort(rng.integers(-1000, 1.2e6, 200)).astype('float64')})
+    annotated = timeline.annotate(bins)
+    for gid in range(2):
+        steps = windows[windows.GID == gid].assign(START=lambda w: w.START - windows.START.min())
+        expected = pd.merge_asof(bins, steps, left_on='TIME', right_on='START', direction='backward')
+        for column in reservations.STEP_COLUMNS:
+            assert np.array_equal(annotated[f'{column}_{gid}'].values, expected[column].values.astype('float64'), equal_nan=True)
+
+def test_reservation_frame_bounds(rng):
+    timeline = reservations.ReservationTimeline(windows_frame(rng, 1))
+    # A range inside the single window: its reservations at both bounds
+    frame = timeline.frame(start=1e-4, end=2e-4)
+    assert frame.START.tolist() == [1e-4, 1e-4, 2e-4, 2e-4]
+    empty = reservations.ReservationTimeline(windows_frame(rng, 0))
+    assert empty.empty and empty.frame().empty and empty.annotate(pd.DataFrame({'TIME': [1.]})).shape == (1, 1)
+
+def test_exp_reservations(synthetic_exp, base_folder):
+    windows = pd.read_csv(os.path.join(base_folder, synthetic_exp, 'server', 'windows'), delimiter='\t')
+    timeline = exp_data.exp_reservations(synthetic_exp)
+    assert timeline.gids.tolist() == sorted(windows.GID.unique())
+    frame = timeline.frame()
+    assert frame.shape[0] == windows.shape[0] and frame.START.iloc[0] == 0
+    assert np.allclose(frame.END.max(), timeline.duration / 1e9)
+    assert timeline.changes() == windows.groupby('GID').UPDATED.apply(np.count_nonzero).to_dict()
+    # No windows file: no reservations
+    assert exp_data.exp_reservations('CFCFS_0.50_SBIM2_14.0').empty
@@ -0,0 +1,84 @@
+import exp_data
+import trace_store
+from result_cache import ResultCache, files_signature
+import numpy as np
+import os
+
+def test_signature_invalidates(tmp_path):
+    cache = ResultCache(cache_dir=str(tmp_path / 'cache'))
+    trace = tmp_path / 'traces'
+    trace.write_text('a')
+    sig = files_signature([tmp_path])
+    cache.put('kind', 'exp', {'x': 1}, sig, np.arange(10))
+    assert np.array_equal(cache.get('kind', 'exp', {'x': 1}, sig), np.arange(10))
+    assert cache.get('kind', 'exp', {'x': 2}, sig) is None
+
+    # From disk, in a fresh cache
+    fresh = ResultCache(cache_dir=str(tmp_path / 'cache'))
+    assert np.array_equal(fresh.get('kind', 'exp', {'x': 1}, sig), np.arange(10))
+
+    # Rewriting a source changes the signature: the stale entry is dropped
+    trace.write_text('ab')
+    new_sig = files_signature([tmp_path])
+    assert new_sig != sig
+    assert cache.get('kind', 'exp', {'x': 1}, new_sig) is None
+    assert len(cache) == 0 and not list((tmp_path / 'cache').glob('*.pkl'))
+
+def test_signature_ignores_sidecars(tmp_path):
+    (tmp_path / 'client0').mkdir()
+    (tmp_path / 'client0' / 'traces').write_text('a')
+    (tmp_path / 'SBIM2.yml').write_text('b')
+    sig = files_signature([tmp_path])
+    assert len(sig) == 2
+    for sidecar in ['traces.parquet', 'traces.index.npz', 'traces.client-end-to-end.sketch.json']:
+        (tmp_path / 'client0' / sidecar).write_text('c')
+    assert files_signature([tmp_path]) == sig
+    assert len(files_signature([tmp_path], sources_only=False)) == 5
+
+def test_memory_lru(tmp_path):
+    cache = ResultCache(use_disk=False, max_bytes=2500)
+    for i in range(3):
+        cache.put('kind', str(i), {}, (), np.zeros(100))
+    # 800 bytes each: all fit, then reading 0 makes 1 the least recently used
+    assert cache.get('kind', '0', {}, ()) is not None
+    cache.put('kind', '3', {}, (), np.zeros(100))
+    assert cache.get('kind', '1', {}, ()) is None
+    assert all(cache.get('kind', k, {}, ()) is not None for k in ['0', '2', '3'])
+    # Larger than the whole memory level: not kept
+    cache.put('kind', 'big', {}, (), np.zeros(1000))
+    assert cache.get('kind', 'big', {}, ()) is None
+
+def test_disk_lru_eviction(tmp_path):
+    cache_dir = tmp_path / 'cache'
+    cache = ResultCache(cache_dir=str(cache_dir), max_bytes=0, max_disk_bytes=3000)
+    for i in range(3):
+        cache.put('kind', str(i), {}, (), np.zeros(100))
+        # Oldest first, whatever the file system's timestamp resolution
+        path = cache._disk_path(cache.entry_id('kind', str(i), {}))
+        os.utime(path, (1000 + i, 1000 + i))
+    assert len(list(cache_dir.glob('*.pkl'))) == 3
+
+    # A disk hit marks entry 0 as recently used: 1 is evicted instead
+    assert cache.get('kind', '0', {}, ()) is not None
+    cache.put('kind', '3', {}, (), np.zeros(100))
+    assert cache.get('kind', '1', {}, ()) is None
+    assert all(cache.get('kind', k, {}, ()) is not None for k in ['0', '2', '3'])
+    assert sum(f.stat().st_size for f in cache_dir.glob('*.pkl')) <= 3000
+
+    # Larger than the whole disk level: not written
+    cache.put('kind', 'big', {}, (), np.zeros(1000))
+    assert not os.path.exists(cache._disk_path(cache.entry_id('kind', 'big', {})))
+
+def test_prepare_traces_cache(synthetic_exp, base_folder):
+    first = exp_data.prepare_traces([synthetic_exp], ['client-end-to-end'], clients=[0])
+    second = exp_data.prepare_traces([synthetic_exp], ['client-end-to-end'], clients=[0])
+    assert second[synthetic_exp] is first[synthetic_exp] and len(exp_data.cache) == 1
+
+    # Converting the traces does not invalidate the entry
+    sig = files_signature([os.path.join(base_folder, synthetic_exp)])
+    trace_store.convert_exp(synthetic_exp, base_folder, verbose=False)
+    assert files_signature([os.path.join(base_folder, synthetic_exp)]) == sig
+    assert exp_data.cache.get('prepare_traces', synthetic_exp, {
+        'data_types': ['client-end-to-end'], 'reset_time': True, 'pctl': 1, 'req_type': None,
+        'get_schedule_data': False, 'bin_width': 1e8, 'clients': [0]
+    }, sig) is first[synthetic_exp]
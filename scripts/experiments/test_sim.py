@@ -0,0 +1,118 @@
+import exp_data
+import sim
+import numpy as np
+import pytest
+
+def dfcfs_reference(times, services, n_workers):
+    finish = np.empty_like(times)
+    free_at = [0.] * n_workers
+    for i, (a, s) in enumerate(zip(times, services)):
+        w = i % n_workers
+        free_at[w] = max(a, free_at[w]) + s
+        finish[i] = free_at[w]
+    return finish
+
+def cfcfs_reference(times, services, n_workers):
+    finish = np.empty_like(times)
+    free_at = [0.] * n_workers
+    for i, (a, s) in enumerate(zip(times, services)):
+        w = int(np.argmin(free_at))
+        free_at[w] = max(a, free_at[w]) + s
+        finish[i] = free_at[w]
+    return finish
+
+def priority_reference(times, rtypes, services, n_workers, order, deadlines=None):
+    # Whenever a worker is free, serve the best arrived request, or else the
+    # next one to arrive
+    rank = {k: r for r, k in enumerate(order)}
+    pending = list(range(times.shape[0]))
+    free_at = [0.] * n_workers
+    finish = np.empty_like(times)
+    while pending:
+        w = int(np.argmin(free_at))
+        t = free_at[w]
+        arrived = [i for i in pending if times[i] <= t]
+        if arrived:
+            if deadlines is None:
+                i = min(arrived, key=lambda i: (rank[rtypes[i]], times[i], i))
+            else:
+                i = min(arrived, key=lambda i: (times[i] + deadlines[rtypes[i]], rank[rtypes[i]]))
+        else:
+            i = min(pending, key=lambda i: (times[i], rank[rtypes[i]]))
+        pending.remove(i)
+        free_at[w] = max(t, times[i]) + services[i]
+        finish[i] = free_at[w]
+    return finish
+
+@pytest.fixture
+def arrivals(rng):
+    n = 400
+    times = np.cumsum(rng.exponential(100, n))
+    rtypes = rng.choice(2, n, p=[.9, .1])
+    services = np.where(rtypes == 0, rng.exponential(150, n), rng.exponential(1500, n))
+    return times, rtypes, services
+
+@pytest.mark.parametrize('n_workers', [1, 3])
+def test_sim_fcfs(arrivals, n_workers):
+    times, _, services = arrivals
+    assert np.allclose(sim.sim_dfcfs(times, services, n_workers), dfcfs_reference(times, services, n_workers))
+    assert np.allclose(sim.sim_cfcfs(times, services, n_workers), cfcfs_reference(times, services, n_workers))
+
+@pytest.mark.parametrize('n_workers', [1, 3])
+def test_sim_priority(arrivals, n_workers):
+    times, rtypes, services = arrivals
+    assert np.allclose(
+        sim.sim_priority(times, rtypes, services, n_workers, [0, 1]),
+        priority_reference(times, rtypes, services, n_workers, [0, 1])
+    )
+    deadlines = [500, 5000]
+    assert np.allclose(
+        sim.sim_priority(times, rtypes, services, n_workers, [0, 1], deadlines),
+        priority_reference(times, rtypes, services, n_workers, [0, 1], deadlines)
+    )
+
+def test_sim_darc(arrivals):
+    times, rtypes, services = arrivals
+    # Every worker is a candidate of the only type: same as c-FCFS
+    single = np.zeros_like(rtypes)
+    assert np.allclose(
+        sim.sim_darc(times, single, services, 3, [0], [[0, 1, 2]]), cfcfs_reference(times, services, 3)
+    )
+    # Disjoint reservations: one FIFO queue per type
+    finish = sim.sim_darc(times, rtypes, services, 2, [0, 1], [[0], [1]])
+    for k in range(2):
+        mask = rtypes == k
+        assert np.allclose(finish[mask], cfcfs_reference(times[mask], services[mask], 1))
+
+def test_sims_single_request():
+    times, rtypes, services = np.array([5.]), np.array([0]), np.array([2.])
+    for finish in [
+        sim.sim_dfcfs(times, services, 2), sim.sim_cfcfs(times, services, 2),
+        sim.sim_priority(times, rtypes, services, 2, [0]), sim.sim_darc(times, rtypes, services, 2, [0], [[0, 1]]),
+    ]:
+        assert finish.tolist() == [7.]
+
+def test_darc_reservations():
+    # SBIM2: SHORT is 17% of the CPU demand (2.3 workers), rounded down to 2
+    # reserved workers, and may steal from LONG's 12
+    assert sim.darc_groups([500, 500000], [.995, .005], 14) == [
+        ([0], [0, 1], list(range(2, 14))), ([1], list(range(2, 14)), [])
+    ]
+    # Types within DARC_DELTA of each other share a reservation, and a group
+    # that needs more than the remaining workers also gets the spillway core
+    assert sim.darc_reservations([1000, 1100, 50000], [.5, .3, .2], 4) == [[0, 1, 2, 3], [0, 1, 2, 3], [1, 2, 3, 0]]
+
+def test_simulated_run_is_readable(base_folder):
+    schedule = [{'mean_ns': [500, 50000], 'ratios': [.9, .1], 'uniform': False, 'ptype': 'PSP_MB',
+                 'duration': 5, 'rtype': ['SHORT', 'LONG']}]
+    exp = 'DARC_0.70_SBIM2_4.0'
+    results = sim.simulate('DARC', schedule, .7, n_workers=4, n_clients=2, max_requests=20000,
+                           output=f'{base_folder}/{exp}', verbose=False)
+    hists = exp_data.parse_hist(['SHORT', 'LONG'], [exp], clients=[0, 1])
+    for k, t in enumerate(['SHORT', 'LONG']):
+        latencies = np.concatenate([results[c][1][results[c][0] == k] for c in range(2)])
+        pctls = hists[t][exp]['client-end-to-end']
+        assert pctls.MAX[0] == latencies.max() / 1000
+        assert pctls.MEAN[0] == pytest.approx(latencies.mean() / 1000)
+        # Middle of the 1 us bucket of the exact percentile
+        assert pctls['p99'][0] * 1000 == np.quantile(latencies, .99, method='inverted_cdf') // 1000 * 1000 + 500
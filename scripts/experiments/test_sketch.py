@@ -0,0 +1,110 @@
+from sketch import QuantileSketch, LogLinearHistogram
+import numpy as np
+import pytest
+
+QUANTILES = [0, .25, .5, .9, .99, 1]
+
+def lower_rank(x, q):
+    # Smallest value whose empirical CDF reaches q (inverted CDF)
+    x = np.sort(x)
+    return x[max(int(np.ceil(q * x.shape[0])) - 1, 0)]
+
+def sketch_rank(x, q):
+    # The sample a QuantileSketch approximates: rank floor(q * (n - 1))
+    x = np.sort(x)
+    return x[int(np.floor(q * (x.shape[0] - 1)))]
+
+@pytest.mark.parametrize('accuracy', [.01, .05])
+def test_quantile_sketch_accuracy(rng, accuracy):
+    values = rng.lognormal(8, 2, 20000)
+    sketch = QuantileSketch(accuracy).add(values)
+    for q, v in zip(QUANTILES, sketch.quantiles(QUANTILES)):
+        exact = sketch_rank(values, q)
+        assert abs(v - exact) <= accuracy * exact * (1 + 1e-9)
+    assert sketch.mean() == pytest.approx(values.mean())
+
+def test_quantile_sketch_merge_and_roundtrip(rng):
+    a, b = rng.lognormal(5, 1, 3000), rng.lognormal(9, 1, 500)
+    merged = QuantileSketch().add(a).merge(QuantileSketch().add(b))
+    direct = QuantileSketch().add(np.concatenate([a, b]))
+    assert np.array_equal(merged.keys, direct.keys) and np.array_equal(merged.counts, direct.counts)
+    assert merged.count == direct.count
+
+    restored = QuantileSketch.from_dict(direct.to_dict())
+    assert np.array_equal(restored.quantiles(QUANTILES), direct.quantiles(QUANTILES))
+    with pytest.raises(ValueError):
+        QuantileSketch(.01).merge(QuantileSketch(.02))
+
+@pytest.mark.parametrize('m', [1., 37.5, 1e4])
+def test_quantile_sketch_scale(rng, m):
+    # Rebucketing the scaled midpoints: within about twice the accuracy
+    values = rng.lognormal(8, 2, 20000)
+    sketch = QuantileSketch(.01).add(values)
+    scaled = sketch.scale(m)
+    assert scaled.count == sketch.count and scaled.sum == pytest.approx(sketch.sum / m)
+    assert (scaled.min, scaled.max) == pytest.approx((sketch.min / m, sketch.max / m))
+    for q, v in zip(QUANTILES, scaled.quantiles(QUANTILES)):
+        exact = sketch_rank(values / m, q)
+        assert abs(v - exact) <= .02 * exact * (1 + 1e-9)
+
+def test_quantile_sketch_empty_single_and_zeros():
+    assert np.isnan(QuantileSketch().quantiles(QUANTILES)).all()
+    assert (QuantileSketch().add([123.]).quantiles(QUANTILES) == 123.).all()
+    sketch = QuantileSketch().add([0, 0, 0, 10])
+    assert sketch.quantile(.5) == 0 and sketch.quantile(1) == pytest.approx(10, rel=.01)
+
+def test_log_linear_histogram_accuracy(rng):
+    values = rng.integers(64, 10 ** 7, 20000)
+    hist = LogLinearHistogram(.01).add(values)
+    for q, v in zip(QUANTILES, hist.quantiles(QUANTILES)):
+        exact = lower_rank(values, q)
+        assert abs(v - exact) <= .01 * exact
+
+def test_log_linear_histogram_merge_and_scale(rng):
+    a, b = rng.integers(10 ** 3, 10 ** 6, 5000), rng.integers(10 ** 3, 10 ** 6, 5000)
+    merged = LogLinearHistogram(.01).add(a).merge(LogLinearHistogram(.01).add(b))
+    direct = LogLinearHistogram(.01).add(np.concatenate([a, b]))
+    assert np.array_equal(merged.keys, direct.keys) and np.array_equal(merged.counts, direct.counts)
+
+    # Scaling only changes the unit: quantiles scale exactly
+    scaled = direct.scale(500.)
+    assert np.allclose(scaled.quantiles(QUANTILES), direct.quantiles(QUANTILES) / 500.)
+
+    # Histograms of other units are rebucketed to the finest
+    coarse = LogLinearHistogram(.01, unit=1000).add(b)
+    both = LogLinearHistogram.merge_all([LogLinearHistogram(.01).add(a), coarse])
+    assert both.unit == 1 and both.count == 10000
+    x = np.concatenate([a, b])
+    for q, v in zip(QUANTILES[1:-1], both.quantiles(QUANTILES[1:-1])):
+        assert abs(v - lower_rank(x, q)) <= .02 * lower_rank(x, q)
+
+def test_log_linear_histogram_empty_and_roundtrip():
+    assert np.isnan(LogLinearHistogram().quantiles(QUANTILES)).all()
+    hist = LogLinearHistogram(.01, unit=1000).add([5000.])
+    assert (hist.quantiles(QUANTILES) == 5000.).all()
+    restored = LogLinearHistogram.from_dict(hist.to_dict())
+    assert np.array_equal(restored.quantiles(QUANTILES), hist.quantiles(QUANTILES))
+
+@pytest.mark.parametrize('max_steps', [0, 1, 63, 64, 1000, 10 ** 7])
+def test_log_linear_histogram_exact_accuracy(max_steps):
+    accuracy = LogLinearHistogram.exact_accuracy(max_steps)
+    assert accuracy <= .01
+    steps = np.unique(np.linspace(0, max_steps, 2000).astype('int64'))
+    hist = LogLinearHistogram(accuracy).add(steps)
+    assert hist.keys.shape[0] == steps.shape[0]
+
+def test_log_linear_histogram_from_traces_hist(rng):
+    # Client buckets up to 10ms: above 64 buckets, 1% accuracy merges
+    # neighbouring ones, their exact accuracy keeps each in its own
+    buckets = np.unique(rng.integers(0, 10 ** 4, 3000)) * 1000
+    hist = {'MIN': buckets[0] + 10, 'MAX': buckets[-1] + 990, 'COUNT': 0, 'TOTAL': 0,
+            'BUCKETS': buckets, 'COUNTS': rng.integers(1, 100, buckets.shape[0]).astype('uint64')}
+    hist['COUNT'] = int(hist['COUNTS'].sum())
+    approx = LogLinearHistogram.from_traces_hist(hist)
+    assert approx.keys.shape[0] < buckets.shape[0] and approx.count == hist['COUNT']
+
+    exact = LogLinearHistogram.from_traces_hist(hist, LogLinearHistogram.exact_accuracy(buckets[-1] // 1000))
+    assert np.array_equal(exact.keys, buckets // 1000) and np.array_equal(exact.counts, hist['COUNTS'])
+    midpoints = np.repeat(buckets + 500., hist['COUNTS'].astype('int64'))
+    for q, v in zip(QUANTILES[1:-1], exact.quantiles(QUANTILES[1:-1])):
+        assert v == lower_rank(midpoints, q)
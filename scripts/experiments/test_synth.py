@@ -0,0 +1,52 @@
+import exp_data
+import synth
+import numpy as np
+import pandas as pd
+import pytest
+import os
+
+def read_client(folder):
+    traces = pd.read_csv(os.path.join(folder, 'traces'), delimiter='\t', float_precision='round_trip')
+    hists = exp_data.read_hist_file(os.path.join(folder, 'traces_hist'))
+    throughput = pd.read_csv(os.path.join(folder, 'traces_throughput'), delimiter='\t')
+    rates = pd.read_csv(os.path.join(folder, 'traces_rates'), delimiter='\t')
+    return traces, hists, throughput, rates
+
+def test_synthetic_exp_layout(synthetic_exp, base_folder):
+    exp_folder = os.path.join(base_folder, synthetic_exp)
+    schedule = exp_data.read_exp_schedule(synthetic_exp)
+    assert [phase['rtype'] for phase in schedule] == [['SHORT', 'LONG']] * 2
+
+    n_rows = 0
+    for c in range(2):
+        traces, hists, throughput, rates = read_client(os.path.join(exp_folder, f'client{c}'))
+        n_rows += traces.shape[0]
+        assert (traces.REQ_ID == np.arange(traces.shape[0])).all()
+        assert (np.diff(traces.SENDING) >= 0).all()
+        assert (traces.COMPLETED - traces.SENDING == traces.RESP_TIME).all()
+        assert (traces.RESP_TIME >= traces.MEAN_NS).all()
+        # Histograms leave out the first 10% of the requests the client expects
+        kept = traces.iloc[1000:]
+        assert hists['UNKNOWN']['COUNT'] == kept.shape[0]
+        for t in ['SHORT', 'LONG']:
+            typed = kept[kept.REQ_TYPE == t]
+            assert hists[t]['COUNT'] == typed.shape[0] and hists[t]['MAX'] == typed.RESP_TIME.max()
+            assert throughput[throughput.TYPE == t].N.sum() == (traces.REQ_TYPE == t).sum()
+        # One offered and achieved rate per phase
+        assert rates.shape[0] == 2 and (rates.ACHIEVED <= rates.OFFERED * 1.1).all()
+    assert n_rows == 20000
+
+    # DARC windows: each type group's reservation in each phase
+    windows = pd.read_csv(os.path.join(exp_folder, 'server', 'windows'), delimiter='\t')
+    assert windows.ID.tolist() == [0, 0, 1, 1] and windows.COUNT.groupby(windows.ID).first().sum() == 20000
+
+@pytest.mark.parametrize('chunk_rows', [1000, 7000])
+def test_synthetic_exp_chunks(base_folder, chunk_rows):
+    # Rows are simulated a chunk at a time: same counts and ordering
+    exp = 'CFCFS_0.50_SBIM2_14.0'
+    synth.write_synthetic_exp(exp, 15000, base_folder=base_folder, n_phases=3, chunk_rows=chunk_rows, verbose=False)
+    traces, hists, throughput, _ = read_client(os.path.join(base_folder, exp, 'client0'))
+    assert traces.shape[0] == 15000 and (np.diff(traces.SENDING) >= 0).all()
+    assert traces.SCHED_ID.value_counts().sort_index().tolist() == [5000] * 3
+    assert hists['UNKNOWN']['COUNT'] == 13500 and throughput.N.sum() == 15000
+    assert not os.path.exists(os.path.join(base_folder, exp, 'server'))
@@ -0,0 +1,78 @@
+import exp_data
+import trace_store
+import numpy as np
+import pandas as pd
+import pytest
+import os
+
+def text_reference(filename):
+    # The text trace as plain pandas parses it, completed requests only
+    df = pd.read_csv(filename, delimiter='\t', float_precision='round_trip')
+    return df[df.COMPLETED > 0].reset_index(drop=True)
+
+def test_convert_traces_matches_text(synthetic_exp, base_folder):
+    filename = os.path.join(base_folder, synthetic_exp, 'client0', 'traces')
+    text = trace_store.read_text_traces(filename)
+    assert trace_store.convert_traces(filename, chunksize=1000, verbose=False) == trace_store.columnar_path(filename)
+    assert trace_store.has_columnar_copy(filename)
+    columnar = trace_store.read_traces(filename)
+    pd.testing.assert_frame_equal(columnar, text, check_categorical=False)
+
+    reference = text_reference(filename)
+    for col in ['REQ_ID', 'SENDING', 'COMPLETED', 'MEAN_NS', 'SCHED_ID']:
+        assert np.array_equal(columnar[col].values, reference[col].values.astype('uint64'))
+    assert columnar.REQ_TYPE.astype(str).tolist() == reference.REQ_TYPE.tolist()
+
+def test_columnar_copy_goes_stale(synthetic_exp, base_folder):
+    filename = os.path.join(base_folder, synthetic_exp, 'client0', 'traces')
+    trace_store.convert_traces(filename, verbose=False)
+    st = os.stat(trace_store.columnar_path(filename))
+    os.utime(filename, (st.st_atime, st.st_mtime + 10))
+    assert not trace_store.has_columnar_copy(filename)
+
+def test_read_profiling_node_dtypes(synthetic_exp, base_folder):
+    # Same frame whether the trace was converted or not
+    text = exp_data.read_profiling_node(synthetic_exp, 'client1', verbose=False)
+    trace_store.convert_exp(synthetic_exp, base_folder, verbose=False)
+    columnar = exp_data.read_profiling_node(synthetic_exp, 'client1', verbose=False)
+    assert columnar.REQ_TYPE.dtype.name == 'category'
+    pd.testing.assert_frame_equal(columnar, text, check_categorical=False)
+
+def test_read_profiling_node_missing(base_folder):
+    assert exp_data.read_profiling_node('DARC_0.80_SBIM2_14.0', 'client0', verbose=False).empty
+
+def prepare_path(filename, path):
+    # Several index blocks or row groups, so that only some are read
+    if path == 'parquet':
+        trace_store.convert_traces(filename, chunksize=1000, verbose=False)
+    else:
+        trace_store.build_index(filename, block_rows=1000)
+
+@pytest.mark.parametrize('path', ['index', 'parquet'])
+def test_read_time_range_matches_text(synthetic_exp, base_folder, path):
+    filename = os.path.join(base_folder, synthetic_exp, 'client0', 'traces')
+    full = trace_store.read_text_traces(filename)
+    prepare_path(filename, path)
+    assert trace_store.first_sending(filename) == full.SENDING.min()
+
+    sending = full.SENDING.values
+    t0, t1 = int(np.quantile(sending, .3)), int(np.quantile(sending, .45))
+    for req_types, sched_ids in [(None, None), (['LONG'], None), (None, [1]), (['SHORT'], [0, 1])]:
+        mask = (sending >= t0) & (sending < t1)
+        if req_types is not None:
+            mask &= full.REQ_TYPE.isin(req_types).values
+        if sched_ids is not None:
+            mask &= full.SCHED_ID.isin(sched_ids).values
+        expected = full[mask].reset_index(drop=True)
+        df = trace_store.read_time_range(filename, t0, t1, req_types=req_types, sched_ids=sched_ids)
+        pd.testing.assert_frame_equal(df, expected, check_categorical=False)
+        columns = ['REQ_ID', 'SENDING']
+        df = trace_store.read_time_range(filename, t0, t1, columns=columns, req_types=req_types, sched_ids=sched_ids)
+        pd.testing.assert_frame_equal(df, expected[columns])
+
+    # Bounds: the whole trace, and ranges before or after it
+    pd.testing.assert_frame_equal(
+        trace_store.read_time_range(filename, 0, int(sending.max()) + 1), full, check_categorical=False
+    )
+    assert trace_store.read_time_range(filename, 0, int(sending.min()), columns=['SENDING']).empty
+    assert trace_store.read_time_range(filename, int(sending.max()) + 1, int(sending.max()) + 10).empty
@@ -0,0 +1,314 @@
+#!/usr/bin/env python3
+# Columnar copies of the clients' tab-separated `traces` files.
+#
+# Each `traces` file is converted once into a `traces.parquet` file next to it,
+# with typed columns (uint64 timestamps, categorical REQ_TYPE, uint8 SCHED_ID)
+# compressed per column. Readers prefer that copy when it is at least as
+# recent as the text file.
+#
+# Time-range reads (read_time_range) only parse the parts of a trace whose
+# SENDING range overlaps the query: the row groups of the columnar copy,
+# selected with their statistics, or blocks of the text file, selected with a
+# block index (byte offset and SENDING range of every INDEX_BLOCK_ROWS rows)
+# built on first use and saved in a `traces.index.npz` file next to it.
+import pandas as pd
+import numpy as np
+import pyarrow as pa
+import pyarrow.csv as pcsv
+import pyarrow.parquet as pq
+from pathlib import Path
+import argparse
+import io
+import os
+import time
+
+COLUMNAR_SUFFIX = '.parquet'
+# Rows per parquet row group, also the chunk size used when converting
+ROW_GROUP_SIZE = 1 << 20
+COMPRESSION = 'zstd'
+INDEX_SUFFIX = '.index.npz'
+# Rows per block of the text files' index
+INDEX_BLOCK_ROWS = 1 << 14
+
+# The client prints timestamps with std::fixed, so they are parsed as floats
+# (with round_trip precision, the default parser is off by a few ns at these
+# magnitudes) and truncated to integer nanoseconds.
+TRACE_DTYPES = {
+    'W_ID': 'uint16',
+    'REQ_ID': 'uint64',
+    'REQ_TYPE': 'category',
+    'SENDING': 'uint64',
+    'READING': 'uint64',
+    'COMPLETED': 'uint64',
+    'RESP_TIME': 'uint64',
+    'MEAN_NS': 'uint32',
+    'SCHED_ID': 'uint8',
+}
+
+def columnar_path(filename):
+    return str(filename) + COLUMNAR_SUFFIX
+
+def has_columnar_copy(filename):
+    col_file = Path(columnar_path(filename))
+    if not col_file.is_file():
+        return False
+    # A text file rewritten after the conversion makes the copy stale
+    txt_file = Path(filename)
+    if txt_file.is_file() and txt_file.stat().st_mtime > col_file.stat().st_mtime:
+        return False
+    return True
+
+def cast_trace_columns(df, categories=False):
+    # categories: also make REQ_TYPE categorical, as read from the columnar
+    # copy (the converter dictionary-encodes it with pyarrow instead)
+    for col, dtype in TRACE_DTYPES.items():
+        if col not in df.columns or (dtype == 'category' and not categories):
+            continue
+        df[col] = df[col].astype(dtype)
+    return df
+
+def convert_traces(filename, chunksize=ROW_GROUP_SIZE, compression=COMPRESSION, verbose=True):
+    t0 = time.time()
+    out_file = columnar_path(filename)
+    tmp_file = out_file + '.tmp'
+    writer = None
+    n_rows = 0
+    try:
+        for chunk in pd.read_csv(filename, delimiter='\t', chunksize=chunksize,
+                                 engine='c', float_precision='round_trip'):
+            chunk = cast_trace_columns(chunk)
+            table = pa.Table.from_pandas(chunk, preserve_index=False)
+            if 'REQ_TYPE' in chunk.columns:
+                i = table.schema.get_field_index('REQ_TYPE')
+                table = table.set_column(i, 'REQ_TYPE', table.column(i).dictionary_encode())
+            if writer is None:
+                writer = pq.ParquetWriter(tmp_file, table.schema, compression=compression)
+            writer.write_table(table, row_group_size=chunksize)
+            n_rows += chunk.shape[0]
+    finally:
+        if writer is not None:
+            writer.close()
+    if writer is None:
+        print(f'{filename} is empty. Not converting.')
+        return None
+    os.replace(tmp_file, out_file)
+    if verbose:
+        in_size = os.path.getsize(filename) / 1e6
+        out_size = os.path.getsize(out_file) / 1e6
+        print(f'Converted {filename} ({n_rows} rows, {in_size:.1f}MB -> {out_size:.1f}MB) in {time.time() - t0:.2f} seconds')
+    return out_file
+
+def trace_columns(filename):
+    return pq.read_schema(columnar_path(filename)).names
+
+def read_traces(filename, columns=None, completed_only=True):
+    # Only load the requested columns, and let parquet skip uncompleted requests
+    if columns is not None:
+        available = trace_columns(filename)
+        columns = [c for c in columns if c in available]
+    filters = None
+    if completed_only:
+        filters = [('COMPLETED', '>', 0)]
+    return pd.read_parquet(columnar_path(filename), columns=columns, filters=filters)
+
+def read_text_traces(filename, columns=None, completed_only=True):
+    # The text trace, with the same dtypes and index as read_traces
+    usecols = None if columns is None else (lambda c: c in columns or c == 'COMPLETED')
+    df = pd.read_csv(filename, delimiter='\t', usecols=usecols, engine='c', float_precision='round_trip')
+    if completed_only:
+        df = df[df.COMPLETED.values > 0].reset_index(drop=True)
+    if columns is not None:
+        df = df[[c for c in columns if c in df.columns]]
+    return cast_trace_columns(df, categories=True)
+
+def iter_traces(filename, columns=None, chunksize=ROW_GROUP_SIZE):
+    # Bounded-memory iteration over a trace, from its columnar copy if fresh
+    if has_columnar_copy(filename):
+        pf = pq.ParquetFile(columnar_path(filename))
+        if columns is not None:
+            columns = [c for c in columns if c in pf.schema_arrow.names]
+        for batch in pf.iter_batches(batch_size=chunksize, columns=columns):
+            yield batch.to_pandas()
+    else:
+        usecols = None if columns is None else (lambda c: c in columns)
+        for chunk in pd.read_csv(filename, delimiter='\t', chunksize=chunksize, usecols=usecols,
+                                 engine='c', float_precision='round_trip'):
+            yield cast_trace_columns(chunk, categories=True)
+
+def index_path(filename):
+    return str(filename) + INDEX_SUFFIX
+
+def has_fresh_index(filename):
+    idx_file = Path(index_path(filename))
+    return idx_file.is_file() and idx_file.stat().st_mtime >= Path(filename).stat().st_mtime
+
+def build_index(filename, block_rows=INDEX_BLOCK_ROWS, verbose=False):
+    t0 = time.time()
+    # Byte offsets of the first row of each block, and of the end of the file
+    with open(filename, 'rb') as f:
+        header = f.readline()
+        offsets = [np.array([f.tell()])]
+        n_lines = 0
+        pos = f.tell()
+        while True:
+            buf = f.read(1 << 26)
+            if not buf:
+                break
+            newlines = np.flatnonzero(np.frombuffer(buf, dtype='uint8') == ord('\n'))
+            lines = n_lines + np.arange(1, newlines.shape[0] + 1)
+            offsets.append(pos + newlines[lines % block_rows == 0] + 1)
+            n_lines += newlines.shape[0]
+            pos += len(buf)
+    offsets = np.concatenate(offsets)
+    offsets = np.append(offsets[offsets < pos], pos)
+
+    # SENDING range of the completed requests of each block (an empty range
+    # if there are none)
+    mins = []
+    maxs = []
+    for chunk in pd.read_csv(filename, delimiter='\t', usecols=['SENDING', 'COMPLETED'], chunksize=block_rows,
+                             engine='c', float_precision='round_trip', skip_blank_lines=False):
+        sending = chunk.SENDING.values[chunk.COMPLETED.values > 0].astype('uint64')
+        mins.append(sending.min() if sending.shape[0] else np.iinfo('uint64').max)
+        maxs.append(sending.max() if sending.shape[0] else 0)
+    if len(mins) != offsets.shape[0] - 1:
+        raise ValueError(f'{filename}: {len(mins)} blocks parsed but {offsets.shape[0] - 1} found')
+
+    tmp_file = index_path(filename) + '.tmp.npz'
+    np.savez(
+        tmp_file, header=np.array(header.decode().split()), offsets=offsets,
+        mins=np.array(mins, dtype='uint64'), maxs=np.array(maxs, dtype='uint64')
+    )
+    os.replace(tmp_file, index_path(filename))
+    if verbose:
+        print(f'Indexed {filename} ({offsets.shape[0] - 1} blocks) in {time.time() - t0:.2f} seconds')
+
+def read_index(filename):
+    if not has_fresh_index(filename):
+        build_index(filename)
+    with np.load(index_path(filename)) as index:
+        return {k: index[k] for k in index.files}
+
+def read_blocks(filename, index, blocks, columns=None):
+    # Parse the given blocks of a text trace, reading contiguous ones at once
+    # (pyarrow's parser is correctly rounded, like round_trip, and faster)
+    header = list(index['header'])
+    usecols = header if columns is None else [c for c in header if c in columns]
+    read_options = pcsv.ReadOptions(column_names=header)
+    parse_options = pcsv.ParseOptions(delimiter='\t')
+    convert_options = pcsv.ConvertOptions(
+        include_columns=usecols, column_types={'REQ_TYPE': pa.dictionary(pa.int32(), pa.string())}
+    )
+    tables = []
+    with open(filename, 'rb') as f:
+        for run in np.split(blocks, np.flatnonzero(np.diff(blocks) > 1) + 1):
+            if run.shape[0] == 0:
+                continue
+            start, end = index['offsets'][run[0]], index['offsets'][run[-1] + 1]
+            f.seek(start)
+            tables.append(pcsv.read_csv(
+                io.BytesIO(f.read(end - start)), read_options, parse_options, convert_options
+            ))
+    if not tables:
+        return pd.DataFrame(columns=usecols)
+    df = pa.concat_tables(tables).unify_dictionaries().combine_chunks().to_pandas()
+    return cast_trace_columns(df)
+
+def read_row_groups(filename, groups, columns=None):
+    pf = pq.ParquetFile(columnar_path(filename))
+    if columns is not None:
+        columns = [c for c in columns if c in pf.schema_arrow.names]
+    return pf.read_row_groups(groups, columns=columns).to_pandas()
+
+def row_group_ranges(filename):
+    # SENDING (min, max) of each row group of the columnar copy
+    metadata = pq.ParquetFile(columnar_path(filename)).metadata
+    col = metadata.schema.to_arrow_schema().get_field_index('SENDING')
+    ranges = []
+    for g in range(metadata.num_row_groups):
+        stats = metadata.row_group(g).column(col).statistics
+        if stats is None or not stats.has_min_max:
+            ranges.append((0, np.iinfo('uint64').max))
+        else:
+            ranges.append((stats.min, stats.max))
+    return np.array(ranges, dtype='uint64').reshape(-1, 2)
+
+def first_sending(filename):
+    # SENDING of the first completed request
+    if has_columnar_copy(filename):
+        # Row group statistics include uncompleted requests: read the first
+        # group, then any other group that may hold an earlier request
+        ranges = row_group_ranges(filename)
+        if ranges.shape[0] == 0:
+            return None
+        df = read_row_groups(filename, [0], ['SENDING', 'COMPLETED'])
+        t = df.SENDING.values[df.COMPLETED.values > 0].min(initial=np.iinfo('uint64').max)
+        groups = [g for g in np.flatnonzero(ranges[:, 0] < t) if g != 0]
+        if groups:
+            df = read_row_groups(filename, groups, ['SENDING', 'COMPLETED'])
+            t = min(t, df.SENDING.values[df.COMPLETED.values > 0].min(initial=t))
+    else:
+        t = read_index(filename)['mins'].min(initial=np.iinfo('uint64').max)
+    return None if t == np.iinfo('uint64').max else int(t)
+
+def read_time_range(filename, t0, t1, columns=None, req_types=None, sched_ids=None):
+    # Completed requests sent in [t0, t1) (in the trace's ns), optionally of
+    # some REQ_TYPEs and SCHED_IDs, only parsing the parts that may hold them
+    read_cols = None
+    if columns is not None:
+        read_cols = list(columns) + [c for c in ['SENDING', 'COMPLETED', 'REQ_TYPE', 'SCHED_ID'] if c not in columns]
+    if has_columnar_copy(filename):
+        ranges = row_group_ranges(filename)
+        groups = np.flatnonzero((ranges[:, 0] < t1) & (ranges[:, 1] >= t0))
+        df = read_row_groups(filename, groups.tolist(), read_cols)
+    else:
+        index = read_index(filename)
+        blocks = np.flatnonzero((index['mins'] < t1) & (index['maxs'] >= t0))
+        df = read_blocks(filename, index, blocks, read_cols)
+    sending = df.SENDING.values
+    mask = (df.COMPLETED.values > 0) & (sending >= t0) & (sending < t1)
+    if req_types is not None:
+        mask &= df.REQ_TYPE.isin(req_types).values
+    if sched_ids is not None:
+        mask &= df.SCHED_ID.isin(sched_ids).values
+    df = df[mask].reset_index(drop=True)
+    if columns is not None:
+        df = df[[c for c in columns if c in df.columns]]
+    return df
+
+def convert_exp(exp, base_folder, force=False, verbose=True):
+    converted = []
+    exp_folder = Path(base_folder, exp)
+    for trace_file in sorted(exp_folder.glob('client*/traces')):
+        if not force and has_columnar_copy(trace_file):
+            if verbose:
+                print(f'{trace_file} already converted')
+            continue
+        out_file = convert_traces(str(trace_file), verbose=verbose)
+        if out_file is not None:
+            converted.append(out_file)
+    return converted
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Convert client traces to columnar files')
+    parser.add_argument('exps', nargs='+', help='experiment names, or files listing them')
+    parser.add_argument('-b', '--base-folder', type=str, default='/psp/experiments-data/')
+    parser.add_argument('-f', '--force', action='store_true', help='convert even if a fresh copy exists')
+    parser.add_argument('-i', '--index', action='store_true', help='build the block index of the text traces instead of converting them')
+    args = parser.parse_args()
+
+    exps = []
+    for e in args.exps:
+        list_file = Path(args.base_folder, e)
+        if list_file.is_file():
+            with open(list_file, 'r') as f:
+                exps.extend([os.path.basename(l.rstrip()) for l in f if l.strip()])
+        else:
+            exps.append(os.path.basename(e.rstrip('/')))
+    for exp in exps:
+        if args.index:
+            for trace_file in sorted(Path(args.base_folder, exp).glob('client*/traces')):
+                if args.force or not has_fresh_index(trace_file):
+                    build_index(str(trace_file), verbose=True)
+        else:
+            convert_exp(exp, args.base_folder, force=args.force)